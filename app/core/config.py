@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
 """Configuration settings for the application."""
+from typing import Dict, Literal, Optional
+
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -7,17 +10,132 @@ class Settings(BaseSettings):
     """Application settings."""
 
     # Core LLM and Vector DB settings
-    OPENAI_API_KEY: str
+    # Only required when a backend calls the provider through LiteLLM
+    OPENAI_API_KEY: Optional[str] = None
     DEFAULT_MODEL: str = "gpt-4"
     VECTOR_DB_PATH: str = "./chroma_db"
+    # Each user's chunks go to the collection "<COLLECTION_NAME>_<user_id>"
     COLLECTION_NAME: str = "qualichat"
+    # "chroma" uses ChromaDB's HNSW index; "numpy" searches memory-mapped
+    # float32 segments exactly, which is faster for tens of thousands of chunks.
+    VECTOR_BACKEND: Literal["chroma", "numpy"] = "chroma"
+    # Share of deleted rows that triggers the compaction of numpy segments
+    VECTOR_COMPACTION_THRESHOLD: float = 0.3
+    # HNSW index of new ChromaDB collections: distance function, links per
+    # node, and candidate list sizes while building and searching. Existing
+    # collections keep the parameters they were created with; pick values
+    # with benchmarks/tune_hnsw.py. The numpy backend uses HNSW_SPACE too.
+    HNSW_SPACE: Literal["l2", "ip", "cosine"] = "l2"
+    HNSW_M: int = 16
+    HNSW_CONSTRUCTION_EF: int = 100
+    HNSW_SEARCH_EF: int = 10
+    # ChromaDB backend only: searches scan int8/float16 copies of the vectors
+    # held in memory and re-rank VECTOR_RERANK_FACTOR * top_k candidates at
+    # full precision; "none" searches ChromaDB's own index.
+    VECTOR_QUANTIZATION: Literal["none", "int8", "float16"] = "none"
+    VECTOR_RERANK_FACTOR: int = 4
+
+    # Backends: "litellm" calls the provider; the local ones run offline.
+    # Local embeddings have a different dimension, so point VECTOR_DB_PATH
+    # or COLLECTION_NAME elsewhere when switching an existing store.
+    LLM_BACKEND: Literal["litellm", "local"] = "litellm"
+    EMBEDDING_BACKEND: Literal["litellm", "hashing"] = "litellm"
+    LOCAL_LLM_LATENCY_MS: float = 0.0
+    LOCAL_EMBEDDING_DIMENSIONS: int = 384
+
+    # Embedding settings
+    EMBEDDING_MODEL: str = "text-embedding-ada-002"
+    EMBEDDING_BATCH_SIZE: int = 256
+    EMBEDDING_BATCH_TOKENS: int = 50000
+    EMBEDDING_CONCURRENCY: int = 4
+    EMBEDDING_CACHE_ENABLED: bool = True
+    # Defaults to "<VECTOR_DB_PATH>/embedding_cache.db" when unset
+    EMBEDDING_CACHE_PATH: Optional[str] = None
+    EMBEDDING_CACHE_MAX_MB: int = 512
+    # Embedding requests and estimated tokens per minute shared by a process;
+    # 0 disables the limit
+    EMBEDDING_RATE_LIMIT_RPM: int = 0
+    EMBEDDING_RATE_LIMIT_TPM: int = 0
+    # Concurrent query embeddings are batched within this window; 0 disables it
+    EMBEDDING_COALESCE_WINDOW_MS: float = 5.0
+    EMBEDDING_COALESCE_MAX_BATCH: int = 64
+    # Coalesced batches sent to the provider at the same time
+    EMBEDDING_COALESCE_MAX_INFLIGHT: int = 4
+
+    # LLM requests and estimated tokens per minute; 0 disables the limit
+    LLM_RATE_LIMIT_RPM: int = 0
+    LLM_RATE_LIMIT_TPM: int = 0
+
+    # Provider call settings, applied per model. Concurrency adapts between
+    # 1 and the maximum, backing off when the provider throttles.
+    PROVIDER_MAX_CONCURRENCY: int = 16
+    PROVIDER_INITIAL_CONCURRENCY: int = 4
+    PROVIDER_MAX_RETRIES: int = 5
+    PROVIDER_BACKOFF_BASE_SECONDS: float = 0.5
+    PROVIDER_BACKOFF_MAX_SECONDS: float = 30.0
+
+    # Retrieval settings. With the lexical index enabled, ingestion keeps a
+    # BM25 index of the chunks and searches fuse it with the vector ranking.
+    RETRIEVAL_TOP_K: int = 5
+    LEXICAL_INDEX_ENABLED: bool = True
+    # Defaults to "<VECTOR_DB_PATH>/lexical_index.db" when unset; each user's
+    # index sits next to it, e.g. "lexical_index_<user_id>.db"
+    LEXICAL_INDEX_PATH: Optional[str] = None
+    HYBRID_CANDIDATES: int = 20
+    HYBRID_RRF_K: int = 60
+    # Maximal marginal relevance: fetch MMR_FETCH_K candidates and keep the
+    # RETRIEVAL_TOP_K that best balance relevance and novelty, weighted by
+    # MMR_LAMBDA (1 = relevance only). Overlapping neighbouring chunks are
+    # then sent once. 0 disables it.
+    MMR_FETCH_K: int = 0
+    MMR_LAMBDA: float = 0.5
+    # Input tokens per request (prompt, context and history). Per-model
+    # budgets, e.g. '{"gpt-4": 6000}', override CONTEXT_TOKEN_BUDGET; 0 uses
+    # the model's input window minus CONTEXT_RESERVED_TOKENS for the answer.
+    # The history may take up to CONTEXT_HISTORY_SHARE of the budget.
+    CONTEXT_TOKEN_BUDGETS: Dict[str, int] = {}
+    CONTEXT_TOKEN_BUDGET: int = 0
+    CONTEXT_RESERVED_TOKENS: int = 1024
+    CONTEXT_HISTORY_SHARE: float = 0.25
+
+    # Semantic answer cache settings (in memory, per process)
+    ANSWER_CACHE_ENABLED: bool = True
+    # Minimum cosine similarity between two questions to reuse an answer
+    ANSWER_CACHE_SIMILARITY: float = 0.95
+    ANSWER_CACHE_TTL_SECONDS: float = 3600.0
+    ANSWER_CACHE_MAX_ENTRIES: int = 1024
 
     # Document processing settings
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 100
 
+    # Ingestion pipeline settings
+    INGESTION_PARSE_WORKERS: int = 2
+    INGESTION_EMBED_WORKERS: int = 4
+    INGESTION_QUEUE_SIZE: int = 8
+    # Files at least this large are streamed in windows of chunks
+    INGESTION_STREAM_THRESHOLD_MB: int = 20
+    INGESTION_WINDOW_SIZE: int = 256
+
+    # Watch mode settings
+    WATCH_POLL_INTERVAL_SECONDS: float = 2.0
+    WATCH_DEBOUNCE_SECONDS: float = 1.0
+    # How often a watcher of all users looks for new user directories
+    WATCH_USER_REFRESH_SECONDS: float = 30.0
+
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
+    @model_validator(mode="after")
+    def _require_api_key_for_provider_backends(self) -> "Settings":
+        """Fails early when a LiteLLM backend is selected without an API key."""
+        uses_provider = self.LLM_BACKEND == "litellm" or self.EMBEDDING_BACKEND == "litellm"
+        if uses_provider and not self.OPENAI_API_KEY:
+            raise ValueError(
+                "OPENAI_API_KEY is required unless LLM_BACKEND=local and "
+                "EMBEDDING_BACKEND=hashing."
+            )
+        return self
+
 
 settings = Settings()
 
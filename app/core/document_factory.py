@@ -1,15 +1,15 @@
 # -*- coding: utf-8 -*-
 """Factory for creating Document objects from various file types."""
-import uuid
+import hashlib
 from pathlib import Path
-from typing import List, Dict, Callable
+from typing import List, Dict, Callable, Iterator
 
 from langchain_community.document_loaders import (
     TextLoader,
     PyPDFLoader,
     CSVLoader,
 )
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from app.core.text_splitter import RecursiveTextSplitter
 from app.models.document import Document
 from app.core.logger import logger
 
@@ -23,10 +23,9 @@ class DocumentFactory:
     def __init__(self, chunk_size: int, chunk_overlap: int):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        self.text_splitter = RecursiveTextSplitter(
             chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap,
-            length_function=len,
         )
         self._loaders: Dict[str, Callable] = {
             ".txt": TextLoader,
@@ -37,47 +36,111 @@ class DocumentFactory:
             ".yml": TextLoader,
         }
 
-    def create_documents(self, file_path: str) -> List[Document]:
+    @staticmethod
+    def make_chunk_id(source_name: str, content: str, occurrence: int = 0) -> str:
         """
-        Loads a file, splits it into chunks, and creates Document objects.
+        Builds a deterministic, content-addressed id for a chunk.
 
         Args:
-            file_path: The path to the file.
+            source_name: The name of the file the chunk belongs to.
+            content: The text of the chunk.
+            occurrence: How many identical chunks precede this one in the file.
 
         Returns:
-            A list of Document objects, each representing a chunk.
+            A hex digest that only changes when the chunk's content does.
+        """
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        key = f"{source_name}\x00{content_hash}\x00{occurrence}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def iter_documents(self, file_path: str, window_size: int = 256) -> Iterator[List[Document]]:
+        """
+        Streams a file as windows of chunks, without loading it all at once.
+
+        Pages (PDF) or rows (CSV) are read lazily and split as they arrive,
+        so memory use depends on ``window_size`` rather than on the file size.
+
+        Args:
+            file_path: The path to the file.
+            window_size: Maximum number of chunks per yielded window.
+
+        Yields:
+            Lists of at most ``window_size`` Document objects, in file order.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+            Exception: Any error raised while loading or splitting the file.
         """
         path = Path(file_path)
         if not path.exists():
-            logger.error(f"File not found: {file_path}")
-            return []
+            raise FileNotFoundError(f"File not found: {file_path}")
 
         loader_class = self._loaders.get(path.suffix.lower())
         if not loader_class:
             logger.warning(f"Unsupported file type: {path.suffix}. Skipping.")
-            return []
+            return
 
-        try:
-            logger.info(f"Loading file: {file_path} with loader {loader_class.__name__}")
-            loader = loader_class(file_path)
-            langchain_docs = loader.load()
-
-            logger.info("Splitting document into chunks...")
-            chunks = self.text_splitter.split_documents(langchain_docs)
-            logger.success(f"Created {len(chunks)} chunks from {path.name}")
-
-            documents: List[Document] = []
-            for i, chunk in enumerate(chunks):
-                doc = Document(
-                    id=str(uuid.uuid4()),
-                    content=chunk.page_content,
-                    source_name=path.name,
-                    metadata=chunk.metadata or {},
+        logger.info(f"Loading file: {file_path} with loader {loader_class.__name__}")
+        loader = loader_class(file_path)
+
+        window: List[Document] = []
+        occurrences: Dict[bytes, int] = {}
+        chunk_count = 0
+        for langchain_doc in loader.lazy_load():
+            for chunk in self.text_splitter.split_documents([langchain_doc]):
+                content_key = hashlib.sha256(chunk.page_content.encode("utf-8")).digest()
+                occurrence = occurrences.get(content_key, 0)
+                occurrences[content_key] = occurrence + 1
+                window.append(
+                    Document(
+                        id=self.make_chunk_id(path.name, chunk.page_content, occurrence),
+                        content=chunk.page_content,
+                        source_name=path.name,
+                        metadata=chunk.metadata or {},
+                    )
                 )
-                documents.append(doc)
+                if len(window) >= window_size:
+                    chunk_count += len(window)
+                    yield window
+                    window = []
+
+        if window:
+            chunk_count += len(window)
+            yield window
+        logger.success(f"Created {chunk_count} chunks from {path.name}")
 
-            return documents
+    def load_documents(self, file_path: str) -> List[Document]:
+        """
+        Loads a file, splits it into chunks, and creates Document objects.
 
+        Unlike ``create_documents``, errors are raised, so callers can tell a
+        file that failed to load from one without any text.
+
+        Args:
+            file_path: The path to the file.
+
+        Returns:
+            A list of Document objects, each representing a chunk.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+            Exception: Any error raised while loading or splitting the file.
+        """
+        return [doc for window in self.iter_documents(file_path) for doc in window]
+
+    def create_documents(self, file_path: str) -> List[Document]:
+        """
+        Loads a file, splits it into chunks, and creates Document objects.
+
+        Args:
+            file_path: The path to the file.
+
+        Returns:
+            A list of Document objects, each representing a chunk, or an
+            empty list if the file could not be loaded.
+        """
+        try:
+            return self.load_documents(file_path)
         except Exception as e:
             logger.error(f"Failed to process file {file_path}: {e}")
             return []
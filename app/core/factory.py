@@ -1,21 +1,37 @@
 # -*- coding: utf-8 -*-
 """Factory for creating and composing application components."""
 
+from pathlib import Path
+from typing import List, Optional
+
 # Apply patches at the very beginning of the application's composition root.
 from app.core.patches import apply_patches
 apply_patches()
 
-from app.services.llm_service import LLMService
-from app.services.embeddings_service import EmbeddingsService
+from app.services.llm_service import LLMService, LocalLLMService
+from app.services.embeddings_service import EmbeddingsService, HashingEmbeddingsService
 from app.services.retrieval_service import RetrievalService
 from app.services.rag_pipeline import RAGPipeline
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.context_packer import ContextPacker
+from app.services.embedding_coalescer import EmbeddingCoalescer
 from app.services.ingestion_service import IngestionService
+from app.services.ingestion_pipeline import IngestionPipeline
+from app.services.bulk_ingestion_service import BulkIngestionService
+from app.services.watch_service import IngestionWatcher
 from app.repositories.history_repository import HistoryRepository
+from app.repositories.base_repository import BaseRepository, tenant_collection_name
 from app.repositories.chroma_repository import ChromaRepository
+from app.repositories.numpy_repository import NumpyRepository
+from app.repositories.quantized_chroma_repository import QuantizedChromaRepository
+from app.repositories.embedding_cache_repository import EmbeddingCacheRepository
+from app.repositories.lexical_index_repository import LexicalIndexRepository
 from app.repositories.document_repository import DocumentRepository
+from app.repositories.manifest_repository import ManifestRepository
 from app.graphs.conversation_graph import ConversationGraph
 from app.core.document_factory import DocumentFactory
 from app.core.config import settings
+from app.core.rate_limiter import ProviderLimiter, provider_limiters
 from app.repositories.user_repository import UserRepository
 
 
@@ -26,16 +42,118 @@ class AppFactory:
     """
 
     @staticmethod
-    def create_llm_service() -> LLMService:
-        return LLMService(model=settings.DEFAULT_MODEL)
+    def create_provider_limiter(name: str, rpm: int, tpm: int) -> ProviderLimiter:
+        return ProviderLimiter(
+            name=name,
+            requests_per_minute=rpm,
+            tokens_per_minute=tpm,
+            max_concurrency=settings.PROVIDER_MAX_CONCURRENCY,
+            initial_concurrency=settings.PROVIDER_INITIAL_CONCURRENCY,
+            max_retries=settings.PROVIDER_MAX_RETRIES,
+            backoff_base_seconds=settings.PROVIDER_BACKOFF_BASE_SECONDS,
+            backoff_max_seconds=settings.PROVIDER_BACKOFF_MAX_SECONDS,
+        )
+
+    @classmethod
+    def create_llm_service(cls) -> LLMService:
+        if settings.LLM_BACKEND == "local":
+            return LocalLLMService(latency_ms=settings.LOCAL_LLM_LATENCY_MS)
+        # Every service of the process draws on the same per-model limiter.
+        name = f"llm:{settings.DEFAULT_MODEL}"
+        limiter = provider_limiters.get(
+            name,
+            lambda: cls.create_provider_limiter(
+                name, settings.LLM_RATE_LIMIT_RPM, settings.LLM_RATE_LIMIT_TPM
+            ),
+        )
+        return LLMService(model=settings.DEFAULT_MODEL, limiter=limiter)
+
+    @staticmethod
+    def create_embedding_cache() -> Optional[EmbeddingCacheRepository]:
+        if not settings.EMBEDDING_CACHE_ENABLED:
+            return None
+        db_path = settings.EMBEDDING_CACHE_PATH or str(
+            Path(settings.VECTOR_DB_PATH) / "embedding_cache.db"
+        )
+        return EmbeddingCacheRepository(
+            db_path=db_path,
+            max_bytes=settings.EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+        )
+
+    @classmethod
+    def create_embeddings_service(
+        cls, limiter: Optional[ProviderLimiter] = None
+    ) -> EmbeddingsService:
+        if settings.EMBEDDING_BACKEND == "hashing":
+            # Computed locally: neither the cache nor a rate limit pays off.
+            return HashingEmbeddingsService(
+                dimensions=settings.LOCAL_EMBEDDING_DIMENSIONS,
+                max_batch_size=settings.EMBEDDING_BATCH_SIZE,
+                max_batch_tokens=settings.EMBEDDING_BATCH_TOKENS,
+                max_concurrency=settings.EMBEDDING_CONCURRENCY,
+            )
+        if limiter is None:
+            name = f"embedding:{settings.EMBEDDING_MODEL}"
+            limiter = provider_limiters.get(
+                name,
+                lambda: cls.create_provider_limiter(
+                    name, settings.EMBEDDING_RATE_LIMIT_RPM, settings.EMBEDDING_RATE_LIMIT_TPM
+                ),
+            )
+        return EmbeddingsService(
+            model=settings.EMBEDDING_MODEL,
+            max_batch_size=settings.EMBEDDING_BATCH_SIZE,
+            max_batch_tokens=settings.EMBEDDING_BATCH_TOKENS,
+            max_concurrency=settings.EMBEDDING_CONCURRENCY,
+            cache=cls.create_embedding_cache(),
+            limiter=limiter,
+        )
 
     @staticmethod
-    def create_embeddings_service() -> EmbeddingsService:
-        return EmbeddingsService()
+    def create_chroma_repository(user_id: Optional[str] = None) -> ChromaRepository:
+        collection_name = tenant_collection_name(settings.COLLECTION_NAME, user_id)
+        hnsw = dict(
+            space=settings.HNSW_SPACE,
+            hnsw_m=settings.HNSW_M,
+            construction_ef=settings.HNSW_CONSTRUCTION_EF,
+            search_ef=settings.HNSW_SEARCH_EF,
+        )
+        if settings.VECTOR_QUANTIZATION != "none":
+            return QuantizedChromaRepository(
+                collection_name=collection_name,
+                dtype=settings.VECTOR_QUANTIZATION,
+                rerank_factor=settings.VECTOR_RERANK_FACTOR,
+                **hnsw,
+            )
+        return ChromaRepository(collection_name=collection_name, **hnsw)
+
+    @classmethod
+    def create_vector_repository(cls, user_id: Optional[str] = None) -> BaseRepository:
+        """
+        Opens the vector store of a user, or the shared one when no user is
+        given. Each user has a collection of its own, so searches only scan
+        that user's chunks.
+        """
+        if settings.VECTOR_BACKEND == "numpy":
+            return NumpyRepository(
+                collection_name=tenant_collection_name(settings.COLLECTION_NAME, user_id),
+                compaction_threshold=settings.VECTOR_COMPACTION_THRESHOLD,
+                space=settings.HNSW_SPACE,
+            )
+        return cls.create_chroma_repository(user_id)
 
     @staticmethod
-    def create_chroma_repository() -> ChromaRepository:
-        return ChromaRepository(collection_name=settings.COLLECTION_NAME)
+    def create_lexical_index(user_id: Optional[str] = None) -> Optional[LexicalIndexRepository]:
+        if not settings.LEXICAL_INDEX_ENABLED:
+            return None
+        db_path = Path(
+            settings.LEXICAL_INDEX_PATH or Path(settings.VECTOR_DB_PATH) / "lexical_index.db"
+        )
+        if user_id:
+            # One index per user, next to the shared one: "lexical_index_<user>.db"
+            name = tenant_collection_name(db_path.stem, user_id)
+            db_path = db_path.with_name(f"{name}{db_path.suffix}")
+        return LexicalIndexRepository(db_path=str(db_path))
 
     @staticmethod
     def create_document_repository() -> DocumentRepository:
@@ -52,39 +170,213 @@ class AppFactory:
     def create_user_repository(cls) -> UserRepository:
         return UserRepository(document_repo=cls.create_document_repository())
 
+    @staticmethod
+    def create_embedding_coalescer(
+        embeddings_service: EmbeddingsService,
+    ) -> Optional[EmbeddingCoalescer]:
+        if settings.EMBEDDING_COALESCE_WINDOW_MS <= 0:
+            return None
+        return EmbeddingCoalescer(
+            embeddings_service=embeddings_service,
+            window_ms=settings.EMBEDDING_COALESCE_WINDOW_MS,
+            max_batch_size=settings.EMBEDDING_COALESCE_MAX_BATCH,
+            max_inflight_batches=settings.EMBEDDING_COALESCE_MAX_INFLIGHT,
+        )
+
     @classmethod
-    def create_retrieval_service(cls) -> RetrievalService:
+    def create_retrieval_service(cls, user_id: Optional[str] = None) -> RetrievalService:
+        embeddings_service = cls.create_embeddings_service()
         return RetrievalService(
-            repository=cls.create_chroma_repository(),
+            repository=cls.create_vector_repository(user_id),
+            embeddings_service=embeddings_service,
+            coalescer=cls.create_embedding_coalescer(embeddings_service),
+            lexical_index=cls.create_lexical_index(user_id),
+            hybrid_candidates=settings.HYBRID_CANDIDATES,
+            rrf_k=settings.HYBRID_RRF_K,
+            mmr_fetch_k=settings.MMR_FETCH_K,
+            mmr_lambda=settings.MMR_LAMBDA,
+        )
+
+    @classmethod
+    def create_answer_cache(
+        cls, user_id: Optional[str] = None
+    ) -> Optional[SemanticAnswerCache]:
+        """
+        Builds the semantic answer cache. When a user is given, its answers
+        are invalidated as the user's documents are re-ingested.
+        """
+        if not settings.ANSWER_CACHE_ENABLED:
+            return None
+        return SemanticAnswerCache(
             embeddings_service=cls.create_embeddings_service(),
+            manifest_repo=cls.create_manifest_repository(user_id) if user_id else None,
+            similarity_threshold=settings.ANSWER_CACHE_SIMILARITY,
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+            max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+        )
+
+    @staticmethod
+    def create_context_packer() -> ContextPacker:
+        model = settings.DEFAULT_MODEL
+        budget = settings.CONTEXT_TOKEN_BUDGETS.get(model, settings.CONTEXT_TOKEN_BUDGET)
+        return ContextPacker(
+            model=model,
+            max_tokens=budget or None,
+            reserved_tokens=settings.CONTEXT_RESERVED_TOKENS,
+            history_share=settings.CONTEXT_HISTORY_SHARE,
         )
 
     @classmethod
-    def create_rag_pipeline(cls) -> RAGPipeline:
+    def create_rag_pipeline(
+        cls,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+        retrieval_service: Optional[RetrievalService] = None,
+    ) -> RAGPipeline:
         return RAGPipeline(
-            retrieval_service=cls.create_retrieval_service(),
+            retrieval_service=retrieval_service or cls.create_retrieval_service(),
             llm_service=cls.create_llm_service(),
+            answer_cache=answer_cache,
+            context_packer=cls.create_context_packer(),
         )
 
     @classmethod
-    def create_conversation_graph(cls):
+    def create_conversation_graph(cls, user_id: Optional[str] = None):
+        """
+        Builds the compiled conversation graph. The graph holds no per-session
+        state, so a single instance can serve every session of a user and
+        they all share its embedding coalescer. Given a user, retrieval only
+        searches that user's collection.
+        """
+        answer_cache = cls.create_answer_cache(user_id)
+        retrieval_service = cls.create_retrieval_service(user_id)
         graph = ConversationGraph(
             llm_service=cls.create_llm_service(),
-            retrieval_service=cls.create_retrieval_service(),
-            rag_pipeline=cls.create_rag_pipeline(),
+            retrieval_service=retrieval_service,
+            rag_pipeline=cls.create_rag_pipeline(answer_cache, retrieval_service),
+            answer_cache=answer_cache,
+            top_k=settings.RETRIEVAL_TOP_K,
         )
         graph.build()
         return graph.compile()
 
+    @staticmethod
+    def create_ingestion_pipeline(
+        doc_factory: DocumentFactory, embeddings_service: EmbeddingsService
+    ) -> IngestionPipeline:
+        return IngestionPipeline(
+            doc_factory=doc_factory,
+            embeddings_service=embeddings_service,
+            parse_workers=settings.INGESTION_PARSE_WORKERS,
+            embed_workers=settings.INGESTION_EMBED_WORKERS,
+            queue_size=settings.INGESTION_QUEUE_SIZE,
+            window_size=settings.INGESTION_WINDOW_SIZE,
+            stream_threshold_bytes=settings.INGESTION_STREAM_THRESHOLD_MB * 1024 * 1024,
+        )
+
+    @staticmethod
+    def create_manifest_repository(user_id: str) -> ManifestRepository:
+        return ManifestRepository(
+            db_path=str(Path("documents") / user_id / IngestionService.MANIFEST_NAME)
+        )
+
     @classmethod
     def create_ingestion_service(cls, user_id: str) -> IngestionService:
         user_repo = cls.create_user_repository()
         user = user_repo.get_by_id(user_id)
+        doc_factory = cls.create_document_factory()
+        embeddings_service = cls.create_embeddings_service()
 
         return IngestionService(
             user=user,
-            chroma_repo=cls.create_chroma_repository(),
-            doc_factory=cls.create_document_factory(),
-            embeddings_service=cls.create_embeddings_service(),
+            chroma_repo=cls.create_vector_repository(user_id),
+            doc_factory=doc_factory,
+            embeddings_service=embeddings_service,
             base_doc_path="documents",  # Pass the base path here
-        )
\ No newline at end of file
+            pipeline=cls.create_ingestion_pipeline(doc_factory, embeddings_service),
+            manifest_repo=cls.create_manifest_repository(user_id),
+            lexical_index=cls.create_lexical_index(user_id),
+        )
+
+    @classmethod
+    def create_shared_ingestion_service(
+        cls,
+        user_id: str,
+        pipeline: IngestionPipeline,
+        user_repo: Optional[UserRepository] = None,
+    ) -> IngestionService:
+        """Builds a user's ingestion service on a pipeline shared with other users."""
+        user_repo = user_repo or cls.create_user_repository()
+        return IngestionService(
+            user=user_repo.get_by_id(user_id),
+            chroma_repo=cls.create_vector_repository(user_id),
+            doc_factory=pipeline.doc_factory,
+            embeddings_service=pipeline.embeddings_service,
+            base_doc_path="documents",
+            pipeline=pipeline,
+            manifest_repo=cls.create_manifest_repository(user_id),
+            lexical_index=cls.create_lexical_index(user_id),
+        )
+
+    @classmethod
+    def create_bulk_ingestion_service(
+        cls,
+        user_ids: Optional[List[str]] = None,
+        embedding_rpm: Optional[int] = None,
+    ) -> BulkIngestionService:
+        """
+        Builds a bulk ingestion for the given users, or for every user with a
+        document directory. All users share one pipeline and one
+        embedding-rate budget; each writes to its own collection.
+        """
+        document_repo = cls.create_document_repository()
+        user_repo = UserRepository(document_repo=document_repo)
+        if user_ids is None:
+            user_ids = document_repo.list_users()
+        limiter = None
+        if embedding_rpm is not None:
+            # An explicit budget gets its own limiter instead of the shared one.
+            name = f"embedding:{settings.EMBEDDING_MODEL}:bulk"
+            limiter = provider_limiters.get(
+                name,
+                lambda: cls.create_provider_limiter(
+                    name, embedding_rpm, settings.EMBEDDING_RATE_LIMIT_TPM
+                ),
+            )
+
+        doc_factory = cls.create_document_factory()
+        embeddings_service = cls.create_embeddings_service(limiter=limiter)
+        pipeline = cls.create_ingestion_pipeline(doc_factory, embeddings_service)
+
+        services = [
+            cls.create_shared_ingestion_service(user_id, pipeline, user_repo)
+            for user_id in user_ids
+        ]
+        return BulkIngestionService(services=services, pipeline=pipeline)
+
+    @classmethod
+    def create_ingestion_watcher(
+        cls,
+        user_ids: Optional[List[str]] = None,
+        embedding_rpm: Optional[int] = None,
+    ) -> IngestionWatcher:
+        """
+        Builds the watcher of the given users, or of every user with a
+        document directory, including those created while it runs.
+        """
+        bulk_service = cls.create_bulk_ingestion_service(user_ids, embedding_rpm)
+        list_users = create_service = None
+        if user_ids is None:
+            document_repo = cls.create_document_repository()
+            user_repo = UserRepository(document_repo=document_repo)
+            list_users = document_repo.list_users
+            create_service = lambda user_id: cls.create_shared_ingestion_service(
+                user_id, bulk_service.pipeline, user_repo
+            )
+        return IngestionWatcher(
+            bulk_service=bulk_service,
+            poll_interval=settings.WATCH_POLL_INTERVAL_SECONDS,
+            debounce_seconds=settings.WATCH_DEBOUNCE_SECONDS,
+            list_users=list_users,
+            create_service=create_service,
+            user_refresh_seconds=settings.WATCH_USER_REFRESH_SECONDS,
+        )
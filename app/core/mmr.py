@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""Maximal marginal relevance selection of search results."""
+from typing import List
+
+import numpy as np
+
+
+def maximal_marginal_relevance(
+    query: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float = 0.5
+) -> List[int]:
+    """
+    Picks ``k`` candidates that are relevant to the query but not to each other.
+
+    Each step takes the candidate maximizing
+    ``lambda_mult * sim(query, c) - (1 - lambda_mult) * max(sim(c, s))`` over
+    the candidates ``s`` already picked, with cosine similarities. Both
+    similarity matrices are computed once, up front; each step only folds one
+    row of the candidate matrix into the running maximum.
+
+    Args:
+        query: The (dimensions,) query vector.
+        candidates: The (n, dimensions) candidate vectors, best first.
+        k: The number of candidates to pick.
+        lambda_mult: 1 ranks by relevance only, 0 by diversity only.
+
+    Returns:
+        The indexes of the picked candidates, in the order they were picked.
+    """
+    k = min(k, len(candidates))
+    if k <= 0:
+        return []
+    candidates = np.asarray(candidates, dtype=np.float32)
+    query = np.asarray(query, dtype=np.float32)
+    unit = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    relevance = unit @ (query / max(float(np.linalg.norm(query)), 1e-12))
+    similarity = unit @ unit.T
+
+    picked = [int(np.argmax(relevance))]
+    redundancy = similarity[picked[0]].copy()
+    for _ in range(k - 1):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[picked] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return picked
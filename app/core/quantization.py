@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""Scalar quantization of embedding vectors."""
+from typing import Tuple
+
+import numpy as np
+
+# Supported storage types, with their size in bytes per dimension.
+QUANTIZATION_DTYPES = {"int8": 1, "float16": 2}
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compresses float vectors into ``dtype`` codes with a per-vector scale.
+
+    int8 uses symmetric quantization: each vector is divided by its largest
+    absolute component over 127, so every vector uses the full code range
+    regardless of its magnitude. float16 stores the values as-is (scale 1).
+
+    Args:
+        vectors: A (n, dimensions) array of vectors.
+        dtype: "int8" or "float16".
+
+    Returns:
+        The (n, dimensions) codes and the (n,) float32 scales.
+    """
+    if dtype not in QUANTIZATION_DTYPES:
+        raise ValueError(f"Unsupported quantization type: {dtype}")
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim != 2:
+        raise ValueError("Expected a 2-D array of vectors.")
+
+    if dtype == "float16":
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[:, None]).clip(-127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """
+    Restores approximate float32 vectors from their codes and scales.
+
+    Args:
+        codes: The (n, dimensions) codes returned by ``quantize``.
+        scales: The (n,) scales returned by ``quantize``.
+
+    Returns:
+        The (n, dimensions) float32 vectors.
+    """
+    return codes.astype(np.float32) * np.asarray(scales, dtype=np.float32)[:, None]
@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+"""Client-side rate limiting for calls to external providers."""
+import asyncio
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from app.core.logger import logger
+
+T = TypeVar("T")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheaply estimates the number of tokens in a text.
+
+    Uses ~3 characters per token, which errs on the safe side for
+    Portuguese text with OpenAI tokenizers.
+    """
+    return len(text) // 3 + 1
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket that limits how many units are spent per minute.
+
+    A single instance can be shared by every component that draws on the
+    same provider budget, e.g. all embedding services of a bulk ingestion.
+    """
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        """
+        Initializes the limiter.
+
+        Args:
+            per_minute: Number of units refilled per minute.
+            burst: Bucket capacity. Defaults to ten seconds' worth of units.
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, burst if burst is not None else self.rate * 10)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        """Adds the units accumulated since the last refill. Requires the lock."""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def _try_acquire(self, amount: float) -> float:
+        """Spends ``amount`` units if available; otherwise returns the delay to wait."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0.0
+            return (amount - self._tokens) / self.rate
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """
+        Blocks until ``amount`` units are available and spends them.
+
+        Args:
+            amount: Number of units to spend. Amounts above the capacity
+                are capped, so they wait for a full bucket instead of forever.
+
+        Returns:
+            The number of seconds spent waiting.
+        """
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            delay = self._try_acquire(amount)
+            if not delay:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    async def aacquire(self, amount: float = 1.0) -> float:
+        """
+        Same as ``acquire``, but waits without blocking the event loop.
+
+        Args:
+            amount: Number of units to spend.
+
+        Returns:
+            The number of seconds spent waiting.
+        """
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            delay = self._try_acquire(amount)
+            if not delay:
+                return waited
+            await asyncio.sleep(delay)
+            waited += delay
+
+
+@dataclass
+class LimiterStats:
+    """Snapshot of a provider limiter's state and counters."""
+
+    name: str
+    concurrency_limit: int
+    in_flight: int
+    queued: int
+    requests: int
+    throttled: int
+    retries: int
+    failures: int
+    waited_seconds: float
+
+
+class ProviderLimiter:
+    """
+    Admission control for the calls made to one provider model.
+
+    Each call first draws from a requests-per-minute and a tokens-per-minute
+    bucket, then waits for one of the concurrency slots. The number of slots
+    adapts with AIMD: it grows by about one per round of successful calls
+    and is halved when the provider throttles us, converging on the highest
+    sustainable concurrency. Throttled (429) and transient (408/5xx) errors
+    are retried with exponential backoff and full jitter.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_concurrency: int = 16,
+        initial_concurrency: int = 4,
+        max_retries: int = 5,
+        backoff_base_seconds: float = 0.5,
+        backoff_max_seconds: float = 30.0,
+        decrease_cooldown_seconds: float = 1.0,
+    ):
+        """
+        Initializes the limiter.
+
+        Args:
+            name: Name used in logs and stats, e.g. "llm:gpt-4".
+            requests_per_minute: Request budget; 0 disables it.
+            tokens_per_minute: Estimated token budget; 0 disables it.
+            max_concurrency: Upper bound of the adaptive concurrency.
+            initial_concurrency: Concurrency to start from.
+            max_retries: Retries of a throttled or failed call before giving up.
+            backoff_base_seconds: Backoff ceiling of the first retry, doubled
+                on each following one.
+            backoff_max_seconds: Maximum backoff ceiling.
+            decrease_cooldown_seconds: Minimum time between two decreases,
+                so a burst of 429s from one overload only halves once.
+        """
+        self.name = name
+        self.requests = RateLimiter(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = RateLimiter(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.decrease_cooldown_seconds = decrease_cooldown_seconds
+
+        self._limit = float(min(max(1, initial_concurrency), self.max_concurrency))
+        self._last_decrease = 0.0
+        self._in_flight = 0
+        self._queued = 0
+        self._request_count = 0
+        self._throttled_count = 0
+        self._retry_count = 0
+        self._failure_count = 0
+        self._waited_seconds = 0.0
+        self._condition = threading.Condition()
+
+    @staticmethod
+    def classify(error: Exception) -> Optional[str]:
+        """
+        Classifies a provider error.
+
+        Returns:
+            "throttled" for 429s, "transient" for timeouts, connection
+            errors and 5xx, or None for errors that must not be retried.
+        """
+        status = getattr(error, "status_code", None)
+        if status == 429:
+            return "throttled"
+        if isinstance(status, int) and (status == 408 or status >= 500):
+            return "transient"
+        if status is None and isinstance(error, (ConnectionError, TimeoutError)):
+            return "transient"
+        return None
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number ``attempt``."""
+        ceiling = min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+    # --- Concurrency slots -------------------------------------------------
+
+    def _try_enter(self) -> bool:
+        """Takes a slot if one is free. Requires the condition's lock."""
+        if self._in_flight < int(self._limit):
+            self._in_flight += 1
+            return True
+        return False
+
+    def _enter(self):
+        """Blocks until a concurrency slot is free."""
+        with self._condition:
+            self._queued += 1
+            try:
+                while not self._try_enter():
+                    self._condition.wait()
+            finally:
+                self._queued -= 1
+
+    async def _aenter(self):
+        """Waits for a concurrency slot without blocking the event loop."""
+        with self._condition:
+            if self._try_enter():
+                return
+            self._queued += 1
+        delay = 0.001
+        try:
+            while True:
+                await asyncio.sleep(delay)
+                with self._condition:
+                    if self._try_enter():
+                        return
+                delay = min(delay * 2, 0.05)
+        finally:
+            with self._condition:
+                self._queued -= 1
+
+    def _exit(self, outcome: Optional[str]):
+        """Releases a slot and adapts the concurrency to the call's outcome."""
+        with self._condition:
+            self._in_flight -= 1
+            self._request_count += 1
+            if outcome is None:
+                # Additive increase: about +1 once every slot saw a success.
+                self._limit = min(self.max_concurrency, self._limit + 1 / self._limit)
+            elif outcome == "throttled":
+                self._throttled_count += 1
+                now = time.monotonic()
+                if now - self._last_decrease >= self.decrease_cooldown_seconds:
+                    self._limit = max(1.0, self._limit / 2)
+                    self._last_decrease = now
+                    logger.warning(
+                        f"{self.name}: throttled by the provider, concurrency "
+                        f"reduced to {int(self._limit)}."
+                    )
+            self._condition.notify_all()
+
+    # --- Calls -------------------------------------------------------------
+
+    def _record_wait(self, seconds: float):
+        with self._condition:
+            self._waited_seconds += seconds
+
+    def call(self, fn: Callable[[], T], tokens: int = 0) -> T:
+        """
+        Runs a provider call under the limits, retrying throttled and
+        transient failures.
+
+        Args:
+            fn: The call to make.
+            tokens: Estimated tokens consumed by the call.
+
+        Returns:
+            The result of ``fn``.
+        """
+        attempt = 0
+        while True:
+            waited = self.requests.acquire() if self.requests else 0.0
+            waited += self.tokens.acquire(tokens) if self.tokens and tokens else 0.0
+            self._record_wait(waited)
+
+            self._enter()
+            outcome = None
+            try:
+                return fn()
+            except Exception as e:
+                outcome = self.classify(e) or "failed"
+                if outcome == "failed" or attempt >= self.max_retries:
+                    with self._condition:
+                        self._failure_count += 1
+                    raise
+            finally:
+                self._exit(outcome)
+
+            delay = self._backoff(attempt)
+            attempt += 1
+            with self._condition:
+                self._retry_count += 1
+            logger.debug(f"{self.name}: {outcome} error, retry {attempt} in {delay:.2f}s.")
+            time.sleep(delay)
+
+    async def acall(self, fn: Callable[[], Awaitable[T]], tokens: int = 0) -> T:
+        """
+        Async counterpart of ``call``.
+
+        Args:
+            fn: Returns the awaitable of the call to make.
+            tokens: Estimated tokens consumed by the call.
+
+        Returns:
+            The result of the awaitable.
+        """
+        attempt = 0
+        while True:
+            waited = await self.requests.aacquire() if self.requests else 0.0
+            waited += await self.tokens.aacquire(tokens) if self.tokens and tokens else 0.0
+            self._record_wait(waited)
+
+            await self._aenter()
+            outcome = None
+            try:
+                return await fn()
+            except Exception as e:
+                outcome = self.classify(e) or "failed"
+                if outcome == "failed" or attempt >= self.max_retries:
+                    with self._condition:
+                        self._failure_count += 1
+                    raise
+            finally:
+                self._exit(outcome)
+
+            delay = self._backoff(attempt)
+            attempt += 1
+            with self._condition:
+                self._retry_count += 1
+            logger.debug(f"{self.name}: {outcome} error, retry {attempt} in {delay:.2f}s.")
+            await asyncio.sleep(delay)
+
+    def stats(self) -> LimiterStats:
+        """Returns the current queue depth, concurrency and counters."""
+        with self._condition:
+            return LimiterStats(
+                name=self.name,
+                concurrency_limit=int(self._limit),
+                in_flight=self._in_flight,
+                queued=self._queued,
+                requests=self._request_count,
+                throttled=self._throttled_count,
+                retries=self._retry_count,
+                failures=self._failure_count,
+                waited_seconds=round(self._waited_seconds, 3),
+            )
+
+
+class ProviderLimiterRegistry:
+    """Process-wide provider limiters, one per name, shared by every service."""
+
+    def __init__(self):
+        self._limiters: Dict[str, ProviderLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, create: Callable[[], ProviderLimiter]) -> ProviderLimiter:
+        """
+        Returns the limiter registered under a name, creating it on first use.
+
+        Args:
+            name: The limiter's name, e.g. "llm:gpt-4".
+            create: Builds the limiter if it does not exist yet.
+        """
+        with self._lock:
+            if name not in self._limiters:
+                self._limiters[name] = create()
+            return self._limiters[name]
+
+    def stats(self) -> Dict[str, LimiterStats]:
+        """Returns the stats of every registered limiter."""
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {limiter.name: limiter.stats() for limiter in limiters}
+
+
+provider_limiters = ProviderLimiterRegistry()
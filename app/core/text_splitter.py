@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Recursive character text splitter that tracks chunk offsets."""
+import copy
+from collections import deque
+from typing import Deque, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document as LangchainDocument
+
+# A [start, end) range of character offsets into the text being split.
+Span = Tuple[int, int]
+
+
+class RecursiveTextSplitter:
+    """
+    Drop-in replacement for LangChain's ``RecursiveCharacterTextSplitter``
+    (with ``length_function=len`` and ``keep_separator=True``).
+
+    It produces the same chunks, but works on character offsets into the
+    original text instead of building intermediate substrings. No regex is
+    used and every chunk is sliced from the text exactly once. The offsets
+    are recorded in each chunk's metadata as ``start_index``/``end_index``.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int,
+        chunk_overlap: int,
+        separators: Optional[List[str]] = None,
+    ):
+        """
+        Initializes the splitter.
+
+        Args:
+            chunk_size: Maximum number of characters per chunk.
+            chunk_overlap: Number of characters shared by consecutive chunks.
+            separators: Separators to try, from coarsest to finest.
+        """
+        if chunk_overlap > chunk_size:
+            raise ValueError(
+                f"Got a larger chunk overlap ({chunk_overlap}) than chunk size "
+                f"({chunk_size}), should be smaller."
+            )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or ["\n\n", "\n", " ", ""]
+
+    def split_spans(self, text: str) -> List[Span]:
+        """
+        Splits a text into chunk offsets.
+
+        Args:
+            text: The text to split.
+
+        Returns:
+            The [start, end) offsets of each chunk, in order.
+        """
+        spans: List[Span] = []
+        self._split(text, 0, len(text), self.separators, spans)
+        return spans
+
+    def split_text(self, text: str) -> List[str]:
+        """
+        Splits a text into chunks.
+
+        Args:
+            text: The text to split.
+
+        Returns:
+            The text of each chunk, in order.
+        """
+        return [text[start:end] for start, end in self.split_spans(text)]
+
+    def split_documents(
+        self, documents: Iterable[LangchainDocument]
+    ) -> List[LangchainDocument]:
+        """
+        Splits LangChain documents, annotating each chunk with its offsets.
+
+        Args:
+            documents: The documents to split.
+
+        Returns:
+            One document per chunk, carrying a copy of its parent's metadata
+            plus ``start_index`` and ``end_index``.
+        """
+        chunks = []
+        for doc in documents:
+            text = doc.page_content
+            for start, end in self.split_spans(text):
+                metadata = copy.deepcopy(doc.metadata)
+                metadata["start_index"] = start
+                metadata["end_index"] = end
+                chunks.append(LangchainDocument(page_content=text[start:end], metadata=metadata))
+        return chunks
+
+    def _split(self, text: str, start: int, end: int, separators: List[str], out: List[Span]):
+        """Recursively splits ``text[start:end]``, appending chunk spans to ``out``."""
+        # Use the coarsest separator present in the range.
+        separator = separators[-1]
+        finer_separators: List[str] = []
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                separator = candidate
+                break
+            if text.find(candidate, start, end) != -1:
+                separator = candidate
+                finer_separators = separators[i + 1 :]
+                break
+
+        small_pieces: List[Span] = []
+        for piece in self._pieces(text, start, end, separator):
+            if piece[1] - piece[0] < self.chunk_size:
+                small_pieces.append(piece)
+                continue
+
+            if small_pieces:
+                self._merge(text, small_pieces, out)
+                small_pieces = []
+            if finer_separators:
+                self._split(text, piece[0], piece[1], finer_separators, out)
+            else:
+                out.append(piece)
+
+        if small_pieces:
+            self._merge(text, small_pieces, out)
+
+    @staticmethod
+    def _pieces(text: str, start: int, end: int, separator: str) -> List[Span]:
+        """Cuts a range before each separator occurrence, dropping empty pieces."""
+        if separator == "":
+            return [(i, i + 1) for i in range(start, end)]
+
+        pieces: List[Span] = []
+        piece_start = start
+        position = text.find(separator, start, end)
+        while position != -1:
+            if position > piece_start:
+                pieces.append((piece_start, position))
+            # The separator stays at the beginning of the next piece.
+            piece_start = position
+            position = text.find(separator, position + len(separator), end)
+        if end > piece_start:
+            pieces.append((piece_start, end))
+        return pieces
+
+    def _merge(self, text: str, pieces: List[Span], out: List[Span]):
+        """Greedily merges contiguous pieces into overlapping chunks."""
+        current: Deque[Span] = deque()
+        total = 0
+        for piece in pieces:
+            length = piece[1] - piece[0]
+            if total + length > self.chunk_size and current:
+                self._emit(text, current[0][0], current[-1][1], out)
+                # Drop pieces from the front until only the overlap is left.
+                while total > self.chunk_overlap or (
+                    total + length > self.chunk_size and total > 0
+                ):
+                    first = current.popleft()
+                    total -= first[1] - first[0]
+            current.append(piece)
+            total += length
+
+        if current:
+            self._emit(text, current[0][0], current[-1][1], out)
+
+    @staticmethod
+    def _emit(text: str, start: int, end: int, out: List[Span]):
+        """Appends a chunk span with surrounding whitespace trimmed, if not empty."""
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            out.append((start, end))
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Portuguese-aware tokenization for lexical search."""
+import re
+import unicodedata
+from typing import List
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+# Accent-folded, so they match the folded tokens.
+PORTUGUESE_STOPWORDS = frozenset(
+    """
+    a ao aos aquela aquelas aquele aqueles aquilo as ate com como da das de dela
+    delas dele deles depois do dos e ela elas ele eles em entre era eram essa essas
+    esse esses esta estao estas este estes eu foi foram ha isso isto ja la lhe lhes
+    mais mas me mesmo meu minha muito na nao nas nem no nos nossa nosso num numa o
+    os ou para pela pelas pelo pelos por qual quando que quem se sem ser seu seus
+    so sua suas tambem te tem tinha um uma umas uns voce voces vos
+    """.split()
+)
+
+
+def fold_accents(text: str) -> str:
+    """Removes diacritics, so "crédito" and "credito" become the same term."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits a text into lowercase, accent-folded terms, without stopwords.
+
+    Numbers and codes are kept as terms, so "contrato nº 2024/015" yields
+    ["contrato", "2024", "015"].
+
+    Args:
+        text: The text to tokenize.
+
+    Returns:
+        The terms, in order, with repetitions.
+    """
+    return [
+        token
+        for token in _TOKEN_PATTERN.findall(fold_accents(text.lower()))
+        if token not in PORTUGUESE_STOPWORDS
+    ]
@@ -1,13 +1,19 @@
 # -*- coding: utf-8 -*-
 """Graph for managing conversations."""
-from typing import List, Optional
+import hashlib
+import time
+from typing import Callable, List, Optional, Tuple
 from langgraph.graph import END
-from langchain_core.messages import AIMessage
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
 
+from app.core.logger import logger
 from app.graphs.base_graph import BaseGraph
 from app.services.llm_service import LLMService
 from app.services.retrieval_service import RetrievalService
 from app.services.rag_pipeline import RAGPipeline
+from app.services.answer_cache import SemanticAnswerCache
+from app.models.document import Document
 from app.models.history import HistoryItem
 from graph.state import AgentState
 from graph.nodes.initial_request import create_initial_request_node
@@ -21,11 +27,16 @@ class ConversationGraph(BaseGraph):
         llm_service: LLMService,
         retrieval_service: RetrievalService,
         rag_pipeline: RAGPipeline,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+        top_k: int = 5,
     ):
         super().__init__()
         self.llm_service = llm_service
         self.retrieval_service = retrieval_service
         self.rag_pipeline = rag_pipeline
+        self.answer_cache = answer_cache
+        # Documents retrieved per turn, which form the answer's context.
+        self.top_k = top_k
 
     def _get_initial_state(self) -> dict:
         return AgentState
@@ -34,22 +45,196 @@ class ConversationGraph(BaseGraph):
         """Retrieve context from the vector store."""
         return {}
 
-    def generate_answer(self, state):
-        """Generate an answer using the RAG pipeline."""
+    @staticmethod
+    def _cache_key(state) -> Optional[Tuple[str, str]]:
+        """
+        Returns the key of the answer cache: the latest human message and a
+        digest of the turns before it.
+
+        The answer is generated from the whole history, so a follow-up is only
+        answered from the cache after the same previous turns. Questions that
+        open a conversation share the empty digest.
+        """
+        messages = state.get("messages", [])
+        if not messages or not isinstance(messages[-1], HumanMessage):
+            return None
+        digest = ""
+        if len(messages) > 1:
+            history = "".join(
+                f"{message.type}\x00{message.content}\x00" for message in messages[:-1]
+            )
+            digest = hashlib.sha256(history.encode("utf-8")).hexdigest()
+        return messages[-1].content, digest
+
+    @staticmethod
+    def _token_callback(config) -> Optional[Callable[[str], None]]:
+        """
+        Returns the ``on_token`` callable of the run, if any. Callers pass it
+        as ``config={"configurable": {"on_token": callback}}`` to receive the
+        answer chunk by chunk while it is generated.
+
+        When the run also passes ``started_at``, a ``time.perf_counter()``
+        reading taken as the graph is invoked, the time to first token is
+        logged relative to it. It then covers the cache lookup, reformulation
+        and retrieval, not only the LLM call.
+        """
+        configurable = (config or {}).get("configurable") or {}
+        on_token = configurable.get("on_token")
+        started_at = configurable.get("started_at")
+        if on_token is None or started_at is None:
+            return on_token
+
+        first_token = True
+
+        def timed_on_token(token: str):
+            nonlocal first_token
+            if first_token:
+                first_token = False
+                logger.info(
+                    f"Time to first token: {(time.perf_counter() - started_at) * 1000:.0f} ms "
+                    f"since the graph was invoked."
+                )
+            on_token(token)
+
+        return timed_on_token
+
+    def _cached_answer_update(self, answer: Optional[str], config) -> dict:
+        """Builds the state update of a cache lookup, streaming a hit at once."""
+        if answer is None:
+            return {}
+        on_token = self._token_callback(config)
+        if on_token is not None:
+            on_token(answer)
+        return {"messages": [AIMessage(content=answer)]}
+
+    def check_cache(self, state, config=None):
+        """Answer from the semantic cache when a similar question was answered."""
+        key = self._cache_key(state)
+        if key is None:
+            return {}
+        question, conversation = key
+        answer = self.answer_cache.lookup(
+            question, source_name=state.get("source_name"), conversation=conversation
+        )
+        return self._cached_answer_update(answer, config)
+
+    async def acheck_cache(self, state, config=None):
+        """Answer from the semantic cache, asynchronously."""
+        key = self._cache_key(state)
+        if key is None:
+            return {}
+        question, conversation = key
+        answer = await self.answer_cache.alookup(
+            question, source_name=state.get("source_name"), conversation=conversation
+        )
+        return self._cached_answer_update(answer, config)
+
+    @staticmethod
+    def route_after_cache(state) -> str:
+        """Ends the run on a cache hit, which appended the answer."""
+        return "hit" if isinstance(state["messages"][-1], AIMessage) else "miss"
+
+    @staticmethod
+    def _context_documents(state) -> Optional[List[Document]]:
+        """The documents retrieved by initial_request, reused as the answer's context."""
+        search_results = state.get("search_results")
+        if search_results is None:
+            return None
+        return [result.document for result in search_results if result.document is not None]
+
+    def generate_answer(self, state, config=None):
+        """Generate an answer using the RAG pipeline, streaming it if requested."""
         reformulated_query = state["reformulated_query"]
-        search_results = state["search_results"]
         history = state.get("messages", [])
-        answer = self.rag_pipeline.execute(reformulated_query, history=history)
+        source_name = state.get("source_name")
+        context_documents = self._context_documents(state)
+        on_token = self._token_callback(config)
+        if on_token is None:
+            answer = self.rag_pipeline.execute(
+                reformulated_query,
+                history=history,
+                source_name=source_name,
+                context_documents=context_documents,
+            )
+        else:
+            tokens = []
+            for token in self.rag_pipeline.stream_execute(
+                reformulated_query,
+                history=history,
+                source_name=source_name,
+                context_documents=context_documents,
+            ):
+                on_token(token)
+                tokens.append(token)
+            answer = "".join(tokens)
+
+        key = self._cache_key(state)
+        if self.answer_cache is not None and key is not None:
+            question, conversation = key
+            self.answer_cache.store(
+                question, answer, source_name=source_name, conversation=conversation
+            )
+        return {"messages": [AIMessage(content=answer)]}
+
+    async def agenerate_answer(self, state, config=None):
+        """Generate an answer using the RAG pipeline, asynchronously."""
+        reformulated_query = state["reformulated_query"]
+        history = state.get("messages", [])
+        source_name = state.get("source_name")
+        context_documents = self._context_documents(state)
+        on_token = self._token_callback(config)
+        if on_token is None:
+            answer = await self.rag_pipeline.aexecute(
+                reformulated_query,
+                history=history,
+                source_name=source_name,
+                context_documents=context_documents,
+            )
+        else:
+            tokens = []
+            async for token in self.rag_pipeline.astream_execute(
+                reformulated_query,
+                history=history,
+                source_name=source_name,
+                context_documents=context_documents,
+            ):
+                on_token(token)
+                tokens.append(token)
+            answer = "".join(tokens)
+
+        key = self._cache_key(state)
+        if self.answer_cache is not None and key is not None:
+            question, conversation = key
+            await self.answer_cache.astore(
+                question, answer, source_name=source_name, conversation=conversation
+            )
         return {"messages": [AIMessage(content=answer)]}
 
     def build(self):
         """Build the graph."""
         initial_request_node = create_initial_request_node(
-            self.llm_service, self.retrieval_service
+            self.llm_service, self.retrieval_service, top_k=self.top_k
         )
         self.workflow.add_node("initial_request", initial_request_node)
-        self.workflow.add_node("generate_answer", self.generate_answer)
+        # Each node has a sync and an async implementation, so the compiled
+        # graph supports both invoke and ainvoke.
+        self.workflow.add_node(
+            "generate_answer",
+            RunnableLambda(self.generate_answer, afunc=self.agenerate_answer),
+        )
 
-        self.workflow.set_entry_point("initial_request")
+        if self.answer_cache is not None:
+            self.workflow.add_node(
+                "check_cache",
+                RunnableLambda(self.check_cache, afunc=self.acheck_cache),
+            )
+            self.workflow.set_entry_point("check_cache")
+            self.workflow.add_conditional_edges(
+                "check_cache",
+                self.route_after_cache,
+                {"hit": END, "miss": "initial_request"},
+            )
+        else:
+            self.workflow.set_entry_point("initial_request")
         self.workflow.add_edge("initial_request", "generate_answer")
         self.workflow.add_edge("generate_answer", END)
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""Pydantic model for representing an ingested file in the manifest."""
+import os
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+class ManifestEntry(BaseModel):
+    """
+    Represents the last successfully ingested version of a source file.
+    """
+
+    source_name: str
+    size: int
+    mtime_ns: int
+    inode: int
+    sha256: str
+    chunk_count: int = 0
+    embedding_model: Optional[str] = None
+    indexed_at: datetime = Field(default_factory=datetime.utcnow)
+
+    def matches_stat(self, stat: os.stat_result) -> bool:
+        """Checks whether a file's stat still matches the ingested version."""
+        return (self.size, self.mtime_ns, self.inode) == (
+            stat.st_size,
+            stat.st_mtime_ns,
+            stat.st_ino,
+        )
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+"""Pydantic model for representing a vector search hit."""
+from typing import Optional
+from pydantic import BaseModel
+
+from app.models.document import Document
+
+
+class SearchResult(BaseModel):
+    """
+    Represents a single hit of a similarity search.
+
+    Only the fields requested by the caller are filled in; ``id`` is always
+    present. ``distance`` comes from the vector search (lower is closer) and
+    ``score`` from a fused ranking such as hybrid retrieval (higher is better).
+    """
+
+    id: str
+    distance: Optional[float] = None
+    document: Optional[Document] = None
+    score: Optional[float] = None
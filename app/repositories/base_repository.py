@@ -1,24 +1,158 @@
 # -*- coding: utf-8 -*-
-"""Base class for all repositories."""
+"""Base class for all vector store repositories."""
+import asyncio
+import hashlib
+import re
 from abc import ABC, abstractmethod
-from typing import Any, List, Dict
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+from app.models.document import Document
+from app.models.search_result import SearchResult
+
+# Fields callers may request from query_many; ids are always returned.
+QUERY_FIELDS = ("distances", "documents")
+
+_UNSAFE_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_-]+")
+# ChromaDB accepts collection names of 3 to 63 characters.
+_MAX_NAME_LENGTH = 63
+
+
+def tenant_collection_name(base_name: str, tenant_id: Optional[str]) -> str:
+    """
+    Names the collection holding a tenant's documents.
+
+    The name is ``<base_name>_<tenant_id>``. Characters that collection names
+    or directory names cannot hold are replaced, and a short hash of the
+    tenant id is appended whenever the name had to be altered, so distinct
+    tenants never share a collection.
+
+    Args:
+        base_name: The collection name shared by every tenant.
+        tenant_id: The tenant, usually a user id. None names the shared collection.
+
+    Returns:
+        A valid collection name.
+    """
+    if not tenant_id:
+        return base_name
+    name = f"{base_name}_{tenant_id}"
+    safe = _UNSAFE_NAME_CHARS.sub("-", name).strip("_-")
+    if safe == name and len(name) <= _MAX_NAME_LENGTH:
+        return name
+    digest = hashlib.sha1(tenant_id.encode("utf-8")).hexdigest()[:8]
+    return f"{safe[: _MAX_NAME_LENGTH - len(digest) - 1].rstrip('_-')}_{digest}".lstrip("_-")
 
 
 class BaseRepository(ABC):
-    """Abstract base class for repositories."""
+    """
+    Abstract base class for vector store repositories.
+
+    Documents are stored with their embedding and filtered by their
+    ``source_name``; distances are squared L2 unless the store is configured
+    otherwise, lower being closer.
+    """
+
+    @abstractmethod
+    def add(self, documents: List[Document], embeddings: List[List[float]]):
+        """Add documents and their embeddings to the repository."""
+        pass
+
+    @abstractmethod
+    def update_metadata(self, documents: List[Document]):
+        """Overwrite the metadata of stored documents, keeping their embeddings."""
+        pass
+
+    @abstractmethod
+    def count(self) -> int:
+        """Return the number of stored documents."""
+        pass
 
     @abstractmethod
-    def add(self, items: List[Dict[str, Any]]):
-        """Add items to the repository."""
+    def get_ids(self, source_name: str) -> List[str]:
+        """List the ids of every document stored for a source."""
         pass
 
     @abstractmethod
-    def query(self, query_embedding: List[float], top_k: int) -> List[Dict[str, Any]]:
-        """Query the repository for similar items."""
+    def get_documents(self, ids: List[str]) -> List[Document]:
+        """Fetch stored documents by id, in the order of ``ids``."""
         pass
 
+    @abstractmethod
+    def get_embeddings(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """Fetch the stored embeddings of the given ids that exist."""
+        pass
+
+    @abstractmethod
+    def iter_documents(self, batch_size: int = 1000) -> Iterator[List[Document]]:
+        """Iterate over every stored document, in batches."""
+        pass
+
+    @abstractmethod
+    def delete(self, ids: List[str]):
+        """Delete documents from the repository."""
+        pass
+
+    @abstractmethod
+    def query_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: Union[int, List[int]] = 5,
+        source_names: Optional[List[Optional[str]]] = None,
+        include: Sequence[str] = QUERY_FIELDS,
+    ) -> List[List[SearchResult]]:
+        """Query the repository with several embeddings at once."""
+        pass
+
+    def query(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        source_name: Optional[str] = None,
+    ) -> List[Document]:
+        """
+        Query the repository for similar documents.
+
+        Args:
+            query_embedding: The vector embedding of the query text.
+            top_k: The number of results to return.
+            source_name: Optional source name to filter the search.
+
+        Returns:
+            A list of Document objects that are similar to the query text.
+        """
+        results = self.query_many(
+            [query_embedding], top_k=top_k, source_names=[source_name], include=["documents"]
+        )
+        return [result.document for result in results[0]]
+
+    async def aquery(self, *args, **kwargs) -> List[Document]:
+        """
+        Query the repository without blocking the event loop.
+
+        Stores with a blocking client run ``query`` in a worker thread;
+        stores with a native async client can override this.
+        """
+        return await asyncio.to_thread(self.query, *args, **kwargs)
+
     @abstractmethod
     def clear(self):
         """Clear all items from the repository."""
         pass
 
+    @staticmethod
+    def _normalize_query_options(
+        count: int,
+        top_k: Union[int, List[int]],
+        source_names: Optional[List[Optional[str]]],
+        include: Sequence[str],
+    ):
+        """Validates the options of ``query_many`` and expands them per query."""
+        unknown = set(include) - set(QUERY_FIELDS)
+        if unknown:
+            raise ValueError(f"Unsupported query fields: {sorted(unknown)}")
+        top_ks = [top_k] * count if isinstance(top_k, int) else list(top_k)
+        filters = list(source_names) if source_names is not None else [None] * count
+        if len(top_ks) != count or len(filters) != count:
+            raise ValueError("top_k and source_names must have one entry per query.")
+        return top_ks, filters
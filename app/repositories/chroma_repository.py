@@ -1,19 +1,108 @@
 # -*- coding: utf-8 -*-
 """Repository for interacting with ChromaDB."""
 import chromadb
-from typing import List, Optional
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Sequence, Union
 
 from app.core.config import settings
-from app.repositories.base_repository import BaseRepository
+from app.core.logger import logger
+from app.repositories.base_repository import QUERY_FIELDS, BaseRepository
 from app.models.document import Document
+from app.models.search_result import SearchResult
+
+
+# Distance functions of ChromaDB's HNSW index.
+HNSW_SPACES = ("l2", "ip", "cosine")
+# Parameters ChromaDB uses for collections created without them.
+_HNSW_DEFAULTS = {
+    "hnsw:space": "l2",
+    "hnsw:M": 16,
+    "hnsw:construction_ef": 100,
+    "hnsw:search_ef": 10,
+}
+
+
+def exact_distances(vectors: np.ndarray, queries: np.ndarray, space: str = "l2") -> np.ndarray:
+    """
+    Computes the distances ChromaDB reports, without the index.
+
+    Args:
+        vectors: The (n, d) stored vectors.
+        queries: The (q, d) query vectors.
+        space: "l2" (squared L2), "ip" (1 - inner product) or "cosine"
+            (1 - cosine similarity).
+
+    Returns:
+        The (q, n) distances, lower being closer.
+    """
+    if space == "l2":
+        return (
+            np.einsum("ij,ij->i", queries, queries)[:, None]
+            - 2 * queries @ vectors.T
+            + np.einsum("ij,ij->i", vectors, vectors)[None, :]
+        )
+    if space == "cosine":
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    return 1.0 - queries @ vectors.T
 
 
 class ChromaRepository(BaseRepository):
     """Repository for ChromaDB vector store."""
 
-    def __init__(self, collection_name: str):
+    def __init__(
+        self,
+        collection_name: str,
+        space: str = "l2",
+        hnsw_m: int = 16,
+        construction_ef: int = 100,
+        search_ef: int = 10,
+    ):
+        """
+        Opens the collection, creating it with the given HNSW parameters.
+
+        ChromaDB fixes the parameters of an index when the collection is
+        created; an existing collection keeps the ones it was built with.
+
+        Args:
+            collection_name: The ChromaDB collection to use.
+            space: Distance function, one of ``HNSW_SPACES``.
+            hnsw_m: Links per node; more improves recall at the cost of memory.
+            construction_ef: Candidate list size while building the index.
+            search_ef: Candidate list size while searching; more improves
+                recall at the cost of latency.
+        """
+        if space not in HNSW_SPACES:
+            raise ValueError(f"Unsupported HNSW space: {space}")
         self.client = chromadb.PersistentClient(path=settings.VECTOR_DB_PATH)
-        self.collection = self.client.get_or_create_collection(name=collection_name)
+        hnsw = {
+            "hnsw:space": space,
+            "hnsw:M": hnsw_m,
+            "hnsw:construction_ef": construction_ef,
+            "hnsw:search_ef": search_ef,
+        }
+        try:
+            self.collection = self.client.get_collection(name=collection_name)
+        except ValueError:
+            self.collection = self.client.get_or_create_collection(
+                name=collection_name, metadata=hnsw
+            )
+        metadata = self.collection.metadata or {}
+        built = {key: metadata.get(key, default) for key, default in _HNSW_DEFAULTS.items()}
+        self.space = built["hnsw:space"]
+        if built != hnsw:
+            logger.warning(
+                f"Collection '{collection_name}' keeps the HNSW parameters it was "
+                f"created with, {built}; re-create it to apply {hnsw}."
+            )
+
+    @staticmethod
+    def _to_metadata(doc: Document) -> dict:
+        """Builds the stored metadata of a document, including its source_name."""
+        # Store source_name in metadata for filtering
+        meta = dict(doc.metadata or {})
+        meta["source_name"] = doc.source_name
+        return meta
 
     def add(self, documents: List[Document], embeddings: List[List[float]]):
         """
@@ -23,66 +112,195 @@ class ChromaRepository(BaseRepository):
             documents: A list of Document objects.
             embeddings: A list of corresponding vector embeddings.
         """
-        # Store source_name in metadata for filtering
-        metadatas = []
-        for doc in documents:
-            meta = doc.metadata or {}
-            meta["source_name"] = doc.source_name
-            metadatas.append(meta)
-
-        ids = [doc.id for doc in documents]
-
         self.collection.add(
             embeddings=embeddings,
             documents=[doc.content for doc in documents],
-            metadatas=metadatas,
-            ids=ids,
+            metadatas=[self._to_metadata(doc) for doc in documents],
+            ids=[doc.id for doc in documents],
+        )
+
+    def update_metadata(self, documents: List[Document]):
+        """
+        Overwrite the stored metadata of existing documents, keeping their embeddings.
+
+        Args:
+            documents: Documents whose ids are already in the collection.
+        """
+        self.collection.update(
+            ids=[doc.id for doc in documents],
+            metadatas=[self._to_metadata(doc) for doc in documents],
         )
 
-    def query(
+    def count(self) -> int:
+        """Return the number of documents in the collection."""
+        return self.collection.count()
+
+    def get_ids(self, source_name: str) -> List[str]:
+        """
+        List the ids of every document stored for a source.
+
+        Args:
+            source_name: The source whose document ids should be listed.
+
+        Returns:
+            The ids of the source's documents.
+        """
+        results = self.collection.get(where={"source_name": source_name}, include=[])
+        return results["ids"]
+
+    def get_documents(self, ids: List[str]) -> List[Document]:
+        """
+        Fetch stored documents by id.
+
+        Args:
+            ids: The ids of the documents to fetch.
+
+        Returns:
+            The documents found, in the order of ``ids``.
+        """
+        if not ids:
+            return []
+        results = self.collection.get(ids=ids, include=["documents", "metadatas"])
+        found = {
+            doc_id: self._to_document(doc_id, content, metadata)
+            for doc_id, content, metadata in zip(
+                results["ids"], results["documents"], results["metadatas"]
+            )
+        }
+        return [found[doc_id] for doc_id in ids if doc_id in found]
+
+    def get_embeddings(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Fetch the stored embeddings of documents.
+
+        Args:
+            ids: The ids of the documents.
+
+        Returns:
+            A mapping from each id found to its float32 embedding.
+        """
+        if not ids:
+            return {}
+        results = self.collection.get(ids=ids, include=["embeddings"])
+        vectors = np.asarray(results["embeddings"], dtype=np.float32)
+        return dict(zip(results["ids"], vectors))
+
+    def iter_documents(self, batch_size: int = 1000) -> Iterator[List[Document]]:
+        """
+        Iterate over every stored document, in batches.
+
+        Args:
+            batch_size: The number of documents fetched per request.
+
+        Yields:
+            Lists of at most ``batch_size`` documents.
+        """
+        offset = 0
+        while True:
+            results = self.collection.get(
+                include=["documents", "metadatas"], limit=batch_size, offset=offset
+            )
+            if not results["ids"]:
+                return
+            yield [
+                self._to_document(doc_id, content, metadata)
+                for doc_id, content, metadata in zip(
+                    results["ids"], results["documents"], results["metadatas"]
+                )
+            ]
+            offset += len(results["ids"])
+
+    @staticmethod
+    def _to_document(doc_id: str, content: str, metadata: Optional[dict]) -> Document:
+        """Rebuilds a document from its stored content and metadata."""
+        metadata = dict(metadata or {})
+        source = metadata.pop("source_name", "unknown")
+        return Document(id=doc_id, content=content, source_name=source, metadata=metadata)
+
+    def delete(self, ids: List[str]):
+        """
+        Delete documents from the collection.
+
+        Args:
+            ids: The ids of the documents to delete.
+        """
+        if ids:
+            self.collection.delete(ids=ids)
+
+    def query_many(
         self,
-        query_embedding: List[float],
-        top_k: int = 5,
-        source_name: Optional[str] = None,
-    ) -> List[Document]:
+        query_embeddings: List[List[float]],
+        top_k: Union[int, List[int]] = 5,
+        source_names: Optional[List[Optional[str]]] = None,
+        include: Sequence[str] = QUERY_FIELDS,
+    ) -> List[List[SearchResult]]:
         """
-        Query the ChromaDB collection for similar documents.
+        Query the collection with several embeddings at once.
+
+        Queries sharing the same filter are sent in a single
+        ``collection.query`` call, so N queries cost one round trip per
+        distinct filter instead of N.
 
         Args:
-            query_embedding: The vector embedding of the query text.
-            top_k: The number of results to return.
-            source_name: Optional source name to filter the search.
+            query_embeddings: The vector embeddings of the queries.
+            top_k: The number of results to return, for all queries or per query.
+            source_names: Optional per-query source name filters (None for no filter).
+            include: Fields to fetch besides the ids: "distances" and/or
+                "documents" (content and metadata). Fetch only what is needed.
 
         Returns:
-            A list of Document objects that are similar to the query text.
+            One list of results per query, in the order of ``query_embeddings``.
         """
-        where_clause = {}
-        if source_name:
-            where_clause = {"source_name": source_name}
+        count = len(query_embeddings)
+        top_ks, filters = self._normalize_query_options(count, top_k, source_names, include)
 
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k,
-            where=where_clause,
-        )
+        chroma_include = []
+        if "distances" in include:
+            chroma_include.append("distances")
+        if "documents" in include:
+            chroma_include += ["documents", "metadatas"]
 
-        documents = []
-        if results and results["documents"]:
-            for i, doc_content in enumerate(results["documents"][0]):
-                doc_id = results["ids"][0][i]
-                metadata = results["metadatas"][0][i]
-                source = metadata.pop("source_name", "unknown")
-                documents.append(
-                    Document(
-                        id=doc_id,
-                        content=doc_content,
-                        source_name=source,
-                        metadata=metadata,
-                    )
+        groups: Dict[Optional[str], List[int]] = {}
+        for i, source_name in enumerate(filters):
+            groups.setdefault(source_name, []).append(i)
+
+        all_results: List[List[SearchResult]] = [[] for _ in range(count)]
+        for source_name, indexes in groups.items():
+            results = self.collection.query(
+                query_embeddings=[query_embeddings[i] for i in indexes],
+                n_results=max(top_ks[i] for i in indexes),
+                where={"source_name": source_name} if source_name else {},
+                include=chroma_include,
+            )
+            for row, i in enumerate(indexes):
+                all_results[i] = self._to_search_results(results, row, top_ks[i])
+        return all_results
+
+    @staticmethod
+    def _to_search_results(results: dict, row: int, limit: int) -> List[SearchResult]:
+        """Converts one row of a ``collection.query`` response."""
+        ids = results["ids"][row][:limit]
+        distances = results.get("distances")
+        contents = results.get("documents")
+        metadatas = results.get("metadatas")
+
+        search_results = []
+        for i, doc_id in enumerate(ids):
+            document = None
+            if contents is not None:
+                document = ChromaRepository._to_document(
+                    doc_id, contents[row][i], metadatas[row][i]
+                )
+            search_results.append(
+                SearchResult(
+                    id=doc_id,
+                    distance=distances[row][i] if distances is not None else None,
+                    document=document,
                 )
-        return documents
+            )
+        return search_results
 
     def clear(self):
-        """Clear all items from the collection."""
+        """Clear all items from the collection, keeping its HNSW parameters."""
         self.collection.delete()
 
@@ -25,6 +25,19 @@ class DocumentRepository:
             )
             self.base_path.mkdir(parents=True, exist_ok=True)
 
+    def list_users(self) -> List[str]:
+        """
+        Lists the IDs of all users that have a document directory.
+
+        Returns:
+            The user IDs, sorted alphabetically.
+        """
+        return sorted(
+            entry.name
+            for entry in self.base_path.iterdir()
+            if entry.is_dir() and not entry.name.startswith(".")
+        )
+
     def get_user_documents(self, user_id: str) -> List[Path]:
         """
         Lists all document file paths for a given user.
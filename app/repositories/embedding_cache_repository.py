@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""Repository for caching text embeddings on disk using SQLite."""
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List
+
+from app.core.logger import logger
+
+# Keeps the number of bound parameters below SQLite's default limit.
+_MAX_PARAMS = 500
+
+
+class EmbeddingCacheRepository:
+    """
+    Stores embeddings keyed by (model, text hash) as compact float32 blobs.
+
+    The cache is bounded in size: once the stored vectors exceed
+    ``max_bytes`` the least recently used entries are evicted.
+    """
+
+    def __init__(self, db_path: str, max_bytes: int = 512 * 1024 * 1024):
+        """
+        Initializes the cache.
+
+        Args:
+            db_path: Path of the SQLite database file.
+            max_bytes: Maximum total size of the stored vectors.
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._ensure_db_exists()
+        self._total_bytes = self._stored_bytes()
+
+    def _ensure_db_exists(self):
+        """Creates the cache table if it doesn't exist."""
+        try:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access "
+                "ON embeddings (last_access)"
+            )
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to create embedding cache table: {e}")
+
+    def _stored_bytes(self) -> int:
+        """Returns the total size of the stored vectors."""
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()
+        return row[0]
+
+    def get_many(self, model: str, text_hashes: List[str]) -> Dict[str, List[float]]:
+        """
+        Looks up cached embeddings and marks the hits as recently used.
+
+        Args:
+            model: The embedding model the vectors were created with.
+            text_hashes: The hashes of the texts to look up.
+
+        Returns:
+            A mapping from text hash to embedding for every cache hit.
+        """
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            try:
+                for start in range(0, len(text_hashes), _MAX_PARAMS):
+                    chunk = text_hashes[start : start + _MAX_PARAMS]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = self._conn.execute(
+                        f"SELECT text_hash, vector FROM embeddings "
+                        f"WHERE model = ? AND text_hash IN ({placeholders})",
+                        (model, *chunk),
+                    ).fetchall()
+                    for text_hash, blob in rows:
+                        vector = array("f")
+                        vector.frombytes(blob)
+                        found[text_hash] = vector.tolist()
+
+                if found:
+                    now = time.time()
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_access = ? "
+                        "WHERE model = ? AND text_hash = ?",
+                        [(now, model, text_hash) for text_hash in found],
+                    )
+                    self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to read from the embedding cache: {e}")
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, List[float]]):
+        """
+        Stores embeddings, evicting the least recently used ones if needed.
+
+        Args:
+            model: The embedding model the vectors were created with.
+            vectors: A mapping from text hash to embedding.
+        """
+        now = time.time()
+        rows = []
+        for text_hash, vector in vectors.items():
+            blob = array("f", vector).tobytes()
+            rows.append((model, text_hash, blob, len(blob), now))
+
+        with self._lock:
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings "
+                    "(model, text_hash, vector, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.commit()
+                self._total_bytes += sum(row[3] for row in rows)
+                if self._total_bytes > self.max_bytes:
+                    self._evict()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to write to the embedding cache: {e}")
+
+    def _evict(self):
+        """Deletes least recently used entries until the cache is 90% full."""
+        # The running total is approximate (other processes may share the file).
+        self._total_bytes = self._stored_bytes()
+        target = int(self.max_bytes * 0.9)
+        if self._total_bytes <= target:
+            return
+
+        to_free = self._total_bytes - target
+        victims = []
+        freed = 0
+        cursor = self._conn.execute("SELECT rowid, size FROM embeddings ORDER BY last_access")
+        for rowid, size in cursor:
+            victims.append((rowid,))
+            freed += size
+            if freed >= to_free:
+                break
+        cursor.close()
+
+        self._conn.executemany("DELETE FROM embeddings WHERE rowid = ?", victims)
+        self._conn.commit()
+        self._total_bytes -= freed
+        logger.info(f"Evicted {len(victims)} entries from the embedding cache.")
+
+    def __del__(self):
+        """Ensures the database connection is closed on object destruction."""
+        if getattr(self, "_conn", None):
+            self._conn.close()
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""Repository for a BM25 inverted index of the stored chunks, using SQLite."""
+import heapq
+import math
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.core.logger import logger
+from app.core.tokenizer import tokenize
+from app.models.document import Document
+
+# Keeps the number of bound parameters below SQLite's default limit.
+_MAX_PARAMS = 500
+
+
+class LexicalIndexRepository:
+    """
+    Inverted index of chunk terms, scored with Okapi BM25.
+
+    Only term frequencies and chunk lengths are stored; the chunk texts
+    stay in the vector store. Chunks are added and deleted together with
+    their vectors, so the index is maintained incrementally.
+    """
+
+    def __init__(self, db_path: str, k1: float = 1.2, b: float = 0.75):
+        """
+        Initializes the index.
+
+        Args:
+            db_path: Path of the SQLite database file.
+            k1: BM25 term-frequency saturation.
+            b: BM25 length normalization.
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._ensure_db_exists()
+
+    def _ensure_db_exists(self):
+        """Creates the index tables if they don't exist."""
+        try:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (
+                    id TEXT PRIMARY KEY,
+                    source_name TEXT NOT NULL,
+                    length INTEGER NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    tf INTEGER NOT NULL,
+                    PRIMARY KEY (term, chunk_id)
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_postings_chunk ON postings (chunk_id)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks (source_name)"
+            )
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to create lexical index tables: {e}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def _existing_ids(self, ids: List[str]) -> set:
+        """Returns the given ids that are already indexed. Requires the lock."""
+        found = set()
+        for start in range(0, len(ids), _MAX_PARAMS):
+            chunk = ids[start : start + _MAX_PARAMS]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f"SELECT id FROM chunks WHERE id IN ({placeholders})", chunk
+            ).fetchall()
+            found.update(row[0] for row in rows)
+        return found
+
+    def add(self, documents: List[Document]):
+        """
+        Indexes chunks. Chunks already in the index are skipped, since a
+        chunk id identifies its content.
+
+        Args:
+            documents: The chunks to index.
+        """
+        with self._lock:
+            try:
+                existing = self._existing_ids([doc.id for doc in documents])
+                chunk_rows, posting_rows = [], []
+                for doc in documents:
+                    if doc.id in existing:
+                        continue
+                    existing.add(doc.id)
+                    terms = Counter(tokenize(doc.content))
+                    chunk_rows.append((doc.id, doc.source_name, sum(terms.values())))
+                    posting_rows.extend((term, doc.id, tf) for term, tf in terms.items())
+
+                self._conn.executemany(
+                    "INSERT INTO chunks (id, source_name, length) VALUES (?, ?, ?)", chunk_rows
+                )
+                self._conn.executemany(
+                    "INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)", posting_rows
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self._conn.rollback()
+                logger.error(f"Failed to write to the lexical index: {e}")
+
+    def delete(self, ids: List[str]):
+        """
+        Removes chunks from the index.
+
+        Args:
+            ids: The ids of the chunks to remove.
+        """
+        if not ids:
+            return
+        with self._lock:
+            try:
+                rows = [(chunk_id,) for chunk_id in ids]
+                self._conn.executemany("DELETE FROM postings WHERE chunk_id = ?", rows)
+                self._conn.executemany("DELETE FROM chunks WHERE id = ?", rows)
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self._conn.rollback()
+                logger.error(f"Failed to delete from the lexical index: {e}")
+
+    def clear(self):
+        """Removes every chunk from the index."""
+        with self._lock:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.commit()
+
+    def search(
+        self, query: str, top_k: int = 20, source_name: Optional[str] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Ranks the chunks containing the query's terms by BM25.
+
+        Args:
+            query: The query text.
+            top_k: The number of chunks to return.
+            source_name: Optional source name to filter the search.
+
+        Returns:
+            (chunk id, score) pairs, best first.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        placeholders = ",".join("?" * len(terms))
+        with self._lock:
+            count, total_length = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks"
+            ).fetchone()
+            if not count:
+                return []
+            document_frequencies = dict(
+                self._conn.execute(
+                    f"SELECT term, COUNT(*) FROM postings WHERE term IN ({placeholders}) "
+                    f"GROUP BY term",
+                    terms,
+                ).fetchall()
+            )
+            source_filter = " AND c.source_name = ?" if source_name is not None else ""
+            postings = self._conn.execute(
+                f"SELECT p.term, p.chunk_id, p.tf, c.length FROM postings p "
+                f"JOIN chunks c ON c.id = p.chunk_id "
+                f"WHERE p.term IN ({placeholders}){source_filter}",
+                terms + ([source_name] if source_name is not None else []),
+            ).fetchall()
+
+        average_length = total_length / count
+        idf = {
+            term: math.log(1 + (count - df + 0.5) / (df + 0.5))
+            for term, df in document_frequencies.items()
+        }
+        scores: Dict[str, float] = {}
+        for term, chunk_id, tf, length in postings:
+            norm = self.k1 * (1 - self.b + self.b * length / average_length)
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + idf[term] * tf * (self.k1 + 1) / (
+                tf + norm
+            )
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def __del__(self):
+        """Ensures the database connection is closed on object destruction."""
+        if getattr(self, "_conn", None):
+            self._conn.close()
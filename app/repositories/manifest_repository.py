@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""Repository for persisting the ingestion manifest using SQLite."""
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.models.manifest import ManifestEntry
+from app.core.logger import logger
+
+
+class ManifestRepository:
+    """
+    Records which version of each source file has been ingested.
+
+    Every write is committed on its own, so an interrupted ingestion keeps
+    the files it finished and resumes from there on the next run.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Initializes the repository.
+
+        Args:
+            db_path: Path of the SQLite database file.
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._ensure_db_exists()
+
+    def _ensure_db_exists(self):
+        """Creates the manifest table if it doesn't exist."""
+        try:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    source_name TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    chunk_count INTEGER NOT NULL,
+                    embedding_model TEXT,
+                    indexed_at TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to create manifest table: {e}")
+
+    def get_all(self) -> Dict[str, ManifestEntry]:
+        """
+        Loads the whole manifest.
+
+        Returns:
+            A mapping from source name to its manifest entry.
+        """
+        with self._lock:
+            try:
+                rows = self._conn.execute("SELECT * FROM files").fetchall()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to read the manifest: {e}")
+                return {}
+        return {row["source_name"]: ManifestEntry(**dict(row)) for row in rows}
+
+    def get(self, source_name: str) -> Optional[ManifestEntry]:
+        """
+        Retrieves the manifest entry of a single source.
+
+        Args:
+            source_name: The name of the source file.
+
+        Returns:
+            The entry, or None if the source has never been ingested.
+        """
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM files WHERE source_name = ?", (source_name,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to read the manifest: {e}")
+                return None
+        return ManifestEntry(**dict(row)) if row else None
+
+    def upsert(self, entry: ManifestEntry):
+        """
+        Inserts or replaces an entry and commits it immediately.
+
+        Args:
+            entry: The entry to store.
+        """
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO files (source_name, size, mtime_ns, inode, "
+                    "sha256, chunk_count, embedding_model, indexed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        entry.source_name,
+                        entry.size,
+                        entry.mtime_ns,
+                        entry.inode,
+                        entry.sha256,
+                        entry.chunk_count,
+                        entry.embedding_model,
+                        entry.indexed_at.isoformat(),
+                    ),
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to update the manifest for '{entry.source_name}': {e}")
+
+    def update_stat(self, source_name: str, stat: os.stat_result):
+        """
+        Refreshes the recorded stat of a file whose content did not change.
+
+        Args:
+            source_name: The name of the source file.
+            stat: The file's current stat.
+        """
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "UPDATE files SET size = ?, mtime_ns = ?, inode = ? WHERE source_name = ?",
+                    (stat.st_size, stat.st_mtime_ns, stat.st_ino, source_name),
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to update the manifest for '{source_name}': {e}")
+
+    def delete(self, source_name: str):
+        """
+        Removes a source from the manifest.
+
+        Args:
+            source_name: The name of the source file.
+        """
+        with self._lock:
+            try:
+                self._conn.execute("DELETE FROM files WHERE source_name = ?", (source_name,))
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to update the manifest for '{source_name}': {e}")
+
+    def clear(self):
+        """Removes every source from the manifest."""
+        with self._lock:
+            try:
+                self._conn.execute("DELETE FROM files")
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to clear the manifest: {e}")
+
+    def import_hashes(self, hashes: Dict[str, str]):
+        """
+        Seeds the manifest with content hashes from the legacy JSON manifest.
+
+        The entries get an impossible stat, so each file is hashed once more
+        and, if unchanged, its stat is recorded without re-ingesting it. Their
+        chunk count is unknown: it is stored as 0 with no embedding model.
+
+        Args:
+            hashes: A mapping from source name to SHA256 hash.
+        """
+        with self._lock:
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO files (source_name, size, mtime_ns, inode, "
+                    "sha256, chunk_count, embedding_model, indexed_at) "
+                    "VALUES (?, -1, -1, -1, ?, 0, NULL, datetime('now'))",
+                    list(hashes.items()),
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to import the legacy manifest: {e}")
+
+    def __del__(self):
+        """Ensures the database connection is closed on object destruction."""
+        if getattr(self, "_conn", None):
+            self._conn.close()
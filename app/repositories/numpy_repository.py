@@ -0,0 +1,547 @@
+# -*- coding: utf-8 -*-
+"""In-process vector store: exact search over memory-mapped float32 segments."""
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.models.document import Document
+from app.models.search_result import SearchResult
+from app.repositories.base_repository import QUERY_FIELDS, BaseRepository
+from app.repositories.chroma_repository import HNSW_SPACES
+
+# Keeps the number of bound parameters below SQLite's default limit.
+_MAX_PARAMS = 500
+
+
+class _Segment:
+    """An append-only file of float32 vectors, mapped read-only on demand."""
+
+    def __init__(self, directory: Path, number: int, rows: int, dimensions: int):
+        self.number = number
+        self.path = directory / f"segment-{number}.f32"
+        self.rows = rows
+        self.dimensions = dimensions
+        self._matrix: Optional[np.ndarray] = None
+
+    def matrix(self) -> np.ndarray:
+        """The (rows, dimensions) vectors, memory-mapped from the file."""
+        if self._matrix is None:
+            self._matrix = (
+                np.memmap(
+                    self.path, dtype=np.float32, mode="r", shape=(self.rows, self.dimensions)
+                )
+                if self.rows
+                else np.empty((0, self.dimensions), dtype=np.float32)
+            )
+        return self._matrix
+
+    def append(self, vectors: np.ndarray):
+        """Appends vectors to the file, dropping bytes of an interrupted write."""
+        with open(self.path, "ab") as f:
+            f.truncate(self.rows * self.dimensions * 4)
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self.rows += len(vectors)
+        self._matrix = None
+
+
+class NumpyRepository(BaseRepository):
+    """
+    File-backed vector store searched by an exact matrix product.
+
+    Vectors live in append-only float32 segment files that are memory-mapped,
+    so only the pages touched by a search are resident. Texts, metadata and
+    the row of every document are kept in SQLite. Deleting or replacing a
+    document leaves a tombstone on its row; segments are compacted once the
+    share of dead rows exceeds ``compaction_threshold``.
+
+    Source filters use boolean row masks, computed once per source and kept
+    until the next write. Distances are those ChromaDB reports for the same
+    ``space``: squared L2, 1 - inner product or 1 - cosine similarity. The
+    vectors are stored as given, so the space can change between runs.
+
+    One process should write to a collection at a time; instances in other
+    processes reload the collection when they see its generation change.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        segment_rows: int = 65536,
+        compaction_threshold: float = 0.3,
+        space: str = "l2",
+    ):
+        """
+        Initializes the repository, loading the stored segments.
+
+        Args:
+            collection_name: Name of the collection, used as its directory.
+            segment_rows: Rows per segment before a new one is started.
+            compaction_threshold: Share of dead rows that triggers compaction.
+            space: Distance function, one of ``HNSW_SPACES``.
+
+        Raises:
+            ValueError: If the space is not supported.
+        """
+        if space not in HNSW_SPACES:
+            raise ValueError(f"Unsupported distance space: {space}")
+        self.space = space
+        self.path = Path(settings.VECTOR_DB_PATH) / "numpy" / collection_name
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.segment_rows = max(1, segment_rows)
+        self.compaction_threshold = compaction_threshold
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path / "rows.db", check_same_thread=False)
+        self._ensure_db_exists()
+        self._generation = -1
+        self._refresh()
+
+    def _ensure_db_exists(self):
+        """Creates the tables if they don't exist."""
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS segments "
+            "(segment INTEGER PRIMARY KEY, rows INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rows (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL,
+                source_name TEXT,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                alive INTEGER NOT NULL DEFAULT 1
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_rows_live_id ON rows (id) WHERE alive = 1"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0), ('dimensions', 0)"
+        )
+        self._conn.commit()
+
+    def _meta(self, key: str) -> int:
+        return self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def _refresh(self):
+        """Reloads the in-memory state after writes by another instance. Requires the lock."""
+        generation = self._meta("generation")
+        if generation == self._generation:
+            return
+        self.dimensions = self._meta("dimensions")
+        self._segments = [
+            _Segment(self.path, number, rows, self.dimensions)
+            for number, rows in self._conn.execute(
+                "SELECT segment, rows FROM segments ORDER BY segment"
+            )
+        ]
+        rows = self._conn.execute(
+            "SELECT id, source_name, alive FROM rows ORDER BY row"
+        ).fetchall()
+        self._ids = [row[0] for row in rows]
+        self._sources = np.array([row[1] for row in rows], dtype=object)
+        self._alive = np.array([bool(row[2]) for row in rows], dtype=bool)
+        self._norms = np.concatenate(
+            [np.einsum("ij,ij->i", s.matrix(), s.matrix()) for s in self._segments]
+            or [np.empty(0, dtype=np.float32)]
+        )
+        self._live_rows = {
+            doc_id: row for row, doc_id in enumerate(self._ids) if self._alive[row]
+        }
+        self._source_masks: Dict[Optional[str], np.ndarray] = {}
+        self._generation = generation
+
+    def _commit(self):
+        """Bumps the generation, so other instances reload, and commits. Requires the lock."""
+        self._generation = self._meta("generation") + 1
+        self._conn.execute(
+            "UPDATE meta SET value = ? WHERE key = 'generation'", (self._generation,)
+        )
+        self._conn.commit()
+        self._source_masks = {}
+
+    def _mask(self, source_name: Optional[str]) -> np.ndarray:
+        """Rows that are alive and, when given, belong to a source. Requires the lock."""
+        if source_name not in self._source_masks:
+            self._source_masks[source_name] = (
+                self._alive
+                if source_name is None
+                else self._alive & (self._sources == source_name)
+            )
+        return self._source_masks[source_name]
+
+    @property
+    def dead_rows(self) -> int:
+        """Number of tombstoned rows awaiting compaction."""
+        with self._lock:
+            self._refresh()
+            return int(len(self._alive) - self._alive.sum())
+
+    # --- Writes ------------------------------------------------------------
+
+    def _next_segment_number(self) -> int:
+        return self._segments[-1].number + 1 if self._segments else 0
+
+    def _new_segment(self, number: int) -> _Segment:
+        """Starts an empty segment, discarding a leftover file. Requires the lock."""
+        segment = _Segment(self.path, number, 0, self.dimensions)
+        segment.path.unlink(missing_ok=True)
+        return segment
+
+    def _tombstone(self, ids: List[str]) -> int:
+        """Marks the live rows of the given ids as dead. Requires the lock."""
+        rows = [self._live_rows.pop(doc_id) for doc_id in ids if doc_id in self._live_rows]
+        if rows:
+            self._conn.executemany(
+                "UPDATE rows SET alive = 0 WHERE row = ?", [(row,) for row in rows]
+            )
+            self._alive[rows] = False
+        return len(rows)
+
+    def add(self, documents: List[Document], embeddings: List[List[float]]):
+        """
+        Append documents and their embeddings, replacing documents with the same id.
+
+        Args:
+            documents: A list of Document objects.
+            embeddings: A list of corresponding vector embeddings.
+        """
+        if not documents:
+            return
+        # The last occurrence of a repeated id wins, as in an upsert.
+        latest = {doc.id: i for i, doc in enumerate(documents)}
+        if len(latest) < len(documents):
+            keep = sorted(latest.values())
+            documents = [documents[i] for i in keep]
+            embeddings = [embeddings[i] for i in keep]
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            self._refresh()
+            if not self.dimensions:
+                self.dimensions = vectors.shape[1]
+                self._conn.execute(
+                    "UPDATE meta SET value = ? WHERE key = 'dimensions'", (self.dimensions,)
+                )
+            elif vectors.shape[1] != self.dimensions:
+                raise ValueError(
+                    f"Expected embeddings of {self.dimensions} dimensions, got {vectors.shape[1]}."
+                )
+
+            self._tombstone([doc.id for doc in documents])
+            first_row = len(self._ids)
+            start = 0
+            while start < len(vectors):
+                if not self._segments or self._segments[-1].rows >= self.segment_rows:
+                    self._segments.append(self._new_segment(self._next_segment_number()))
+                segment = self._segments[-1]
+                end = min(len(vectors), start + self.segment_rows - segment.rows)
+                segment.append(vectors[start:end])
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO segments (segment, rows) VALUES (?, ?)",
+                    (segment.number, segment.rows),
+                )
+                start = end
+
+            self._conn.executemany(
+                "INSERT INTO rows (row, id, source_name, content, metadata) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (first_row + i, doc.id, doc.source_name, doc.content,
+                     json.dumps(doc.metadata or {}, ensure_ascii=False))
+                    for i, doc in enumerate(documents)
+                ],
+            )
+            self._commit()
+
+            self._ids.extend(doc.id for doc in documents)
+            self._sources = np.concatenate(
+                [self._sources, np.array([doc.source_name for doc in documents], dtype=object)]
+            )
+            self._alive = np.concatenate([self._alive, np.ones(len(documents), dtype=bool)])
+            self._norms = np.concatenate([self._norms, np.einsum("ij,ij->i", vectors, vectors)])
+            for i, doc in enumerate(documents):
+                self._live_rows[doc.id] = first_row + i
+
+    def update_metadata(self, documents: List[Document]):
+        """
+        Overwrite the stored metadata of existing documents, keeping their embeddings.
+
+        Args:
+            documents: Documents whose ids are already in the repository.
+        """
+        with self._lock:
+            self._refresh()
+            updates = [
+                (doc.source_name, json.dumps(doc.metadata or {}, ensure_ascii=False),
+                 self._live_rows[doc.id])
+                for doc in documents
+                if doc.id in self._live_rows
+            ]
+            self._conn.executemany(
+                "UPDATE rows SET source_name = ?, metadata = ? WHERE row = ?", updates
+            )
+            self._commit()
+            for source_name, _, row in updates:
+                self._sources[row] = source_name
+
+    def delete(self, ids: List[str]):
+        """
+        Delete documents, compacting the segments when enough rows are dead.
+
+        Args:
+            ids: The ids of the documents to delete.
+        """
+        if not ids:
+            return
+        with self._lock:
+            self._refresh()
+            if self._tombstone(ids):
+                self._commit()
+            if len(self._alive) and self.dead_rows / len(self._alive) > self.compaction_threshold:
+                self.compact()
+
+    def compact(self):
+        """Rewrites the live rows into new segments and drops the tombstones."""
+        with self._lock:
+            self._refresh()
+            live = np.flatnonzero(self._alive)
+            old_segments = self._segments
+            next_number = self._next_segment_number()
+
+            new_segments = []
+            offsets = np.cumsum([0] + [s.rows for s in old_segments])
+            for start in range(0, len(live), self.segment_rows):
+                rows = live[start : start + self.segment_rows]
+                vectors = np.concatenate(
+                    [
+                        old.matrix()[rows[(rows >= lo) & (rows < hi)] - lo]
+                        for old, lo, hi in zip(old_segments, offsets[:-1], offsets[1:])
+                    ]
+                )
+                segment = self._new_segment(next_number + len(new_segments))
+                segment.append(vectors)
+                new_segments.append(segment)
+
+            # Live rows are renumbered in ascending order, so a new number
+            # never collides with a row that has not been renumbered yet.
+            self._conn.execute("DELETE FROM rows WHERE alive = 0")
+            self._conn.executemany(
+                "UPDATE rows SET row = ? WHERE row = ?",
+                [(new, int(old)) for new, old in enumerate(live) if new != old],
+            )
+            self._conn.execute("DELETE FROM segments")
+            self._conn.executemany(
+                "INSERT INTO segments (segment, rows) VALUES (?, ?)",
+                [(segment.number, segment.rows) for segment in new_segments],
+            )
+            self._commit()
+            removed = len(self._alive) - len(live)
+            self._generation = -1
+            self._refresh()
+
+            for segment in old_segments:
+                segment.path.unlink(missing_ok=True)
+            logger.info(f"Compacted vector segments: dropped {removed} dead rows.")
+
+    def clear(self):
+        """Clear all items from the repository."""
+        with self._lock:
+            self._refresh()
+            self._conn.execute("DELETE FROM rows")
+            self._conn.execute("DELETE FROM segments")
+            self._conn.execute("UPDATE meta SET value = 0 WHERE key = 'dimensions'")
+            self._commit()
+            for segment in self._segments:
+                segment.path.unlink(missing_ok=True)
+            self._generation = -1
+            self._refresh()
+
+    # --- Reads -------------------------------------------------------------
+
+    def count(self) -> int:
+        """Return the number of live documents."""
+        with self._lock:
+            self._refresh()
+            return len(self._live_rows)
+
+    def get_ids(self, source_name: str) -> List[str]:
+        """
+        List the ids of every document stored for a source.
+
+        Args:
+            source_name: The source whose document ids should be listed.
+
+        Returns:
+            The ids of the source's documents.
+        """
+        with self._lock:
+            self._refresh()
+            return [self._ids[row] for row in np.flatnonzero(self._mask(source_name))]
+
+    def _load_documents(self, rows: List[int]) -> Dict[int, Document]:
+        """Reads the documents stored on the given rows. Requires the lock."""
+        found: Dict[int, Document] = {}
+        for start in range(0, len(rows), _MAX_PARAMS):
+            chunk = rows[start : start + _MAX_PARAMS]
+            placeholders = ",".join("?" * len(chunk))
+            for row, doc_id, source, content, metadata in self._conn.execute(
+                f"SELECT row, id, source_name, content, metadata FROM rows "
+                f"WHERE row IN ({placeholders})",
+                chunk,
+            ):
+                found[row] = Document(
+                    id=doc_id, content=content, source_name=source, metadata=json.loads(metadata)
+                )
+        return found
+
+    def get_documents(self, ids: List[str]) -> List[Document]:
+        """
+        Fetch stored documents by id.
+
+        Args:
+            ids: The ids of the documents to fetch.
+
+        Returns:
+            The documents found, in the order of ``ids``.
+        """
+        with self._lock:
+            self._refresh()
+            rows = [self._live_rows[doc_id] for doc_id in ids if doc_id in self._live_rows]
+            documents = self._load_documents(rows)
+            return [documents[row] for row in rows]
+
+    def get_embeddings(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Fetch the stored embeddings of documents.
+
+        Args:
+            ids: The ids of the documents.
+
+        Returns:
+            A mapping from each id found to its float32 embedding.
+        """
+        with self._lock:
+            self._refresh()
+            found = [doc_id for doc_id in ids if doc_id in self._live_rows]
+            rows = np.array([self._live_rows[doc_id] for doc_id in found], dtype=np.int64)
+            offsets = np.cumsum([0] + [s.rows for s in self._segments])
+            vectors = np.empty((len(rows), self.dimensions), dtype=np.float32)
+            for segment, lo, hi in zip(self._segments, offsets[:-1], offsets[1:]):
+                inside = (rows >= lo) & (rows < hi)
+                vectors[inside] = segment.matrix()[rows[inside] - lo]
+            return dict(zip(found, vectors))
+
+    def iter_documents(self, batch_size: int = 1000) -> Iterator[List[Document]]:
+        """
+        Iterate over every stored document, in batches.
+
+        Args:
+            batch_size: The number of documents read per batch.
+
+        Yields:
+            Lists of at most ``batch_size`` documents.
+        """
+        with self._lock:
+            self._refresh()
+            live = [int(row) for row in np.flatnonzero(self._alive)]
+        for start in range(0, len(live), batch_size):
+            with self._lock:
+                documents = self._load_documents(live[start : start + batch_size])
+            yield [documents[row] for row in live[start : start + batch_size] if row in documents]
+
+    def query_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: Union[int, List[int]] = 5,
+        source_names: Optional[List[Optional[str]]] = None,
+        include: Sequence[str] = QUERY_FIELDS,
+    ) -> List[List[SearchResult]]:
+        """
+        Query the repository with several embeddings at once.
+
+        All queries are scored by one matrix product per segment.
+
+        Args:
+            query_embeddings: The vector embeddings of the queries.
+            top_k: The number of results to return, for all queries or per query.
+            source_names: Optional per-query source name filters (None for no filter).
+            include: Fields to fetch besides the ids: "distances" and/or
+                "documents" (content and metadata).
+
+        Returns:
+            One list of results per query, in the order of ``query_embeddings``.
+        """
+        count = len(query_embeddings)
+        top_ks, filters = self._normalize_query_options(count, top_k, source_names, include)
+        if not count:
+            return []
+
+        with self._lock:
+            self._refresh()
+            if not self._ids:
+                return [[] for _ in range(count)]
+
+            queries = np.asarray(query_embeddings, dtype=np.float32)
+            # One (queries, rows) block of dot products per segment.
+            dots = np.concatenate([s.matrix() @ queries.T for s in self._segments]).T
+            distances = self._distances(dots, queries)
+
+            hits = []
+            for i, (k, source_name) in enumerate(zip(top_ks, filters)):
+                candidates = np.flatnonzero(self._mask(source_name))
+                k = min(k, len(candidates))
+                if not k:
+                    hits.append([])
+                    continue
+                row_distances = distances[i, candidates]
+                best = np.argpartition(row_distances, k - 1)[:k]
+                best = best[np.argsort(row_distances[best])]
+                hits.append([(int(candidates[j]), float(row_distances[j])) for j in best])
+
+            documents = {}
+            if "documents" in include:
+                documents = self._load_documents(sorted({row for h in hits for row, _ in h}))
+            # Rounding can make an l2 or cosine distance slightly negative;
+            # ip distances may legitimately be.
+            floor = -np.inf if self.space == "ip" else 0.0
+            return [
+                [
+                    SearchResult(
+                        id=self._ids[row],
+                        distance=max(distance, floor) if "distances" in include else None,
+                        document=documents.get(row),
+                    )
+                    for row, distance in query_hits
+                ]
+                for query_hits in hits
+            ]
+
+    def _distances(self, dots: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """Turns the dot products of queries and rows into distances. Requires the lock."""
+        query_norms = np.einsum("ij,ij->i", queries, queries)
+        if self.space == "l2":
+            # |q - x|^2 = |q|^2 - 2 q.x + |x|^2
+            return self._norms[None, :] - 2 * dots + query_norms[:, None]
+        if self.space == "cosine":
+            lengths = np.sqrt(query_norms)[:, None] * np.sqrt(self._norms)[None, :]
+            dots = dots / np.maximum(lengths, 1e-12)
+        return 1.0 - dots
+
+    def __del__(self):
+        """Ensures the database connection is closed on object destruction."""
+        if getattr(self, "_conn", None):
+            self._conn.close()
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""ChromaDB repository searched through a quantized copy of its vectors."""
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.models.document import Document
+from app.models.search_result import SearchResult
+from app.repositories.chroma_repository import QUERY_FIELDS, ChromaRepository, exact_distances
+from app.repositories.quantized_vector_store import QuantizedVectorStore
+
+# Vectors read per request when rebuilding the quantized copy.
+_SYNC_PAGE = 5000
+
+
+class QuantizedChromaRepository(ChromaRepository):
+    """
+    ChromaDB repository whose searches scan int8 or float16 vector codes.
+
+    ChromaDB stays the source of truth for documents and full-precision
+    vectors. Queries scan the compressed codes kept in memory, take the
+    ``rerank_factor * top_k`` best candidates, and re-rank them by their
+    exact distance in the collection's space, from vectors fetched from
+    ChromaDB. Distances are thus comparable with those of ``ChromaRepository``.
+    Candidates are selected by L2 distance, which ranks normalized
+    embeddings like the other spaces do.
+
+    The compressed copy is kept in sync with the writes of every instance
+    through its generation counter, and rebuilt on startup when its size
+    differs from the collection's, e.g. after writes made without it.
+    """
+
+    def __init__(
+        self, collection_name: str, dtype: str = "int8", rerank_factor: int = 4, **hnsw
+    ):
+        """
+        Initializes the repository, rebuilding the quantized copy if it is
+        out of sync with the collection.
+
+        Args:
+            collection_name: The ChromaDB collection to use.
+            dtype: "int8" or "float16".
+            rerank_factor: Candidates re-ranked at full precision, per result.
+            **hnsw: HNSW parameters of the collection, as for ``ChromaRepository``.
+        """
+        super().__init__(collection_name, **hnsw)
+        self.rerank_factor = max(1, rerank_factor)
+        self.store = QuantizedVectorStore(
+            db_path=str(Path(settings.VECTOR_DB_PATH) / f"quantized_{collection_name}.db"),
+            dtype=dtype,
+        )
+        if len(self.store) != self.collection.count():
+            self._rebuild()
+
+    def _rebuild(self):
+        """Re-quantizes every vector of the collection."""
+        logger.info(f"Rebuilding the {self.store.dtype} vector copy of the collection...")
+        self.store.clear()
+        offset = 0
+        while True:
+            page = self.collection.get(
+                include=["embeddings", "metadatas"], limit=_SYNC_PAGE, offset=offset
+            )
+            if not page["ids"]:
+                break
+            self.store.add(
+                page["ids"],
+                [(meta or {}).get("source_name") for meta in page["metadatas"]],
+                np.asarray(page["embeddings"], dtype=np.float32),
+            )
+            offset += len(page["ids"])
+        logger.info(f"Quantized {offset} vectors ({self.store.nbytes / 1e6:.1f} MB in memory).")
+
+    def add(self, documents: List[Document], embeddings: List[List[float]]):
+        """
+        Add documents to the collection and their quantized vectors to the store.
+
+        Args:
+            documents: A list of Document objects.
+            embeddings: A list of corresponding vector embeddings.
+        """
+        super().add(documents, embeddings)
+        self.store.add(
+            [doc.id for doc in documents],
+            [doc.source_name for doc in documents],
+            np.asarray(embeddings, dtype=np.float32),
+        )
+
+    def update_metadata(self, documents: List[Document]):
+        """
+        Overwrite the stored metadata of existing documents, keeping their embeddings.
+
+        Args:
+            documents: Documents whose ids are already in the collection.
+        """
+        super().update_metadata(documents)
+        self.store.set_sources(
+            [doc.id for doc in documents], [doc.source_name for doc in documents]
+        )
+
+    def delete(self, ids: List[str]):
+        """
+        Delete documents from the collection and the store.
+
+        Args:
+            ids: The ids of the documents to delete.
+        """
+        super().delete(ids)
+        if ids:
+            self.store.delete(ids)
+
+    def query_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: Union[int, List[int]] = 5,
+        source_names: Optional[List[Optional[str]]] = None,
+        include: Sequence[str] = QUERY_FIELDS,
+    ) -> List[List[SearchResult]]:
+        """
+        Query the collection with several embeddings at once.
+
+        Candidates of all queries are fetched from ChromaDB in one call.
+
+        Args:
+            query_embeddings: The vector embeddings of the queries.
+            top_k: The number of results to return, for all queries or per query.
+            source_names: Optional per-query source name filters (None for no filter).
+            include: Fields to fetch besides the ids: "distances" and/or
+                "documents" (content and metadata).
+
+        Returns:
+            One list of results per query, in the order of ``query_embeddings``.
+        """
+        count = len(query_embeddings)
+        top_ks, filters = self._normalize_query_options(count, top_k, source_names, include)
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        candidates = [
+            self.store.search(query, k * self.rerank_factor, source_name)[0]
+            for query, k, source_name in zip(queries, top_ks, filters)
+        ]
+        candidate_ids = list(dict.fromkeys(i for ids in candidates for i in ids))
+        if not candidate_ids:
+            return [[] for _ in range(count)]
+
+        chroma_include = ["embeddings"]
+        if "documents" in include:
+            chroma_include += ["documents", "metadatas"]
+        fetched = self.collection.get(ids=candidate_ids, include=chroma_include)
+        rows: Dict[str, int] = {doc_id: row for row, doc_id in enumerate(fetched["ids"])}
+        vectors = np.asarray(fetched["embeddings"], dtype=np.float32)
+
+        all_results = []
+        for query, ids, k in zip(queries, candidates, top_ks):
+            ids = [doc_id for doc_id in ids if doc_id in rows]
+            if not ids:
+                all_results.append([])
+                continue
+            distances = exact_distances(
+                vectors[[rows[doc_id] for doc_id in ids]], query[None, :], self.space
+            )[0]
+            order = np.argsort(distances)[:k]
+            with_distances = "distances" in include
+            all_results.append(
+                [
+                    self._to_search_result(
+                        fetched, rows[ids[i]], float(distances[i]) if with_distances else None
+                    )
+                    for i in order
+                ]
+            )
+        return all_results
+
+    @staticmethod
+    def _to_search_result(fetched: dict, row: int, distance: Optional[float]) -> SearchResult:
+        """Converts one row of a ``collection.get`` response."""
+        doc_id = fetched["ids"][row]
+        document = None
+        if fetched.get("documents") is not None:
+            document = ChromaRepository._to_document(
+                doc_id, fetched["documents"][row], fetched["metadatas"][row]
+            )
+        return SearchResult(id=doc_id, distance=distance, document=document)
+
+    def clear(self):
+        """Clear all items from the collection and the store."""
+        super().clear()
+        self.store.clear()
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""Compressed in-memory copy of a collection's vectors, persisted in SQLite."""
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.core.logger import logger
+from app.core.quantization import quantize
+
+# Rows scored per step, which bounds the float32 temporaries of a scan.
+_SCAN_BLOCK = 16384
+
+
+class QuantizedVectorStore:
+    """
+    Keeps int8 or float16 codes of every vector of a collection in memory,
+    with a per-vector scale and the exact squared norm of the original.
+
+    Scans return approximate squared L2 distances, which are meant to pick
+    a candidate set for an exact re-ranking, not to be returned as is.
+
+    Every write bumps a generation counter stored with the codes. Reads
+    compare it with the generation they loaded and reload the codes when
+    another instance, e.g. an ingestion process, has written since. One
+    process should write at a time.
+    """
+
+    def __init__(self, db_path: str, dtype: str = "int8"):
+        """
+        Initializes the store, loading the persisted codes.
+
+        Args:
+            db_path: Path of the SQLite database file.
+            dtype: "int8" or "float16".
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.dtype = dtype
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._ensure_db_exists()
+        self._reset()
+        # The codes are loaded on the first read.
+        self._generation = -1
+
+    def _ensure_db_exists(self):
+        """Creates the vectors table if it doesn't exist."""
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS vectors (
+                id TEXT PRIMARY KEY,
+                source_name TEXT,
+                scale REAL NOT NULL,
+                norm REAL NOT NULL,
+                codes BLOB NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', '0')")
+        stored = self._conn.execute("SELECT value FROM meta WHERE key = 'dtype'").fetchone()
+        if stored and stored[0] != self.dtype:
+            # Codes of another type can't be mixed in; they are rebuilt by the caller.
+            logger.warning(
+                f"Quantized store {self.db_path} holds {stored[0]} codes; "
+                f"discarding them for {self.dtype}."
+            )
+            self._conn.execute("DELETE FROM vectors")
+            self._conn.execute(
+                "UPDATE meta SET value = ? WHERE key = 'generation'",
+                (str(self._stored_generation() + 1),),
+            )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('dtype', ?)", (self.dtype,)
+        )
+        self._conn.commit()
+
+    def _stored_generation(self) -> int:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0])
+
+    def _reset(self):
+        """Empties the in-memory copy."""
+        self._ids: List[str] = []
+        self._sources = np.empty(0, dtype=object)
+        self._codes: Optional[np.ndarray] = None
+        self._scales = np.empty(0, dtype=np.float32)
+        self._norms = np.empty(0, dtype=np.float32)
+        self._rows: Dict[str, int] = {}
+        # Added vectors are concatenated lazily, on the next read.
+        self._pending: List[Tuple[List[str], List[str], np.ndarray, np.ndarray, np.ndarray]] = []
+        self._pending_ids: Set[str] = set()
+
+    def _refresh(self):
+        """Reloads the codes after writes by another instance. Requires the lock."""
+        generation = self._stored_generation()
+        if generation == self._generation:
+            return
+        if self._generation >= 0:
+            logger.debug(f"Quantized store {self.db_path} changed on disk; reloading it.")
+        self._reset()
+        self._load()
+        self._generation = generation
+
+    def _commit(self):
+        """Bumps the generation, so other instances reload, and commits. Requires the lock."""
+        self._generation = self._stored_generation() + 1
+        self._conn.execute(
+            "UPDATE meta SET value = ? WHERE key = 'generation'", (str(self._generation),)
+        )
+        self._conn.commit()
+
+    def _load(self):
+        """Loads every persisted vector into memory."""
+        rows = self._conn.execute(
+            "SELECT id, source_name, scale, norm, codes FROM vectors ORDER BY rowid"
+        ).fetchall()
+        if not rows:
+            return
+        ids, sources, scales, norms, blobs = zip(*rows)
+        codes = np.stack([np.frombuffer(blob, dtype=self.dtype) for blob in blobs])
+        self._append_pending(
+            list(ids), list(sources), codes,
+            np.asarray(scales, dtype=np.float32), np.asarray(norms, dtype=np.float32),
+        )
+
+    def _append_pending(
+        self,
+        ids: List[str],
+        sources: List[str],
+        codes: np.ndarray,
+        scales: np.ndarray,
+        norms: np.ndarray,
+    ):
+        """Queues vectors for the next consolidation. Requires the lock."""
+        self._pending.append((ids, sources, codes, scales, norms))
+        self._pending_ids.update(ids)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            self._consolidate()
+            return len(self._ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the codes, scales and norms."""
+        with self._lock:
+            self._refresh()
+            self._consolidate()
+            if self._codes is None:
+                return 0
+            return self._codes.nbytes + self._scales.nbytes + self._norms.nbytes
+
+    def _consolidate(self):
+        """Appends the pending vectors to the arrays. Requires the lock."""
+        if not self._pending:
+            return
+        ids = self._ids + [i for batch in self._pending for i in batch[0]]
+        parts = ([self._codes] if self._codes is not None else []) + [b[2] for b in self._pending]
+        self._codes = np.concatenate(parts)
+        self._sources = np.concatenate(
+            [self._sources, np.asarray([s for b in self._pending for s in b[1]], dtype=object)]
+        )
+        self._scales = np.concatenate([self._scales] + [b[3] for b in self._pending])
+        self._norms = np.concatenate([self._norms] + [b[4] for b in self._pending])
+        self._ids = ids
+        self._rows = {doc_id: row for row, doc_id in enumerate(ids)}
+        self._pending = []
+        self._pending_ids = set()
+
+    def _remove_rows(self, ids: List[str]):
+        """Drops vectors from memory. Requires the lock."""
+        self._consolidate()
+        doomed = [self._rows[doc_id] for doc_id in ids if doc_id in self._rows]
+        if not doomed:
+            return
+        keep = np.ones(len(self._ids), dtype=bool)
+        keep[doomed] = False
+        self._ids = [doc_id for doc_id, kept in zip(self._ids, keep) if kept]
+        self._codes = self._codes[keep]
+        self._sources = self._sources[keep]
+        self._scales = self._scales[keep]
+        self._norms = self._norms[keep]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+
+    def add(self, ids: List[str], source_names: List[str], vectors: np.ndarray):
+        """
+        Quantizes and stores vectors, replacing those with the same ids.
+
+        Args:
+            ids: The ids of the vectors.
+            source_names: The source of each vector, used for filtering.
+            vectors: The (n, dimensions) full-precision vectors.
+        """
+        # The last occurrence of a repeated id wins, as in the database.
+        latest = {doc_id: i for i, doc_id in enumerate(ids)}
+        if len(latest) < len(ids):
+            keep = sorted(latest.values())
+            ids = [ids[i] for i in keep]
+            source_names = [source_names[i] for i in keep]
+            vectors = np.asarray(vectors)[keep]
+        vectors = np.asarray(vectors, dtype=np.float32)
+        codes, scales = quantize(vectors, self.dtype)
+        norms = np.einsum("ij,ij->i", vectors, vectors)
+        with self._lock:
+            self._refresh()
+            # Ids may be stored, or added since the last consolidation.
+            if any(doc_id in self._rows or doc_id in self._pending_ids for doc_id in ids):
+                self._remove_rows(ids)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (id, source_name, scale, norm, codes) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (doc_id, source, float(scale), float(norm), code.tobytes())
+                    for doc_id, source, scale, norm, code in zip(
+                        ids, source_names, scales, norms, codes
+                    )
+                ],
+            )
+            self._commit()
+            self._append_pending(list(ids), list(source_names), codes, scales, norms)
+
+    def set_sources(self, ids: List[str], source_names: List[str]):
+        """
+        Updates the source of stored vectors.
+
+        Args:
+            ids: The ids of the vectors.
+            source_names: Their new sources.
+        """
+        with self._lock:
+            self._refresh()
+            self._consolidate()
+            self._conn.executemany(
+                "UPDATE vectors SET source_name = ? WHERE id = ?",
+                list(zip(source_names, ids)),
+            )
+            self._commit()
+            for doc_id, source in zip(ids, source_names):
+                if doc_id in self._rows:
+                    self._sources[self._rows[doc_id]] = source
+
+    def delete(self, ids: List[str]):
+        """
+        Deletes vectors.
+
+        Args:
+            ids: The ids of the vectors to delete.
+        """
+        with self._lock:
+            self._refresh()
+            self._conn.executemany("DELETE FROM vectors WHERE id = ?", [(i,) for i in ids])
+            self._commit()
+            self._remove_rows(ids)
+
+    def clear(self):
+        """Deletes every vector."""
+        with self._lock:
+            self._conn.execute("DELETE FROM vectors")
+            self._commit()
+            self._reset()
+
+    def search(
+        self, query: np.ndarray, k: int, source_name: Optional[str] = None
+    ) -> Tuple[List[str], np.ndarray]:
+        """
+        Finds the ``k`` vectors closest to a query by approximate squared L2.
+
+        Args:
+            query: The full-precision query vector.
+            k: The number of candidates to return.
+            source_name: Optional source filter.
+
+        Returns:
+            The candidate ids and their approximate distances, closest first.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        with self._lock:
+            self._refresh()
+            self._consolidate()
+            if self._codes is None or not self._ids:
+                return [], np.empty(0, dtype=np.float32)
+            rows = (
+                np.flatnonzero(self._sources == source_name)
+                if source_name is not None
+                else np.arange(len(self._ids))
+            )
+            if not len(rows):
+                return [], np.empty(0, dtype=np.float32)
+
+            # |q - x|^2 = |q|^2 - 2 s (c . q) + |x|^2, with x ~ s * c.
+            distances = np.empty(len(rows), dtype=np.float32)
+            for start in range(0, len(rows), _SCAN_BLOCK):
+                block = rows[start : start + _SCAN_BLOCK]
+                dots = self._codes[block].astype(np.float32) @ query
+                distances[start : start + len(block)] = (
+                    self._norms[block] - 2 * self._scales[block] * dots
+                )
+            distances += query @ query
+
+            k = min(k, len(rows))
+            best = np.argpartition(distances, k - 1)[:k]
+            best = best[np.argsort(distances[best])]
+            return [self._ids[rows[i]] for i in best], distances[best]
+
+    def __del__(self):
+        """Ensures the database connection is closed on object destruction."""
+        if getattr(self, "_conn", None):
+            self._conn.close()
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""Semantic cache of generated answers."""
+import asyncio
+import hashlib
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.repositories.manifest_repository import ManifestRepository
+from app.services.embeddings_service import EmbeddingsService
+from app.core.logger import logger
+
+
+@dataclass
+class _CacheEntry:
+    """An answered question, as stored in the cache."""
+
+    scope: Optional[str]
+    conversation: str
+    question: str
+    vector: np.ndarray
+    answer: str
+    fingerprint: str
+    created_at: float
+
+
+class _ScopeIndex:
+    """The entries of one scope, with their vectors stacked for vectorized search."""
+
+    def __init__(self):
+        self.entry_ids: List[int] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def add(self, entry_id: int):
+        self.entry_ids.append(entry_id)
+        self._matrix = None
+
+    def remove(self, entry_id: int):
+        self.entry_ids.remove(entry_id)
+        self._matrix = None
+
+    def matrix(self, entries: Dict[int, _CacheEntry]) -> np.ndarray:
+        """Returns the (n, dimensions) matrix of the scope's vectors, rebuilt lazily."""
+        if self._matrix is None:
+            self._matrix = np.stack([entries[entry_id].vector for entry_id in self.entry_ids])
+        return self._matrix
+
+
+class SemanticAnswerCache:
+    """
+    Reuses answers to questions that are semantically close to one already
+    answered.
+
+    Questions are compared by the cosine similarity of their embeddings,
+    only against entries of the same scope (the source document filter, or
+    None for the whole collection) and the same conversation, a digest of
+    the turns before the question ("" when it opens the conversation), so a
+    follow-up is never answered from another conversation. An entry is discarded when it expires,
+    when it is the least recently used one and the cache is full, or when
+    the content hash of its scope in the ingestion manifest has changed.
+
+    Entries are kept in memory only: each process has its own cache, which
+    starts empty and is lost on exit.
+    """
+
+    def __init__(
+        self,
+        embeddings_service: EmbeddingsService,
+        manifest_repo: Optional[ManifestRepository] = None,
+        similarity_threshold: float = 0.95,
+        ttl_seconds: float = 3600.0,
+        max_entries: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initializes the cache.
+
+        Args:
+            embeddings_service: The service used to embed the questions.
+            manifest_repo: Optional manifest whose content hashes invalidate
+                the answers of a document once it is re-ingested.
+            similarity_threshold: Minimum cosine similarity for a hit.
+            ttl_seconds: Lifetime of an entry.
+            max_entries: Maximum number of entries kept across all scopes.
+            clock: Time source, overridable for tests.
+        """
+        self.embeddings_service = embeddings_service
+        self.manifest_repo = manifest_repo
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.clock = clock
+        self._entries: "OrderedDict[int, _CacheEntry]" = OrderedDict()
+        self._scopes: Dict[Tuple[Optional[str], str], _ScopeIndex] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _fingerprint(self, scope: Optional[str]) -> str:
+        """Content hash of a scope according to the ingestion manifest."""
+        if self.manifest_repo is None:
+            return ""
+        if scope is not None:
+            entry = self.manifest_repo.get(scope)
+            return entry.sha256 if entry else ""
+
+        entries = self.manifest_repo.get_all()
+        combined = "".join(
+            f"{name}\x00{entries[name].sha256}\x00" for name in sorted(entries)
+        )
+        return hashlib.sha256(combined.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def _remove(self, entry_id: int):
+        """Removes an entry. Requires the lock."""
+        entry = self._entries.pop(entry_id)
+        key = (entry.scope, entry.conversation)
+        scope_index = self._scopes[key]
+        scope_index.remove(entry_id)
+        if not scope_index.entry_ids:
+            del self._scopes[key]
+
+    def _match(
+        self, vector: np.ndarray, scope: Optional[str], conversation: str, fingerprint: str
+    ) -> Optional[str]:
+        """Finds the best live entry of a scope and conversation above the threshold."""
+        with self._lock:
+            scope_index = self._scopes.get((scope, conversation))
+            if scope_index is None:
+                return None
+
+            now = self.clock()
+            stale = [
+                entry_id
+                for entry_id in scope_index.entry_ids
+                if now - self._entries[entry_id].created_at > self.ttl_seconds
+                or self._entries[entry_id].fingerprint != fingerprint
+            ]
+            for entry_id in stale:
+                self._remove(entry_id)
+            if stale:
+                logger.debug(f"Answer cache: dropped {len(stale)} stale entries.")
+                scope_index = self._scopes.get((scope, conversation))
+                if scope_index is None:
+                    return None
+
+            similarities = scope_index.matrix(self._entries) @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                return None
+
+            entry_id = scope_index.entry_ids[best]
+            self._entries.move_to_end(entry_id)
+            entry = self._entries[entry_id]
+            logger.info(
+                f"Answer cache hit (similarity {similarities[best]:.3f}) for "
+                f"a question matching '{entry.question[:60]}'."
+            )
+            return entry.answer
+
+    def _insert(
+        self,
+        question: str,
+        vector: np.ndarray,
+        answer: str,
+        scope: Optional[str],
+        conversation: str,
+        fingerprint: str,
+    ):
+        """Adds an entry, evicting the least recently used ones beyond capacity."""
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = _CacheEntry(
+                scope, conversation, question, vector, answer, fingerprint, self.clock()
+            )
+            self._scopes.setdefault((scope, conversation), _ScopeIndex()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def lookup(
+        self, question: str, source_name: Optional[str] = None, conversation: str = ""
+    ) -> Optional[str]:
+        """
+        Looks up the answer of a similar question.
+
+        Args:
+            question: The user's question.
+            source_name: The source document the question is restricted to.
+            conversation: Digest of the turns before the question.
+
+        Returns:
+            The cached answer, or None on a miss.
+        """
+        vector = self._normalize(self.embeddings_service.create_embeddings([question])[0])
+        return self._match(vector, source_name, conversation, self._fingerprint(source_name))
+
+    def store(
+        self,
+        question: str,
+        answer: str,
+        source_name: Optional[str] = None,
+        conversation: str = "",
+    ):
+        """
+        Caches the answer of a question.
+
+        Args:
+            question: The user's question.
+            answer: The generated answer.
+            source_name: The source document the question was restricted to.
+            conversation: Digest of the turns before the question.
+        """
+        vector = self._normalize(self.embeddings_service.create_embeddings([question])[0])
+        self._insert(
+            question, vector, answer, source_name, conversation, self._fingerprint(source_name)
+        )
+
+    async def alookup(
+        self, question: str, source_name: Optional[str] = None, conversation: str = ""
+    ) -> Optional[str]:
+        """
+        Async counterpart of ``lookup``.
+
+        Args:
+            question: The user's question.
+            source_name: The source document the question is restricted to.
+            conversation: Digest of the turns before the question.
+
+        Returns:
+            The cached answer, or None on a miss.
+        """
+        embeddings = await self.embeddings_service.acreate_embeddings([question])
+        fingerprint = await asyncio.to_thread(self._fingerprint, source_name)
+        return self._match(self._normalize(embeddings[0]), source_name, conversation, fingerprint)
+
+    async def astore(
+        self,
+        question: str,
+        answer: str,
+        source_name: Optional[str] = None,
+        conversation: str = "",
+    ):
+        """
+        Async counterpart of ``store``.
+
+        Args:
+            question: The user's question.
+            answer: The generated answer.
+            source_name: The source document the question was restricted to.
+            conversation: Digest of the turns before the question.
+        """
+        embeddings = await self.embeddings_service.acreate_embeddings([question])
+        fingerprint = await asyncio.to_thread(self._fingerprint, source_name)
+        self._insert(
+            question, self._normalize(embeddings[0]), answer, source_name, conversation, fingerprint
+        )
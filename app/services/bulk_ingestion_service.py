@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Service for ingesting the documents of many users at once."""
+from collections import deque
+from typing import Deque, Iterator, List
+
+from app.services.ingestion_pipeline import IngestionJob, IngestionPipeline
+from app.services.ingestion_service import IngestionService
+from app.core.logger import logger
+
+
+class BulkIngestionService:
+    """
+    Ingests the documents of several users through one shared pipeline.
+
+    Jobs are interleaved round-robin across users, so a user with thousands
+    of changed files only gets one turn in the pipeline for each turn of
+    the others, instead of starving them until all of its files are done.
+    """
+
+    def __init__(self, services: List[IngestionService], pipeline: IngestionPipeline):
+        """
+        Initializes the service.
+
+        Args:
+            services: One ingestion service per user. Their own pipelines are
+                ignored in favour of the shared one.
+            pipeline: The pipeline shared by all users.
+        """
+        self.services = services
+        self.pipeline = pipeline
+
+    def fair_jobs(self) -> Iterator[IngestionJob]:
+        """
+        Yields the pending jobs of every user, one user at a time.
+
+        Each user's jobs are discovered lazily, so scanning a large user does
+        not delay the first jobs of the others.
+        """
+        turns: Deque[Iterator[IngestionJob]] = deque(
+            service.pending_jobs() for service in self.services
+        )
+        while turns:
+            jobs = turns.popleft()
+            job = next(jobs, None)
+            if job is None:
+                continue  # This user has no more pending jobs
+            yield job
+            turns.append(jobs)
+
+    def run_ingestion(self) -> int:
+        """
+        Runs the ingestion of all users.
+
+        Returns:
+            The number of files indexed across all users.
+        """
+        user_ids = ", ".join(service.user.id for service in self.services)
+        logger.info(f"Starting bulk ingestion for {len(self.services)} users: {user_ids}")
+        for service in self.services:
+            service.reset_stale_manifest()
+            service.backfill_lexical_index()
+
+        processed_count = self.pipeline.run(self.fair_jobs())
+
+        logger.success(
+            f"Bulk ingestion complete. Processed {processed_count} new/modified files."
+        )
+        return processed_count
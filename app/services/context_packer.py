@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""Service for fitting the retrieved context and the history into a token budget."""
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import litellm
+
+from app.core.logger import logger
+from app.models.document import Document
+
+# Tokens a chat message costs besides its content (role and delimiters).
+_MESSAGE_OVERHEAD = 4
+# Input window assumed for models unknown to LiteLLM.
+_DEFAULT_CONTEXT_WINDOW = 8192
+# Chunks separated by at most this many characters, the whitespace the
+# splitter trims, are adjacent in their source.
+_ADJACENT_GAP = 2
+_POSITION_KEYS = ("start_index", "end_index")
+
+
+@dataclass
+class PackedContext:
+    """The context and history that fit in the budget, and what was dropped."""
+
+    documents: List[Document] = field(default_factory=list)
+    history: List = field(default_factory=list)
+    kept_tokens: int = 0
+    dropped_tokens: int = 0
+    dropped_documents: int = 0
+    dropped_messages: int = 0
+
+
+class ContextPacker:
+    """
+    Fits the retrieved chunks and the conversation history into the number
+    of input tokens allowed for a model.
+
+    The prompt around the context is always sent. The newest history
+    messages get up to ``history_share`` of the remaining budget, and the
+    chunks get the rest, best first. Text a chunk shares with a better
+    chunk of the same source, i.e. the splitter's overlap, is only counted
+    once. The lowest-ranked chunks and the oldest messages are dropped
+    first. Kept chunks that overlap or touch in their source are then merged,
+    so the shared text is sent once.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        max_tokens: Optional[int] = None,
+        reserved_tokens: int = 1024,
+        history_share: float = 0.25,
+        counter: Optional[Callable[[str], int]] = None,
+    ):
+        """
+        Initializes the packer.
+
+        Args:
+            model: The model the prompt is for, used to count tokens.
+            max_tokens: Input tokens allowed per request. Defaults to the
+                model's input window minus ``reserved_tokens``.
+            reserved_tokens: Tokens left for the answer when the budget
+                comes from the model's input window.
+            history_share: Share of the budget the history may use.
+            counter: Counts the tokens of a text. Defaults to the model's
+                tokenizer, through LiteLLM.
+        """
+        self.model = model
+        if max_tokens is None:
+            max_tokens = self.context_window(model) - reserved_tokens
+        self.max_tokens = max(0, max_tokens)
+        self.history_share = history_share
+        self.count = counter or (lambda text: litellm.token_counter(model=model, text=text))
+
+    @staticmethod
+    def context_window(model: str) -> int:
+        """Returns a model's input window, as known to LiteLLM."""
+        try:
+            return litellm.get_model_info(model)["max_input_tokens"] or _DEFAULT_CONTEXT_WINDOW
+        except Exception:
+            return _DEFAULT_CONTEXT_WINDOW
+
+    @staticmethod
+    def _parent(doc: Document) -> Optional[Tuple]:
+        """Identifies the text a chunk was cut from, or None if its position is unknown."""
+        metadata = doc.metadata or {}
+        if not all(isinstance(metadata.get(key), int) for key in _POSITION_KEYS):
+            return None
+        rest = sorted(
+            (key, repr(value)) for key, value in metadata.items() if key not in _POSITION_KEYS
+        )
+        return (doc.source_name, tuple(rest))
+
+    @staticmethod
+    def _uncovered(start: int, end: int, spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Parts of [start, end) that none of the spans cover."""
+        parts, position = [], start
+        for span_start, span_end in sorted(spans):
+            if span_end <= position or span_start >= end:
+                continue
+            if span_start > position:
+                parts.append((position, span_start))
+            position = max(position, span_end)
+        if position < end:
+            parts.append((position, end))
+        return parts
+
+    def _new_text(self, doc: Document, kept_spans: Dict[Tuple, List[Tuple[int, int]]]) -> str:
+        """The part of a chunk's text not already sent with a kept chunk."""
+        parent = self._parent(doc)
+        if parent is None:
+            return doc.content
+        start = doc.metadata["start_index"]
+        uncovered = self._uncovered(
+            start, doc.metadata["end_index"], kept_spans.get(parent, [])
+        )
+        return "".join(doc.content[a - start : b - start] for a, b in uncovered)
+
+    @staticmethod
+    def _merge_run(run: List[Tuple[int, Document]]) -> Tuple[int, Document]:
+        """Joins chunks sorted by position into one document, ranked as its best chunk."""
+        best_rank, best = min(run, key=lambda item: item[0])
+        if len(run) == 1:
+            return best_rank, best
+        parts, end = [], None
+        for _, doc in run:
+            start = doc.metadata["start_index"]
+            if end is None:
+                parts.append(doc.content)
+            elif start >= end:
+                if start > end:
+                    parts.append("\n")  # The whitespace the splitter trimmed
+                parts.append(doc.content)
+            elif doc.metadata["end_index"] > end:
+                parts.append(doc.content[end - start :])
+            end = max(end or 0, doc.metadata["end_index"])
+        metadata = dict(best.metadata)
+        metadata["start_index"] = run[0][1].metadata["start_index"]
+        metadata["end_index"] = end
+        return best_rank, best.model_copy(update={"content": "".join(parts), "metadata": metadata})
+
+    def merge_adjacent(self, documents: List[Document]) -> List[Document]:
+        """
+        Merges chunks that overlap or touch in their source into one document.
+
+        Args:
+            documents: Chunks, best first.
+
+        Returns:
+            The merged documents, ordered by their best chunk. Chunks without
+            a position are returned unchanged.
+        """
+        groups: Dict[Tuple, List[Tuple[int, Document]]] = {}
+        merged: List[Tuple[int, Document]] = []
+        for rank, doc in enumerate(documents):
+            parent = self._parent(doc)
+            if parent is None:
+                merged.append((rank, doc))
+            else:
+                groups.setdefault(parent, []).append((rank, doc))
+
+        for chunks in groups.values():
+            chunks.sort(key=lambda item: item[1].metadata["start_index"])
+            run: List[Tuple[int, Document]] = []
+            run_end = 0
+            for rank, doc in chunks:
+                if run and doc.metadata["start_index"] > run_end + _ADJACENT_GAP:
+                    merged.append(self._merge_run(run))
+                    run = []
+                run.append((rank, doc))
+                run_end = max(run_end if len(run) > 1 else 0, doc.metadata["end_index"])
+            merged.append(self._merge_run(run))
+
+        merged.sort(key=lambda item: item[0])
+        return [doc for _, doc in merged]
+
+    def pack(
+        self, documents: List[Document], history: Optional[List] = None, fixed_text: str = ""
+    ) -> PackedContext:
+        """
+        Selects the chunks and history messages that fit in the budget.
+
+        Args:
+            documents: The retrieved chunks, best first.
+            history: The conversation messages, oldest first.
+            fixed_text: Text always sent, such as the prompt and the question.
+
+        Returns:
+            The merged chunks and the kept messages, with the token counts.
+        """
+        history = history or []
+        packed = PackedContext(kept_tokens=self.count(fixed_text) + _MESSAGE_OVERHEAD)
+        available = max(0, self.max_tokens - packed.kept_tokens)
+
+        # History: newest first, up to its share of the budget.
+        history_budget, history_tokens = int(available * self.history_share), 0
+        for position in range(len(history) - 1, -1, -1):
+            cost = self.count(history[position].content) + _MESSAGE_OVERHEAD
+            if history_tokens + cost > history_budget:
+                older = history[: position + 1]
+                packed.dropped_messages = len(older)
+                packed.dropped_tokens += cost + sum(
+                    self.count(message.content) + _MESSAGE_OVERHEAD for message in older[:-1]
+                )
+                break
+            history_tokens += cost
+            packed.history.insert(0, history[position])
+
+        # Chunks: best first, with the rest of the budget.
+        context_budget = available - history_tokens
+        context_tokens, kept, full = 0, [], False
+        kept_spans: Dict[Tuple, List[Tuple[int, int]]] = {}
+        for doc in documents:
+            cost = self.count(self._new_text(doc, kept_spans))
+            if full or context_tokens + cost > context_budget:
+                full = True
+                packed.dropped_documents += 1
+                packed.dropped_tokens += cost
+                continue
+            context_tokens += cost
+            kept.append(doc)
+            parent = self._parent(doc)
+            if parent is not None:
+                kept_spans.setdefault(parent, []).append(
+                    (doc.metadata["start_index"], doc.metadata["end_index"])
+                )
+
+        packed.documents = self.merge_adjacent(kept)
+        packed.kept_tokens += history_tokens + context_tokens
+        logger.info(
+            f"Packed the prompt for {self.model}: kept {packed.kept_tokens} of "
+            f"{self.max_tokens} tokens ({len(kept)} chunks merged into "
+            f"{len(packed.documents)}, {len(packed.history)} messages); dropped "
+            f"{packed.dropped_tokens} tokens ({packed.dropped_documents} chunks, "
+            f"{packed.dropped_messages} messages)."
+        )
+        return packed
+
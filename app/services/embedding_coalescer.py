@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""Micro-batching of concurrent single-text embedding requests."""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from app.services.embeddings_service import EmbeddingsService
+from app.core.logger import logger
+
+
+class EmbeddingCoalescer:
+    """
+    Merges concurrent one-text embedding requests into batched calls.
+
+    The first request opens a window of ``window_ms``; every request that
+    arrives before it closes, up to ``max_batch_size``, is embedded in the
+    same ``create_embeddings`` call and each caller gets its own vector.
+    Sync callers (threads) and async callers (tasks) share the batches.
+
+    Up to ``max_inflight_batches`` batches are sent concurrently, so callers
+    do not all wait behind a single provider round-trip; the provider
+    limiter of the embeddings service still bounds the actual requests.
+    While every slot is busy, new requests wait in the queue and form the
+    next, larger, batch.
+
+    A single instance should be shared by all the sessions of a process.
+    """
+
+    def __init__(
+        self,
+        embeddings_service: EmbeddingsService,
+        window_ms: float = 5.0,
+        max_batch_size: int = 64,
+        max_inflight_batches: int = 4,
+    ):
+        """
+        Initializes the coalescer.
+
+        Args:
+            embeddings_service: The service that embeds each batch.
+            window_ms: How long a batch waits for more requests.
+            max_batch_size: A full batch is sent without waiting for the window.
+            max_inflight_batches: Batches being embedded at the same time.
+        """
+        self.embeddings_service = embeddings_service
+        self.window_seconds = window_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_inflight_batches = max(1, max_inflight_batches)
+        self._requests: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._flushers: Optional[ThreadPoolExecutor] = None
+        self._slots = threading.BoundedSemaphore(self.max_inflight_batches)
+        self._start_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        """Starts the batching thread on first use."""
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._flushers = ThreadPoolExecutor(
+                    max_workers=self.max_inflight_batches,
+                    thread_name_prefix="embedding-coalescer-flush",
+                )
+                self._worker = threading.Thread(
+                    target=self._run, name="embedding-coalescer", daemon=True
+                )
+                self._worker.start()
+
+    def submit(self, text: str) -> "Future[List[float]]":
+        """
+        Schedules a text to be embedded in the next batch.
+
+        Args:
+            text: The text to embed.
+
+        Returns:
+            A future resolved with the text's vector.
+        """
+        self._ensure_worker()
+        future: Future = Future()
+        self._requests.put((text, future))
+        return future
+
+    def embed(self, text: str) -> List[float]:
+        """
+        Embeds a text, waiting for the batch it joins.
+
+        Args:
+            text: The text to embed.
+
+        Returns:
+            The text's vector.
+        """
+        return self.submit(text).result()
+
+    async def aembed(self, text: str) -> List[float]:
+        """
+        Embeds a text without blocking the event loop.
+
+        Args:
+            text: The text to embed.
+
+        Returns:
+            The text's vector.
+        """
+        return await asyncio.wrap_future(self.submit(text))
+
+    def _next_request(self, timeout: Optional[float] = None) -> Optional[Tuple[str, Future]]:
+        """
+        Takes a request off the queue, or None if the caller has cancelled it.
+
+        A taken future is marked as running, so a later cancellation (e.g.
+        of an ``aembed`` task) no longer affects it and setting its result
+        cannot fail.
+        """
+        text, future = self._requests.get(timeout=timeout)
+        if not future.set_running_or_notify_cancel():
+            return None
+        return text, future
+
+    def _collect(self) -> List[Tuple[str, Future]]:
+        """Waits for a request, then gathers more until the window closes or the batch is full."""
+        batch = []
+        while not batch:
+            request = self._next_request()
+            if request is not None:
+                batch.append(request)
+        deadline = time.monotonic() + self.window_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._next_request(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is not None:
+                batch.append(request)
+        return batch
+
+    def _run(self):
+        """Batching loop of the worker thread. No error may end it."""
+        while True:
+            # Batches are only collected once a slot is free to send them.
+            self._slots.acquire()
+            batch = self._collect()
+            try:
+                self._flushers.submit(self._flush, batch)
+            except Exception as e:
+                self._slots.release()
+                self._fail(batch, e)
+
+    def _flush(self, batch: List[Tuple[str, Future]]):
+        """Resolves a batch on a flush thread, then frees its slot."""
+        try:
+            self._process(batch)
+        except Exception as e:
+            self._fail(batch, e)
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _fail(batch: List[Tuple[str, Future]], error: Exception):
+        """Fails the requests of a batch that are still unresolved."""
+        logger.error(f"Failed to resolve a batch of {len(batch)} embedding requests: {error}")
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def _process(self, batch: List[Tuple[str, Future]]):
+        """Embeds a batch and resolves the future of each of its requests."""
+        # Identical texts in a batch are only embedded once.
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vectors = dict(zip(texts, self.embeddings_service.create_embeddings(texts)))
+        except Exception as e:
+            logger.error(f"Failed to embed a batch of {len(texts)} queries: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        logger.debug(f"Coalesced {len(batch)} embedding requests into one call.")
+        for text, future in batch:
+            future.set_result(vectors[text])
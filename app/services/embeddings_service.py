@@ -1,25 +1,251 @@
 # -*- coding: utf-8 -*-
 """Service for handling text embeddings."""
-from litellm import embedding
+import asyncio
+import hashlib
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+from litellm import aembedding, embedding
 from app.core.config import settings
+from app.core.logger import logger
+from app.core.rate_limiter import ProviderLimiter, estimate_tokens
+from app.repositories.embedding_cache_repository import EmbeddingCacheRepository
+
+_WORD_PATTERN = re.compile(r"\w+")
 
 
 class EmbeddingsService:
     """Service for generating text embeddings using LiteLLM."""
 
-    def __init__(self, model: str = "text-embedding-ada-002"):
+    def __init__(
+        self,
+        model: str = "text-embedding-ada-002",
+        max_batch_size: int = 256,
+        max_batch_tokens: int = 50000,
+        max_concurrency: int = 4,
+        cache: Optional[EmbeddingCacheRepository] = None,
+        limiter: Optional[ProviderLimiter] = None,
+    ):
+        """
+        Initializes the service.
+
+        Args:
+            model: The embedding model to use.
+            max_batch_size: Maximum number of texts sent in a single request.
+            max_batch_tokens: Maximum estimated tokens sent in a single request.
+            max_concurrency: Maximum number of requests in flight per call.
+            cache: Optional on-disk cache consulted before calling the provider.
+            limiter: Optional limiter shared by every caller of the model; it
+                enforces the request and token budgets and retries throttled calls.
+        """
         self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_concurrency = max(1, max_concurrency)
+        self.cache = cache
+        self.limiter = limiter
+
+    estimate_tokens = staticmethod(estimate_tokens)
+
+    def _make_batches(self, texts: list[str]) -> list[list[str]]:
+        """Groups consecutive texts into batches that respect both limits."""
+        batches: list[list[str]] = []
+        current: list[str] = []
+        current_tokens = 0
+
+        for text in texts:
+            tokens = self.estimate_tokens(text)
+            if current and (
+                len(current) >= self.max_batch_size
+                or current_tokens + tokens > self.max_batch_tokens
+            ):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(text)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """Sends a single batch to the provider and logs its latency."""
+        start = time.perf_counter()
+        if self.limiter is None:
+            response = embedding(model=self.model, input=texts)
+        else:
+            response = self.limiter.call(
+                lambda: embedding(model=self.model, input=texts),
+                tokens=sum(map(self.estimate_tokens, texts)),
+            )
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        logger.debug(f"Embedded batch of {len(texts)} texts in {elapsed_ms:.1f} ms")
+        return [item["embedding"] for item in response.data]
+
+    def _embed_uncached(self, texts: list[str]) -> list[list[float]]:
+        """Embeds texts with the provider, batching and parallelizing requests."""
+        if not texts:
+            return []
+
+        batches = self._make_batches(texts)
+        if len(batches) == 1:
+            return self._embed_batch(batches[0])
+
+        workers = min(self.max_concurrency, len(batches))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(self._embed_batch, batches))
+        return [vector for batch in results for vector in batch]
 
     def create_embeddings(self, texts: list[str]) -> list[list[float]]:
         """
         Create embeddings for a list of texts.
 
+        Cached embeddings are reused; only the remaining texts are sent to
+        the provider, split into batches by item count and estimated tokens
+        and sent concurrently.
+
         Args:
             texts: A list of strings to be embedded.
 
         Returns:
-            A list of embeddings, where each embedding is a list of floats.
+            A list of embeddings, where each embedding is a list of floats,
+            in the same order as the input texts.
         """
-        response = embedding(model=self.model, input=texts)
+        if self.cache is None or not texts:
+            return self._embed_uncached(texts)
+
+        hashes = [hashlib.sha256(text.encode("utf-8")).hexdigest() for text in texts]
+        vectors = self.cache.get_many(self.model, list(set(hashes)))
+
+        # Identical texts within the call are only sent once.
+        misses = {h: text for h, text in zip(hashes, texts) if h not in vectors}
+        if misses:
+            new_vectors = self._embed_uncached(list(misses.values()))
+            computed = dict(zip(misses.keys(), new_vectors))
+            self.cache.put_many(self.model, computed)
+            vectors.update(computed)
+
+        logger.debug(
+            f"Embedding cache: {len(texts) - len(misses)} hits, {len(misses)} misses."
+        )
+        return [vectors[h] for h in hashes]
+
+    async def _aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        """Async counterpart of ``_embed_batch``."""
+        start = time.perf_counter()
+        if self.limiter is None:
+            response = await aembedding(model=self.model, input=texts)
+        else:
+            response = await self.limiter.acall(
+                lambda: aembedding(model=self.model, input=texts),
+                tokens=sum(map(self.estimate_tokens, texts)),
+            )
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        logger.debug(f"Embedded batch of {len(texts)} texts in {elapsed_ms:.1f} ms")
         return [item["embedding"] for item in response.data]
 
+    async def _aembed_uncached(self, texts: list[str]) -> list[list[float]]:
+        """Async counterpart of ``_embed_uncached``, bounded by a semaphore."""
+        if not texts:
+            return []
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def embed_bounded(batch: list[str]) -> list[list[float]]:
+            async with semaphore:
+                return await self._aembed_batch(batch)
+
+        results = await asyncio.gather(
+            *(embed_bounded(batch) for batch in self._make_batches(texts))
+        )
+        return [vector for batch in results for vector in batch]
+
+    async def acreate_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """
+        Create embeddings for a list of texts without blocking the event loop.
+
+        Behaves like ``create_embeddings``; cache lookups run in a worker
+        thread since the cache is backed by SQLite.
+
+        Args:
+            texts: A list of strings to be embedded.
+
+        Returns:
+            A list of embeddings in the same order as the input texts.
+        """
+        if self.cache is None or not texts:
+            return await self._aembed_uncached(texts)
+
+        hashes = [hashlib.sha256(text.encode("utf-8")).hexdigest() for text in texts]
+        vectors = await asyncio.to_thread(self.cache.get_many, self.model, list(set(hashes)))
+
+        misses = {h: text for h, text in zip(hashes, texts) if h not in vectors}
+        if misses:
+            new_vectors = await self._aembed_uncached(list(misses.values()))
+            computed = dict(zip(misses.keys(), new_vectors))
+            await asyncio.to_thread(self.cache.put_many, self.model, computed)
+            vectors.update(computed)
+
+        logger.debug(
+            f"Embedding cache: {len(texts) - len(misses)} hits, {len(misses)} misses."
+        )
+        return [vectors[h] for h in hashes]
+
+
+@lru_cache(maxsize=65536)
+def _hash_word(word: str) -> int:
+    """Stable 64-bit hash of a word, independent of PYTHONHASHSEED."""
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class HashingEmbeddingsService(EmbeddingsService):
+    """
+    Offline, deterministic embeddings for benchmarks and local runs.
+
+    Each word is hashed into one of ``dimensions`` buckets with a random
+    sign (the "hashing trick") and the result is L2-normalized, so texts
+    sharing words get similar vectors without calling any provider. A
+    whole batch is built as a single NumPy matrix.
+    """
+
+    def __init__(self, dimensions: int = 384, **kwargs):
+        """
+        Initializes the service.
+
+        Args:
+            dimensions: The size of the generated vectors.
+            **kwargs: Batching and cache options of ``EmbeddingsService``.
+        """
+        super().__init__(model=f"hashing-{dimensions}", **kwargs)
+        self.dimensions = dimensions
+
+    def embed_text(self, text: str) -> list[float]:
+        """Builds the vector of a single text."""
+        return self._embed_batch([text])[0]
+
+    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """Embeds a batch locally; no rate limit applies."""
+        rows, hashes = [], []
+        for row, text in enumerate(texts):
+            for word in _WORD_PATTERN.findall(text.lower()):
+                rows.append(row)
+                hashes.append(_hash_word(word))
+
+        matrix = np.zeros((len(texts), self.dimensions))
+        if hashes:
+            hashes_array = np.array(hashes, dtype=np.uint64)
+            columns = ((hashes_array >> np.uint64(1)) % np.uint64(self.dimensions)).astype(np.intp)
+            signs = np.where(hashes_array & np.uint64(1), 1.0, -1.0)
+            np.add.at(matrix, (np.array(rows, dtype=np.intp), columns), signs)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix.tolist()
+
+    async def _aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        """Embeds a batch locally; the work is CPU-bound and short."""
+        return self._embed_batch(texts)
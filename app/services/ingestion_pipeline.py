@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""Staged, concurrent pipeline for ingesting files into the vector store."""
+import os
+import queue
+import threading
+from contextlib import nullcontext
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Set
+
+from app.core.document_factory import DocumentFactory
+from app.repositories.base_repository import BaseRepository
+from app.repositories.lexical_index_repository import LexicalIndexRepository
+from app.services.embeddings_service import EmbeddingsService
+from app.models.document import Document
+from app.core.logger import logger
+
+# Marks the end of the stream flowing between two stages.
+_SENTINEL = object()
+
+
+@dataclass
+class IngestionJob:
+    """A single file scheduled for ingestion."""
+
+    path: Path
+    file_hash: str
+    repository: BaseRepository
+    on_indexed: Callable[["IngestionJob", int], None]
+    stat: Optional[os.stat_result] = None
+    # Kept in sync with the repository when set.
+    lexical_index: Optional[LexicalIndexRepository] = None
+
+
+@dataclass
+class _FileState:
+    """Progress of a file whose windows travel through the pipeline."""
+
+    job: IngestionJob
+    existing_ids: Set[str]
+    # Stored ids not found in the file so far; stale once the file is done.
+    unseen_ids: Set[str] = field(default_factory=set)
+    new_count: int = 0
+    kept_count: int = 0
+    windows_written: int = 0
+    total_windows: Optional[int] = None
+    failed: bool = False
+
+
+@dataclass
+class _Window:
+    """A slice of a file's chunks, possibly still being parsed."""
+
+    state: _FileState
+    index: int
+    documents: "Future[List[Document]]"
+    last: bool
+
+
+@dataclass
+class _EmbeddedWindow:
+    """A window diffed against the chunks already stored for its file."""
+
+    window: _Window
+    new_documents: List[Document] = field(default_factory=list)
+    embeddings: List[List[float]] = field(default_factory=list)
+    kept_documents: List[Document] = field(default_factory=list)
+    failed: bool = False
+
+
+def _completed(documents: List[Document]) -> "Future[List[Document]]":
+    """Wraps already available documents in a finished future."""
+    future: Future = Future()
+    future.set_result(documents)
+    return future
+
+
+class IngestionPipeline:
+    """
+    Runs ingestion as three overlapping stages connected by bounded queues:
+
+    1. parse: a process pool runs ``DocumentFactory.load_documents``;
+    2. embed: a pool of threads requests the embeddings;
+    3. write: a single writer adds the results to the vector store.
+
+    Files larger than ``stream_threshold_bytes`` skip the process pool and
+    are streamed with ``DocumentFactory.iter_documents`` instead, so they
+    travel through the stages as windows of ``window_size`` chunks and
+    memory stays flat regardless of the file size.
+
+    Chunk ids are content-addressed, so the embed stage only embeds chunks
+    whose id is not stored yet, and once all of a file's windows are
+    written the writer deletes the ids of chunks that no longer exist.
+
+    A full queue blocks the stage feeding it, so a slow stage applies
+    backpressure instead of letting parsed files pile up in memory.
+    """
+
+    def __init__(
+        self,
+        doc_factory: DocumentFactory,
+        embeddings_service: EmbeddingsService,
+        parse_workers: int = 2,
+        embed_workers: int = 4,
+        queue_size: int = 8,
+        window_size: int = 256,
+        stream_threshold_bytes: int = 20 * 1024 * 1024,
+    ):
+        """
+        Initializes the pipeline.
+
+        Args:
+            doc_factory: The factory used to load and chunk files.
+            embeddings_service: The service used to embed the chunks.
+            parse_workers: Number of parsing processes. Use 0 to parse in a
+                thread of the current process instead.
+            embed_workers: Number of concurrent embedding threads.
+            queue_size: Maximum number of windows buffered between two stages.
+            window_size: Number of chunks per window when streaming a file.
+            stream_threshold_bytes: Files at least this large are streamed.
+        """
+        self.doc_factory = doc_factory
+        self.embeddings_service = embeddings_service
+        self.parse_workers = parse_workers
+        self.embed_workers = max(1, embed_workers)
+        self.queue_size = max(1, queue_size)
+        self.window_size = max(1, window_size)
+        self.stream_threshold_bytes = stream_threshold_bytes
+
+    def create_parse_executor(self) -> Executor:
+        """
+        Creates the executor used by the parse stage.
+
+        Long-running callers can create it once and pass it to every ``run``,
+        instead of starting and stopping the parsing processes each time.
+        """
+        if self.parse_workers > 0:
+            return ProcessPoolExecutor(max_workers=self.parse_workers)
+        return ThreadPoolExecutor(max_workers=1)
+
+    def run(self, jobs: Iterable[IngestionJob], parse_executor: Optional[Executor] = None) -> int:
+        """
+        Pushes the given jobs through the pipeline.
+
+        Args:
+            jobs: The files to ingest. The iterable is consumed lazily, so it
+                may be a generator that is still discovering work.
+            parse_executor: Optional executor for the parse stage, from
+                ``create_parse_executor``. It is left running for the caller
+                to reuse; by default one is created and shut down per run.
+
+        Returns:
+            The number of files successfully written to the vector store.
+        """
+        parsed_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        write_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+
+        parse_context = (
+            self.create_parse_executor() if parse_executor is None else nullcontext(parse_executor)
+        )
+        with parse_context as executor, ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="ingestion-streamer"
+        ) as streamer:
+            threads = [
+                threading.Thread(
+                    target=self._feed,
+                    args=(jobs, executor, streamer, parsed_queue),
+                    name="ingestion-feeder",
+                    daemon=True,
+                )
+            ]
+            threads += [
+                threading.Thread(
+                    target=self._embed,
+                    args=(parsed_queue, write_queue),
+                    name=f"ingestion-embedder-{i}",
+                    daemon=True,
+                )
+                for i in range(self.embed_workers)
+            ]
+            for thread in threads:
+                thread.start()
+
+            indexed_count = self._write(write_queue)
+
+            for thread in threads:
+                thread.join()
+
+        return indexed_count
+
+    def _feed(
+        self,
+        jobs: Iterable[IngestionJob],
+        executor: Executor,
+        streamer: Executor,
+        parsed_queue: queue.Queue,
+    ):
+        """Submits every job to the parse stage, in order."""
+        streams: List[Future] = []
+        try:
+            for job in jobs:
+                try:
+                    existing_ids = set(job.repository.get_ids(source_name=job.path.name))
+                    state = _FileState(job, existing_ids, unseen_ids=set(existing_ids))
+                    stream = job.path.stat().st_size >= self.stream_threshold_bytes
+                except Exception as e:
+                    logger.error(f"Failed to schedule '{job.path.name}': {e}")
+                    continue
+
+                if stream:
+                    streams.append(streamer.submit(self._stream, state, parsed_queue))
+                    continue
+
+                # Parse errors reach the embed stage, which marks the file as failed.
+                future = executor.submit(self.doc_factory.load_documents, str(job.path))
+                # Blocks while the embedding stage is behind.
+                parsed_queue.put(_Window(state, 0, future, last=True))
+        except Exception as e:
+            logger.error(f"Failed to schedule ingestion jobs: {e}")
+        finally:
+            for stream in streams:
+                stream.result()
+            for _ in range(self.embed_workers):
+                parsed_queue.put(_SENTINEL)
+
+    def _stream(self, state: _FileState, parsed_queue: queue.Queue):
+        """Streams a large file into the embed stage, one window at a time."""
+        logger.info(f"Streaming '{state.job.path.name}' in windows of {self.window_size} chunks.")
+        index = 0
+        try:
+            windows = self.doc_factory.iter_documents(str(state.job.path), self.window_size)
+            for documents in windows:
+                parsed_queue.put(_Window(state, index, _completed(documents), last=False))
+                index += 1
+        except Exception as e:
+            logger.error(f"Failed to process file {state.job.path}: {e}")
+            state.failed = True
+        # An empty window closes the file once every previous window is written.
+        parsed_queue.put(_Window(state, index, _completed([]), last=True))
+
+    def _embed(self, parsed_queue: queue.Queue, write_queue: queue.Queue):
+        """Embeds parsed windows until the parse stage is exhausted."""
+        while True:
+            window = parsed_queue.get()
+            if window is _SENTINEL:
+                write_queue.put(_SENTINEL)
+                return
+
+            try:
+                documents = window.documents.result()
+                embedded = self._diff_and_embed(window, documents)
+            except Exception as e:
+                logger.error(f"Failed to process '{window.state.job.path.name}': {e}")
+                embedded = _EmbeddedWindow(window, failed=True)
+
+            write_queue.put(embedded)
+
+    def _diff_and_embed(self, window: _Window, documents: List[Document]) -> _EmbeddedWindow:
+        """Embeds only the chunks of a window that are not stored yet."""
+        existing_ids = window.state.existing_ids
+        new_documents = [doc for doc in documents if doc.id not in existing_ids]
+        kept_documents = [doc for doc in documents if doc.id in existing_ids]
+
+        embeddings: List[List[float]] = []
+        if new_documents:
+            contents = [doc.content for doc in new_documents]
+            embeddings = self.embeddings_service.create_embeddings(contents)
+
+        return _EmbeddedWindow(window, new_documents, embeddings, kept_documents)
+
+    def _write(self, write_queue: queue.Queue) -> int:
+        """Writes embedded windows to their repository. Runs on the caller's thread."""
+        finished_workers = 0
+        indexed_count = 0
+
+        while finished_workers < self.embed_workers:
+            item = write_queue.get()
+            if item is _SENTINEL:
+                finished_workers += 1
+                continue
+
+            window = item.window
+            state = window.state
+            if item.failed:
+                state.failed = True
+            else:
+                try:
+                    if item.new_documents:
+                        state.job.repository.add(item.new_documents, item.embeddings)
+                    if item.kept_documents:
+                        # Positional metadata may have moved even if the text did not.
+                        state.job.repository.update_metadata(item.kept_documents)
+                    if state.job.lexical_index is not None:
+                        # Kept chunks are skipped unless they predate the index.
+                        state.job.lexical_index.add(item.new_documents + item.kept_documents)
+                    state.unseen_ids.difference_update(doc.id for doc in item.kept_documents)
+                    state.new_count += len(item.new_documents)
+                    state.kept_count += len(item.kept_documents)
+                except Exception as e:
+                    logger.error(f"Failed to index '{state.job.path.name}': {e}")
+                    state.failed = True
+
+            state.windows_written += 1
+            if window.last:
+                state.total_windows = window.index + 1
+            if state.windows_written == state.total_windows and self._finalize(state):
+                indexed_count += 1
+
+        return indexed_count
+
+    def _finalize(self, state: _FileState) -> bool:
+        """
+        Deletes a file's stale chunks once all of its windows are written.
+
+        A file that parsed into no chunks, e.g. one that was emptied, is
+        indexed too: all of its stored chunks are stale.
+        """
+        job = state.job
+        chunk_count = state.new_count + state.kept_count
+        if state.failed:
+            return False
+
+        try:
+            job.repository.delete(list(state.unseen_ids))
+            if job.lexical_index is not None:
+                job.lexical_index.delete(list(state.unseen_ids))
+        except Exception as e:
+            logger.error(f"Failed to remove stale chunks of '{job.path.name}': {e}")
+            return False
+
+        logger.info(
+            f"'{job.path.name}': {state.new_count} new, {state.kept_count} unchanged "
+            f"and {len(state.unseen_ids)} stale chunks."
+        )
+        job.on_indexed(job, chunk_count)
+        return True
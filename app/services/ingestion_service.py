@@ -3,12 +3,16 @@
 import hashlib
 import json
 from pathlib import Path
-from typing import Dict
+from typing import Iterable, Iterator, Optional
 
 from app.core.document_factory import DocumentFactory
-from app.repositories.chroma_repository import ChromaRepository
+from app.repositories.base_repository import BaseRepository
+from app.repositories.lexical_index_repository import LexicalIndexRepository
+from app.repositories.manifest_repository import ManifestRepository
+from app.models.manifest import ManifestEntry
 from app.models.user import User
 from app.services.embeddings_service import EmbeddingsService
+from app.services.ingestion_pipeline import IngestionJob, IngestionPipeline
 from app.core.logger import logger
 
 
@@ -17,82 +21,178 @@ class IngestionService:
     Orchestrates the ingestion of documents, processing only new or modified files.
     """
 
+    MANIFEST_NAME = ".ingestion_manifest.db"
+    LEGACY_MANIFEST_NAME = "ingestion_manifest.json"
+    # The legacy manifest is renamed to this, hidden, once imported.
+    IMPORTED_LEGACY_MANIFEST_NAME = ".ingestion_manifest.json.imported"
+
     def __init__(
         self,
         user: User,
-        chroma_repo: ChromaRepository,
+        chroma_repo: BaseRepository,
         doc_factory: DocumentFactory,
         embeddings_service: EmbeddingsService,
         base_doc_path: str = "documents",
+        pipeline: Optional[IngestionPipeline] = None,
+        manifest_repo: Optional[ManifestRepository] = None,
+        lexical_index: Optional[LexicalIndexRepository] = None,
     ):
         self.user = user
-        self.manifest_path = Path(base_doc_path) / self.user.id / "ingestion_manifest.json"
+        user_path = Path(base_doc_path) / self.user.id
         self.chroma_repo = chroma_repo
         self.doc_factory = doc_factory
         self.embeddings_service = embeddings_service
-        self.manifest = self._load_manifest()
+        self.pipeline = pipeline or IngestionPipeline(doc_factory, embeddings_service)
+        self.manifest = manifest_repo or ManifestRepository(str(user_path / self.MANIFEST_NAME))
+        # Maintained alongside the vector store for hybrid retrieval.
+        self.lexical_index = lexical_index
+        self._import_legacy_manifest(user_path / self.LEGACY_MANIFEST_NAME)
 
-    def _load_manifest(self) -> Dict[str, str]:
-        """Loads the ingestion manifest file, creating it if it doesn't exist."""
-        if not self.manifest_path.exists():
-            return {}
-        with open(self.manifest_path, "r", encoding="utf-8") as f:
+    def _import_legacy_manifest(self, legacy_path: Path):
+        """
+        Seeds the manifest from the JSON manifest used by older versions,
+        then renames the JSON file so it is only imported once.
+        """
+        if not legacy_path.exists():
+            return
+        with open(legacy_path, "r", encoding="utf-8") as f:
             try:
-                return json.load(f)
+                hashes = json.load(f)
             except json.JSONDecodeError:
-                return {}
-
-    def _save_manifest(self):
-        """Saves the current state of the manifest file."""
-        with open(self.manifest_path, "w", encoding="utf-8") as f:
-            json.dump(self.manifest, f, indent=2)
+                logger.warning(f"Ignoring unreadable legacy manifest: {legacy_path}")
+                return
+        self.manifest.import_hashes(hashes)
+        legacy_path.rename(legacy_path.with_name(self.IMPORTED_LEGACY_MANIFEST_NAME))
+        logger.info(f"Imported {len(hashes)} entries of the legacy manifest {legacy_path}.")
 
     @staticmethod
     def _calculate_hash(file_path: Path) -> str:
         """Calculates the SHA256 hash of a file."""
         h = hashlib.sha256()
         with open(file_path, "rb") as f:
-            while chunk := f.read(8192):
+            while chunk := f.read(1024 * 1024):
                 h.update(chunk)
         return h.hexdigest()
 
-    def run_ingestion(self):
+    def pending_jobs(self, paths: Optional[Iterable[Path]] = None) -> Iterator[IngestionJob]:
         """
-        Runs the full ingestion process for the user.
-        It finds all documents, checks them against the manifest,
-        and processes only the new or updated ones.
+        Yields an ingestion job for every new or modified document.
+
+        A file whose size, mtime and inode match the manifest is skipped
+        without being read; otherwise it is hashed, and only a different
+        hash makes it an ingestion job. A file that cannot be read is logged
+        and skipped, so it does not stop the other files.
+
+        Args:
+            paths: Optional subset of the user's documents to check.
+                Defaults to all of them.
         """
-        logger.info(f"Starting ingestion process for user: {self.user.id}")
-        all_docs = self.user.get_documents()
-        processed_count = 0
+        entries = self.manifest.get_all()
+        for doc_path in self.user.get_documents() if paths is None else paths:
+            if doc_path.name == self.LEGACY_MANIFEST_NAME:
+                continue  # Skip the legacy manifest file itself
 
-        for doc_path in all_docs:
-            if doc_path.name == self.manifest_path.name:
-                continue  # Skip the manifest file itself
+            try:
+                stat = doc_path.stat()
+                entry = entries.get(doc_path.name)
+                if entry and entry.matches_stat(stat):
+                    logger.debug(f"'{doc_path.name}' is unchanged. Skipping.")
+                    continue
+                file_hash = self._calculate_hash(doc_path)
+            except OSError as e:
+                # Unreadable or deleted since it was listed; retried on the next run.
+                logger.error(f"Failed to read '{doc_path.name}': {e}")
+                continue
 
-            file_hash = self._calculate_hash(doc_path)
-            if self.manifest.get(doc_path.name) == file_hash:
+            if entry and entry.sha256 == file_hash:
                 logger.info(f"'{doc_path.name}' is unchanged. Skipping.")
+                self.manifest.update_stat(doc_path.name, stat)
                 continue
 
             logger.warning(f"'{doc_path.name}' is new or has been modified. Processing...")
+            yield IngestionJob(
+                path=doc_path,
+                file_hash=file_hash,
+                repository=self.chroma_repo,
+                on_indexed=self._on_indexed,
+                stat=stat,
+                lexical_index=self.lexical_index,
+            )
 
-            # Process file into documents
-            documents = self.doc_factory.create_documents(str(doc_path))
-            if documents:
-                # Generate embeddings
-                contents = [doc.content for doc in documents]
-                embeddings = self.embeddings_service.create_embeddings(contents)
+    def _on_indexed(self, job: IngestionJob, chunk_count: int):
+        """Commits a file to the manifest as soon as its chunks have been written."""
+        self.manifest.upsert(
+            ManifestEntry(
+                source_name=job.path.name,
+                size=job.stat.st_size,
+                mtime_ns=job.stat.st_mtime_ns,
+                inode=job.stat.st_ino,
+                sha256=job.file_hash,
+                chunk_count=chunk_count,
+                embedding_model=self.embeddings_service.model,
+            )
+        )
+        logger.success(f"Processed and indexed '{job.path.name}' ({chunk_count} chunks).")
 
-                # Add to vector store
-                self.chroma_repo.add(documents, embeddings)
+    def remove_document(self, source_name: str):
+        """
+        Removes a deleted document's chunks from the vector store and manifest.
 
-                self.manifest[doc_path.name] = file_hash
-                processed_count += 1
-                logger.success(f"Processed and indexed '{doc_path.name}'.")
+        Args:
+            source_name: The name of the deleted file.
+        """
+        ids = self.chroma_repo.get_ids(source_name=source_name)
+        self.chroma_repo.delete(ids)
+        if self.lexical_index is not None:
+            self.lexical_index.delete(ids)
+        self.manifest.delete(source_name)
+        logger.success(f"Removed '{source_name}' from the index.")
+
+    def reset_stale_manifest(self):
+        """
+        Forgets the recorded files when the vector store holds none of their
+        chunks, e.g. the first run against the user's own collection, so
+        every document is ingested again.
+
+        Entries imported from the legacy manifest have no chunk count, so
+        they count as having chunks; only files recorded with 0 chunks, i.e.
+        empty ones, are consistent with an empty store.
+        """
+        entries = self.manifest.get_all()
+        expects_chunks = any(
+            entry.chunk_count or entry.embedding_model is None for entry in entries.values()
+        )
+        if expects_chunks and self.chroma_repo.count() == 0:
+            logger.warning(
+                f"The vector store of user '{self.user.id}' is empty; "
+                f"re-ingesting {len(entries)} recorded files."
+            )
+            self.manifest.clear()
+
+    def backfill_lexical_index(self):
+        """Indexes the chunks stored before the lexical index was introduced."""
+        if self.lexical_index is None or len(self.lexical_index) > 0:
+            return
+        indexed = 0
+        for documents in self.chroma_repo.iter_documents():
+            self.lexical_index.add(documents)
+            indexed += len(documents)
+        if indexed:
+            logger.info(f"Built the lexical index of {indexed} stored chunks.")
+
+    def run_ingestion(self):
+        """
+        Runs the full ingestion process for the user.
+        It finds all documents, checks them against the manifest,
+        and processes only the new or updated ones through the
+        ingestion pipeline.
+        """
+        logger.info(f"Starting ingestion process for user: {self.user.id}")
+        self.reset_stale_manifest()
+        self.backfill_lexical_index()
+        processed_count = self.pipeline.run(self.pending_jobs())
 
         if processed_count > 0:
-            self._save_manifest()
             logger.success(
                 f"Ingestion complete. Processed {processed_count} new/modified files."
             )
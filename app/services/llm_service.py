@@ -1,14 +1,55 @@
 # -*- coding: utf-8 -*-
 """Service for interacting with Large Language Models."""
-from litellm import completion
+import asyncio
+import hashlib
+import json
+import re
+import time
+from typing import AsyncIterator, Iterator, Optional
+
+from litellm import acompletion, completion
 from app.core.config import settings
+from app.core.logger import logger
+from app.core.rate_limiter import ProviderLimiter, estimate_tokens
 
 
 class LLMService:
     """Service to interact with LLMs using LiteLLM."""
 
-    def __init__(self, model: str):
+    def __init__(self, model: str, limiter: Optional[ProviderLimiter] = None):
+        """
+        Initializes the service.
+
+        Args:
+            model: The model to use.
+            limiter: Optional limiter shared by every caller of the model; it
+                enforces the request and token budgets and retries throttled calls.
+        """
         self.model = model
+        self.limiter = limiter
+
+    @staticmethod
+    def _estimate_tokens(messages: list[dict]) -> int:
+        """Estimated prompt tokens of a conversation, charged to the token budget."""
+        return sum(estimate_tokens(m.get("content") or "") for m in messages)
+
+    def _completion(self, messages: list[dict], **kwargs):
+        """Calls the provider through the limiter, when one is set."""
+        if self.limiter is None:
+            return completion(model=self.model, messages=messages, **kwargs)
+        return self.limiter.call(
+            lambda: completion(model=self.model, messages=messages, **kwargs),
+            tokens=self._estimate_tokens(messages),
+        )
+
+    async def _acompletion(self, messages: list[dict], **kwargs):
+        """Async counterpart of ``_completion``."""
+        if self.limiter is None:
+            return await acompletion(model=self.model, messages=messages, **kwargs)
+        return await self.limiter.acall(
+            lambda: acompletion(model=self.model, messages=messages, **kwargs),
+            tokens=self._estimate_tokens(messages),
+        )
 
     def get_completion(self, messages: list[dict]) -> str:
         """
@@ -20,6 +61,183 @@ class LLMService:
         Returns:
             The content of the response message.
         """
-        response = completion(model=self.model, messages=messages)
+        response = self._completion(messages)
+        return response.choices[0].message.content
+
+    async def aget_completion(self, messages: list[dict]) -> str:
+        """
+        Get a completion from the configured LLM without blocking the event loop.
+
+        Args:
+            messages: A list of messages in the format expected by LiteLLM.
+
+        Returns:
+            The content of the response message.
+        """
+        response = await self._acompletion(messages)
         return response.choices[0].message.content
 
+    def _stream_tokens(self, messages: list[dict]) -> Iterator[str]:
+        """
+        Yields the text deltas of a streamed completion.
+
+        The limiter covers opening the stream, so a throttled request is
+        retried before any token is yielded; errors midway are not retried.
+        """
+        for chunk in self._completion(messages, stream=True):
+            token = chunk.choices[0].delta.content
+            if token:
+                yield token
+
+    async def _astream_tokens(self, messages: list[dict]) -> AsyncIterator[str]:
+        """Async counterpart of ``_stream_tokens``."""
+        response = await self._acompletion(messages, stream=True)
+        async for chunk in response:
+            token = chunk.choices[0].delta.content
+            if token:
+                yield token
+
+    def _log_stream(self, started_at: float, first_token_at: Optional[float], token_count: int):
+        """Logs the latency of a finished stream."""
+        finished_at = time.perf_counter()
+        if first_token_at is None:
+            logger.warning(f"Streamed completion from {self.model} returned no tokens.")
+            return
+        logger.info(
+            f"Streamed completion from {self.model}: first token "
+            f"{(first_token_at - started_at) * 1000:.0f} ms after the call, "
+            f"{token_count} chunks in "
+            f"{(finished_at - started_at) * 1000:.0f} ms."
+        )
+
+    def stream_completion(self, messages: list[dict]) -> Iterator[str]:
+        """
+        Stream a completion from the configured LLM, chunk by chunk.
+
+        The time to first token is measured from this call, i.e. the LLM's
+        own latency, and logged once the stream ends. The conversation graph
+        logs it from the start of the turn.
+
+        Args:
+            messages: A list of messages in the format expected by LiteLLM.
+
+        Yields:
+            The text chunks of the response, in order.
+        """
+        started_at = time.perf_counter()
+        first_token_at = None
+        token_count = 0
+        try:
+            for token in self._stream_tokens(messages):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                token_count += 1
+                yield token
+        finally:
+            self._log_stream(started_at, first_token_at, token_count)
+
+    async def astream_completion(self, messages: list[dict]) -> AsyncIterator[str]:
+        """
+        Async counterpart of ``stream_completion``.
+
+        Args:
+            messages: A list of messages in the format expected by LiteLLM.
+
+        Yields:
+            The text chunks of the response, in order.
+        """
+        started_at = time.perf_counter()
+        first_token_at = None
+        token_count = 0
+        try:
+            async for token in self._astream_tokens(messages):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                token_count += 1
+                yield token
+        finally:
+            self._log_stream(started_at, first_token_at, token_count)
+
+
+class LocalLLMService(LLMService):
+    """
+    Deterministic, offline stand-in for an LLM, for load tests and development.
+
+    The answer is rendered from a template using the last user message, so
+    the same conversation always gets the same answer, after an optional
+    synthetic latency that mimics a provider round-trip.
+    """
+
+    DEFAULT_TEMPLATE = "Resposta simulada [{digest}]: {question}"
+
+    def __init__(
+        self,
+        model: str = "local",
+        latency_ms: float = 0.0,
+        template: str = DEFAULT_TEMPLATE,
+        max_question_chars: int = 200,
+    ):
+        """
+        Initializes the service.
+
+        Args:
+            model: Name reported for the model.
+            latency_ms: Synthetic delay added to every completion.
+            template: Format string with ``{question}``, ``{digest}`` and
+                ``{message_count}`` placeholders.
+            max_question_chars: The question is truncated to this length.
+        """
+        super().__init__(model=model)
+        self.latency_ms = latency_ms
+        self.template = template
+        self.max_question_chars = max_question_chars
+
+    def _render(self, messages: list[dict]) -> str:
+        """Renders the templated answer for a conversation."""
+        question = next(
+            (m["content"] for m in reversed(messages) if m.get("role") == "user"), ""
+        )
+        question = " ".join(question.split())[: self.max_question_chars]
+        digest = hashlib.sha256(
+            json.dumps(messages, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()[:8]
+        return self.template.format(
+            question=question, digest=digest, message_count=len(messages)
+        )
+
+    def get_completion(self, messages: list[dict]) -> str:
+        """
+        Get a templated completion after the synthetic latency.
+
+        Args:
+            messages: A list of messages in the format expected by LiteLLM.
+
+        Returns:
+            The rendered answer.
+        """
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000)
+        return self._render(messages)
+
+    async def aget_completion(self, messages: list[dict]) -> str:
+        """
+        Get a templated completion after the synthetic latency, asynchronously.
+
+        Args:
+            messages: A list of messages in the format expected by LiteLLM.
+
+        Returns:
+            The rendered answer.
+        """
+        if self.latency_ms > 0:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return self._render(messages)
+
+    def _stream_tokens(self, messages: list[dict]) -> Iterator[str]:
+        """Streams the rendered answer word by word after the synthetic latency."""
+        yield from re.findall(r"\S+\s*", self.get_completion(messages))
+
+    async def _astream_tokens(self, messages: list[dict]) -> AsyncIterator[str]:
+        """Async counterpart of ``_stream_tokens``."""
+        for token in re.findall(r"\S+\s*", await self.aget_completion(messages)):
+            yield token
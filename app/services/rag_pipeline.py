@@ -1,8 +1,22 @@
 # -*- coding: utf-8 -*-
 """Core RAG (Retrieval-Augmented Generation) pipeline."""
-from typing import List, Optional
+from typing import AsyncIterator, Iterator, List, Optional
 from app.services.retrieval_service import RetrievalService
 from app.services.llm_service import LLMService
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.context_packer import ContextPacker
+from app.models.document import Document
+
+_PROMPT_TEMPLATE = """
+        Based on the following context, answer the user's question.
+        Context:
+        {context}
+
+        Question:
+        {query}
+
+        Answer:
+        """
 
 
 class RAGPipeline:
@@ -12,15 +26,56 @@ class RAGPipeline:
         self,
         retrieval_service: RetrievalService,
         llm_service: LLMService,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+        context_packer: Optional[ContextPacker] = None,
     ):
         self.retrieval_service = retrieval_service
         self.llm_service = llm_service
+        # Only consulted for queries without history, whose answer depends
+        # on the query and the documents alone.
+        self.answer_cache = answer_cache
+        # Keeps the prompt within the model's token budget.
+        self.context_packer = context_packer
+
+    def _build_messages(
+        self, query: str, context_documents: List[Document], history: List = None
+    ) -> List[dict]:
+        """
+        Builds the LLM messages from the retrieved context and the history,
+        fitted into the model's token budget when there is a context packer.
+        """
+        if self.context_packer is not None:
+            packed = self.context_packer.pack(
+                context_documents,
+                history,
+                fixed_text=_PROMPT_TEMPLATE.format(context="", query=query),
+            )
+            context_documents, history = packed.documents, packed.history
+
+        context = "\n".join([doc.content for doc in context_documents])
+        prompt = _PROMPT_TEMPLATE.format(context=context, query=query)
+
+        messages = []
+        if history:
+            from langchain_core.messages import HumanMessage
+
+            for interaction in history:
+                if isinstance(interaction, HumanMessage):
+                    messages.append({"role": "user", "content": interaction.content})
+                else:  # Assumes AIMessage
+                    messages.append(
+                        {"role": "assistant", "content": interaction.content}
+                    )
+
+        messages.append({"role": "user", "content": prompt})
+        return messages
 
     def execute(
         self,
         query: str,
         history: List = None,
         source_name: Optional[str] = None,
+        context_documents: Optional[List[Document]] = None,
     ) -> str:
         """
         Execute the RAG pipeline.
@@ -29,39 +84,138 @@ class RAGPipeline:
             query: The user's query.
             history: A list of previous user/bot interactions.
             source_name: Optional source name to filter the document retrieval.
+            context_documents: Documents already retrieved for the query; when
+                given, they are used as the context instead of searching again.
 
         Returns:
             The generated answer.
         """
-        context_documents = self.retrieval_service.retrieve_documents(
-            query, source_name=source_name
-        )
-        context = "\n".join([doc.content for doc in context_documents])
-
-        prompt = f"""
-        Based on the following context, answer the user's question.
-        Context:
-        {context}
+        use_cache = self.answer_cache is not None and not history
+        if use_cache:
+            cached_answer = self.answer_cache.lookup(query, source_name=source_name)
+            if cached_answer is not None:
+                return cached_answer
 
-        Question:
-        {query}
+        if context_documents is None:
+            context_documents = self.retrieval_service.retrieve_documents(
+                query, source_name=source_name
+            )
+        messages = self._build_messages(query, context_documents, history)
+        answer = self.llm_service.get_completion(messages)
+        if use_cache:
+            self.answer_cache.store(query, answer, source_name=source_name)
+        return answer
 
-        Answer:
+    async def aexecute(
+        self,
+        query: str,
+        history: List = None,
+        source_name: Optional[str] = None,
+        context_documents: Optional[List[Document]] = None,
+    ) -> str:
         """
+        Execute the RAG pipeline without blocking the event loop.
 
-        messages = []
-        if history:
-            from langchain_core.messages import HumanMessage
+        Args:
+            query: The user's query.
+            history: A list of previous user/bot interactions.
+            source_name: Optional source name to filter the document retrieval.
+            context_documents: Documents already retrieved for the query; when
+                given, they are used as the context instead of searching again.
 
-            for interaction in history:
-                if isinstance(interaction, HumanMessage):
-                    messages.append({"role": "user", "content": interaction.content})
-                else:  # Assumes AIMessage
-                    messages.append(
-                        {"role": "assistant", "content": interaction.content}
-                    )
+        Returns:
+            The generated answer.
+        """
+        use_cache = self.answer_cache is not None and not history
+        if use_cache:
+            cached_answer = await self.answer_cache.alookup(query, source_name=source_name)
+            if cached_answer is not None:
+                return cached_answer
 
-        messages.append({"role": "user", "content": prompt})
-        answer = self.llm_service.get_completion(messages)
+        if context_documents is None:
+            context_documents = await self.retrieval_service.aretrieve_documents(
+                query, source_name=source_name
+            )
+        messages = self._build_messages(query, context_documents, history)
+        answer = await self.llm_service.aget_completion(messages)
+        if use_cache:
+            await self.answer_cache.astore(query, answer, source_name=source_name)
         return answer
 
+    def stream_execute(
+        self,
+        query: str,
+        history: List = None,
+        source_name: Optional[str] = None,
+        context_documents: Optional[List[Document]] = None,
+    ) -> Iterator[str]:
+        """
+        Execute the RAG pipeline, streaming the answer as it is generated.
+
+        Args:
+            query: The user's query.
+            history: A list of previous user/bot interactions.
+            source_name: Optional source name to filter the document retrieval.
+            context_documents: Documents already retrieved for the query; when
+                given, they are used as the context instead of searching again.
+
+        Yields:
+            The chunks of the answer. A cached answer comes as a single chunk.
+        """
+        use_cache = self.answer_cache is not None and not history
+        if use_cache:
+            cached_answer = self.answer_cache.lookup(query, source_name=source_name)
+            if cached_answer is not None:
+                yield cached_answer
+                return
+
+        if context_documents is None:
+            context_documents = self.retrieval_service.retrieve_documents(
+                query, source_name=source_name
+            )
+        messages = self._build_messages(query, context_documents, history)
+        tokens = []
+        for token in self.llm_service.stream_completion(messages):
+            tokens.append(token)
+            yield token
+        if use_cache:
+            self.answer_cache.store(query, "".join(tokens), source_name=source_name)
+
+    async def astream_execute(
+        self,
+        query: str,
+        history: List = None,
+        source_name: Optional[str] = None,
+        context_documents: Optional[List[Document]] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Async counterpart of ``stream_execute``.
+
+        Args:
+            query: The user's query.
+            history: A list of previous user/bot interactions.
+            source_name: Optional source name to filter the document retrieval.
+            context_documents: Documents already retrieved for the query; when
+                given, they are used as the context instead of searching again.
+
+        Yields:
+            The chunks of the answer. A cached answer comes as a single chunk.
+        """
+        use_cache = self.answer_cache is not None and not history
+        if use_cache:
+            cached_answer = await self.answer_cache.alookup(query, source_name=source_name)
+            if cached_answer is not None:
+                yield cached_answer
+                return
+
+        if context_documents is None:
+            context_documents = await self.retrieval_service.aretrieve_documents(
+                query, source_name=source_name
+            )
+        messages = self._build_messages(query, context_documents, history)
+        tokens = []
+        async for token in self.llm_service.astream_completion(messages):
+            tokens.append(token)
+            yield token
+        if use_cache:
+            await self.answer_cache.astore(query, "".join(tokens), source_name=source_name)
@@ -1,9 +1,18 @@
 # -*- coding: utf-8 -*-
 """Service for retrieving relevant documents."""
-from typing import List, Optional
-from app.repositories.chroma_repository import ChromaRepository
+import asyncio
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from app.core.mmr import maximal_marginal_relevance
+from app.repositories.base_repository import QUERY_FIELDS, BaseRepository
+from app.repositories.lexical_index_repository import LexicalIndexRepository
 from app.services.embeddings_service import EmbeddingsService
+from app.services.embedding_coalescer import EmbeddingCoalescer
 from app.models.document import Document
+from app.models.search_result import SearchResult
+from app.core.logger import logger
 
 
 class RetrievalService:
@@ -11,11 +20,53 @@ class RetrievalService:
 
     def __init__(
         self,
-        repository: ChromaRepository,
+        repository: BaseRepository,
         embeddings_service: EmbeddingsService,
+        coalescer: Optional[EmbeddingCoalescer] = None,
+        lexical_index: Optional[LexicalIndexRepository] = None,
+        hybrid_candidates: int = 20,
+        rrf_k: int = 60,
+        mmr_fetch_k: int = 0,
+        mmr_lambda: float = 0.5,
     ):
+        """
+        Initializes the service.
+
+        Args:
+            repository: The vector store.
+            embeddings_service: The service used to embed the queries.
+            coalescer: When set, single-query embeddings of concurrent
+                sessions are batched.
+            lexical_index: When set, searches are hybrid: the BM25 and the
+                vector rankings are fused with reciprocal rank fusion.
+            hybrid_candidates: Candidates taken from each ranking before fusion.
+            rrf_k: Rank offset of the fusion; higher values flatten the
+                advantage of the first positions.
+            mmr_fetch_k: When above top_k, this many candidates are fetched
+                and re-ranked by maximal marginal relevance, so near-duplicate
+                chunks do not crowd out the others. 0 disables it.
+            mmr_lambda: Relevance weight of the re-ranking; 1 ignores diversity.
+        """
         self.repository = repository
         self.embeddings_service = embeddings_service
+        self.coalescer = coalescer
+        self.lexical_index = lexical_index
+        self.hybrid_candidates = hybrid_candidates
+        self.rrf_k = rrf_k
+        self.mmr_fetch_k = mmr_fetch_k
+        self.mmr_lambda = mmr_lambda
+
+    def _embed_query(self, query: str) -> List[float]:
+        """Embeds a single query, through the coalescer when there is one."""
+        if self.coalescer is not None:
+            return self.coalescer.embed(query)
+        return self.embeddings_service.create_embeddings([query])[0]
+
+    async def _aembed_query(self, query: str) -> List[float]:
+        """Async counterpart of ``_embed_query``."""
+        if self.coalescer is not None:
+            return await self.coalescer.aembed(query)
+        return (await self.embeddings_service.acreate_embeddings([query]))[0]
 
     def retrieve_documents(
         self, query: str, top_k: int = 5, source_name: Optional[str] = None
@@ -31,8 +82,173 @@ class RetrievalService:
         Returns:
             A list of relevant Document objects.
         """
-        query_embedding = self.embeddings_service.create_embeddings([query])[0]
-        return self.repository.query(
-            query_embedding=query_embedding, top_k=top_k, source_name=source_name
+        results = self.retrieve_results(query, top_k=top_k, source_name=source_name)
+        return [result.document for result in results]
+
+    def retrieve_results(
+        self, query: str, top_k: int = 5, source_name: Optional[str] = None
+    ) -> List[SearchResult]:
+        """
+        Retrieve relevant documents for a query, with their distances.
+
+        Args:
+            query: The query text.
+            top_k: The number of documents to retrieve.
+            source_name: Optional source name to filter the search.
+
+        Returns:
+            The search results, closest first.
+        """
+        query_embedding = self._embed_query(query)
+        return self._search(query, query_embedding, top_k, source_name)
+
+    def retrieve_many(
+        self,
+        queries: List[str],
+        top_k: Union[int, List[int]] = 5,
+        source_names: Optional[List[Optional[str]]] = None,
+        include: Sequence[str] = QUERY_FIELDS,
+    ) -> List[List[SearchResult]]:
+        """
+        Retrieve results for several queries with one embedding call and
+        one vector store round trip per distinct filter.
+
+        Args:
+            queries: The query texts.
+            top_k: The number of results, for all queries or per query.
+            source_names: Optional per-query source name filters.
+            include: Fields to fetch besides the ids ("distances", "documents").
+
+        Returns:
+            One list of results per query, in order.
+        """
+        if not queries:
+            return []
+        query_embeddings = self.embeddings_service.create_embeddings(queries)
+        return self.repository.query_many(
+            query_embeddings, top_k=top_k, source_names=source_names, include=include
+        )
+
+    async def aretrieve_documents(
+        self, query: str, top_k: int = 5, source_name: Optional[str] = None
+    ) -> List[Document]:
+        """
+        Retrieve relevant documents without blocking the event loop.
+
+        Args:
+            query: The query text.
+            top_k: The number of documents to retrieve.
+            source_name: Optional source name to filter the search.
+
+        Returns:
+            A list of relevant Document objects.
+        """
+        results = await self.aretrieve_results(query, top_k=top_k, source_name=source_name)
+        return [result.document for result in results]
+
+    async def aretrieve_results(
+        self, query: str, top_k: int = 5, source_name: Optional[str] = None
+    ) -> List[SearchResult]:
+        """
+        Async counterpart of ``retrieve_results``.
+
+        Args:
+            query: The query text.
+            top_k: The number of documents to retrieve.
+            source_name: Optional source name to filter the search.
+
+        Returns:
+            The search results, closest first.
+        """
+        query_embedding = await self._aembed_query(query)
+        return await asyncio.to_thread(
+            self._search, query, query_embedding, top_k, source_name
+        )
+
+    def _search(
+        self,
+        query: str,
+        query_embedding: List[float],
+        top_k: int,
+        source_name: Optional[str],
+    ) -> List[SearchResult]:
+        """Runs the vector or hybrid search, then the MMR re-ranking if enabled."""
+        fetch_k = max(top_k, self.mmr_fetch_k)
+        if self.lexical_index is None:
+            results = self.repository.query_many(
+                [query_embedding], top_k=fetch_k, source_names=[source_name]
+            )[0]
+        else:
+            results = self._hybrid_search(query, query_embedding, fetch_k, source_name)
+        if fetch_k > top_k:
+            results = self._diversify(query_embedding, results, top_k)
+        return results
+
+    def _diversify(
+        self, query_embedding: List[float], results: List[SearchResult], top_k: int
+    ) -> List[SearchResult]:
+        """
+        Keeps the top_k results with the best maximal marginal relevance.
+
+        The candidates' embeddings are fetched in one call, which also covers
+        the lexical-only hits of a hybrid search.
+        """
+        embeddings = self.repository.get_embeddings([result.id for result in results])
+        results = [result for result in results if result.id in embeddings]
+        if len(results) <= top_k:
+            return results
+        picked = maximal_marginal_relevance(
+            np.asarray(query_embedding, dtype=np.float32),
+            np.stack([embeddings[result.id] for result in results]),
+            top_k,
+            self.mmr_lambda,
         )
+        logger.debug(f"MMR kept {len(picked)} of {len(results)} candidates: {picked}")
+        return [results[i] for i in picked]
+
+    def _hybrid_search(
+        self,
+        query: str,
+        query_embedding: List[float],
+        top_k: int,
+        source_name: Optional[str],
+    ) -> List[SearchResult]:
+        """
+        Fuses the vector and BM25 rankings with reciprocal rank fusion.
 
+        Each candidate scores ``sum(1 / (rrf_k + rank))`` over the rankings
+        it appears in, so chunks matching the query's exact terms (codes,
+        form names) surface even when their embedding is not among the
+        closest, and chunks found by both searches come first.
+        """
+        candidates = max(top_k, self.hybrid_candidates)
+        dense = self.repository.query_many(
+            [query_embedding], top_k=candidates, source_names=[source_name]
+        )[0]
+        lexical = self.lexical_index.search(query, top_k=candidates, source_name=source_name)
+
+        scores: Dict[str, float] = {}
+        for ranking in ([result.id for result in dense], [doc_id for doc_id, _ in lexical]):
+            for rank, doc_id in enumerate(ranking, start=1):
+                scores[doc_id] = scores.get(doc_id, 0.0) + 1 / (self.rrf_k + rank)
+        best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+
+        by_id = {result.id: result for result in dense}
+        missing = [doc_id for doc_id in best if doc_id not in by_id]
+        # Lexical-only hits are fetched from the vector store, which holds the texts.
+        lexical_documents = {doc.id: doc for doc in self.repository.get_documents(missing)}
+        results = []
+        for doc_id in best:
+            if doc_id in by_id:
+                results.append(by_id[doc_id].model_copy(update={"score": scores[doc_id]}))
+            elif doc_id in lexical_documents:
+                results.append(
+                    SearchResult(
+                        id=doc_id, document=lexical_documents[doc_id], score=scores[doc_id]
+                    )
+                )
+        logger.debug(
+            f"Hybrid search: {len(dense)} vector and {len(lexical)} lexical candidates, "
+            f"{sum(doc_id in by_id for doc_id in best)} of the top {len(best)} found by vectors."
+        )
+        return results
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""Service that keeps the vector store in sync with the users' documents."""
+import itertools
+import threading
+import time
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.services.bulk_ingestion_service import BulkIngestionService
+from app.services.ingestion_service import IngestionService
+from app.core.logger import logger
+
+# (size, mtime_ns, inode) of a file, as observed by the last poll.
+FileSignature = Tuple[int, int, int]
+
+
+class IngestionWatcher:
+    """
+    Long-running ingestion that polls ``documents/<user>/`` for changes.
+
+    A changed file is only ingested once it has been quiet for the debounce
+    period, so a burst of writes to the same file triggers a single
+    ingestion. The services, vector store client, pipeline and parsing
+    processes are created once and reused for every change.
+
+    When given ``list_users`` and ``create_service``, the watcher also picks
+    up users whose directory appears while it runs; their documents are
+    then ingested like any other change.
+    """
+
+    def __init__(
+        self,
+        bulk_service: BulkIngestionService,
+        poll_interval: float = 2.0,
+        debounce_seconds: float = 1.0,
+        list_users: Optional[Callable[[], List[str]]] = None,
+        create_service: Optional[Callable[[str], IngestionService]] = None,
+        user_refresh_seconds: float = 30.0,
+    ):
+        """
+        Initializes the watcher.
+
+        Args:
+            bulk_service: The ingestion of the watched users.
+            poll_interval: Seconds between two scans of the directories.
+            debounce_seconds: Seconds a file must stay unchanged before it
+                is ingested.
+            list_users: Optional callable listing the users to watch.
+            create_service: Builds the ingestion service of a new user, on
+                the bulk service's pipeline. Required with ``list_users``.
+            user_refresh_seconds: Seconds between two listings of the users.
+        """
+        self.bulk_service = bulk_service
+        self.poll_interval = poll_interval
+        self.debounce_seconds = debounce_seconds
+        self.list_users = list_users
+        self.create_service = create_service
+        self.user_refresh_seconds = user_refresh_seconds
+        self._snapshots: Dict[str, Dict[Path, FileSignature]] = {}
+        # Last time a change was seen, per (user id, path) not yet processed.
+        self._pending: Dict[Tuple[str, Path], float] = {}
+        self._users_listed_at: Optional[float] = None
+        # Kept alive by ``run`` across polls; None parses with a per-poll executor.
+        self._parse_executor: Optional[Executor] = None
+
+    @staticmethod
+    def _scan(service: IngestionService) -> Dict[Path, FileSignature]:
+        """Stats every document of a user."""
+        snapshot = {}
+        for path in service.user.get_documents():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue  # Deleted between listing and stat
+            snapshot[path] = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        return snapshot
+
+    def _add_new_users(self, now: float):
+        """Creates the services of users listed since the last refresh."""
+        if self.list_users is None or self.create_service is None:
+            return
+        if (
+            self._users_listed_at is not None
+            and now - self._users_listed_at < self.user_refresh_seconds
+        ):
+            return
+        self._users_listed_at = now
+
+        known = {service.user.id for service in self.bulk_service.services}
+        for user_id in self.list_users():
+            if user_id in known:
+                continue
+            try:
+                service = self.create_service(user_id)
+            except Exception as e:
+                logger.error(f"Failed to start watching user '{user_id}': {e}")
+                continue
+            self.bulk_service.services.append(service)
+            logger.info(f"Watching the documents of new user '{user_id}'.")
+
+    def poll_once(self, now: Optional[float] = None) -> int:
+        """
+        Scans the directories once and processes the settled changes.
+
+        Args:
+            now: The current time, overridable for tests.
+
+        Returns:
+            The number of files indexed or removed.
+        """
+        now = time.monotonic() if now is None else now
+        self._add_new_users(now)
+        services = {service.user.id: service for service in self.bulk_service.services}
+
+        for user_id, service in services.items():
+            current = self._scan(service)
+            previous = self._snapshots.get(user_id, {})
+            for path in current.keys() | previous.keys():
+                if current.get(path) != previous.get(path):
+                    self._pending[(user_id, path)] = now
+            self._snapshots[user_id] = current
+
+        ready = sorted(
+            key for key, changed_at in self._pending.items()
+            if now - changed_at >= self.debounce_seconds
+        )
+        if not ready:
+            return 0
+        for key in ready:
+            del self._pending[key]
+
+        try:
+            return self._process(services, ready)
+        except Exception:
+            # Retried on the next poll rather than lost.
+            for key in ready:
+                self._pending.setdefault(key, now)
+            raise
+
+    def _process(self, services: Dict[str, IngestionService], ready: List[Tuple[str, Path]]) -> int:
+        """Ingests the changed files and removes the deleted ones."""
+        changed: Dict[str, List[Path]] = {}
+        removed_count = 0
+        for user_id, path in ready:
+            if path in self._snapshots[user_id]:
+                changed.setdefault(user_id, []).append(path)
+            else:
+                services[user_id].remove_document(path.name)
+                removed_count += 1
+
+        jobs = itertools.chain.from_iterable(
+            services[user_id].pending_jobs(paths) for user_id, paths in changed.items()
+        )
+        processed_count = self.bulk_service.pipeline.run(
+            jobs, parse_executor=self._parse_executor
+        )
+        return processed_count + removed_count
+
+    def run(self, stop_event: Optional[threading.Event] = None):
+        """
+        Catches up with a full ingestion, then watches until stopped.
+
+        The directories are scanned before the catch-up, so files changed or
+        deleted while it runs are picked up by the first polls. Files the
+        catch-up already ingested are then skipped by their manifest entry.
+
+        Args:
+            stop_event: Optional event that ends the loop when set.
+        """
+        stop_event = stop_event or threading.Event()
+        for service in self.bulk_service.services:
+            self._snapshots[service.user.id] = self._scan(service)
+        self._users_listed_at = time.monotonic()
+        self.bulk_service.run_ingestion()
+
+        logger.info(
+            f"Watching {len(self.bulk_service.services)} users for changes "
+            f"every {self.poll_interval}s."
+        )
+        with self.bulk_service.pipeline.create_parse_executor() as executor:
+            self._parse_executor = executor
+            try:
+                while not stop_event.wait(self.poll_interval):
+                    try:
+                        processed_count = self.poll_once()
+                    except Exception as e:
+                        logger.error(f"Failed to process document changes: {e}")
+                        continue
+                    if processed_count:
+                        logger.success(f"Synchronized {processed_count} changed files.")
+            finally:
+                self._parse_executor = None
@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""Performance benchmarks. Run them from the repository root with ``python -m``."""
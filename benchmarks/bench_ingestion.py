@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the ingestion path on a synthetic corpus, fully offline.
+
+Generates TXT, MD, CSV and PDF files, runs them through DocumentFactory,
+a deterministic hashing embedder and ChromaRepository, and saves the
+throughput, per-stage latency and peak RSS as JSON.
+
+Usage:
+    python -m benchmarks.bench_ingestion [--files 20] [--size-kb 64]
+        [--output results.json] [--compare previous.json]
+"""
+# Apply patches before any other application imports
+from app.core.patches import apply_patches
+apply_patches()
+
+import argparse
+import json
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+
+from app.core.config import settings
+from app.core.document_factory import DocumentFactory
+from app.repositories.chroma_repository import ChromaRepository
+from app.services.embeddings_service import HashingEmbeddingsService
+from app.services.ingestion_pipeline import IngestionJob, IngestionPipeline
+
+FILE_TYPES = ["txt", "md", "csv", "pdf"]
+
+_VOCABULARY = (
+    "contrato cliente pagamento prazo entrega servico produto qualidade relatorio "
+    "processo sistema dados usuario acesso documento registro analise resultado "
+    "projeto equipe reuniao cronograma orcamento fornecedor nota fiscal pedido "
+    "estoque venda compra auditoria conformidade risco controle indicador meta "
+    "de da do em para com por uma um o a os as que nao mais como foi sao"
+).split()
+
+
+# --- Corpus generation ---------------------------------------------------
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(_VOCABULARY) for _ in range(rng.randint(6, 18))]
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraphs(rng: random.Random, size: int) -> List[str]:
+    paragraphs, total = [], 0
+    while total < size:
+        paragraph = " ".join(_sentence(rng) for _ in range(rng.randint(2, 8)))
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 2
+    return paragraphs
+
+
+def _write_txt(path: Path, rng: random.Random, size: int):
+    path.write_text("\n\n".join(_paragraphs(rng, size)), encoding="utf-8")
+
+
+def _write_md(path: Path, rng: random.Random, size: int):
+    blocks = []
+    for i, paragraph in enumerate(_paragraphs(rng, size)):
+        if i % 4 == 0:
+            blocks.append(f"## Secao {i // 4 + 1}")
+        if i % 3 == 0:
+            blocks.append("\n".join(f"- {_sentence(rng)}" for _ in range(3)))
+        blocks.append(paragraph)
+    path.write_text("\n\n".join(blocks), encoding="utf-8")
+
+
+def _write_csv(path: Path, rng: random.Random, size: int):
+    rows, total = ["id,cliente,valor,descricao"], 0
+    while total < size:
+        row = (
+            f"{len(rows)},{rng.choice(_VOCABULARY)},{rng.randint(1, 99999)},"
+            f"\"{_sentence(rng)}\""
+        )
+        rows.append(row)
+        total += len(row) + 1
+    path.write_text("\n".join(rows), encoding="utf-8")
+
+
+def _escape_pdf(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _write_pdf(path: Path, rng: random.Random, size: int, lines_per_page: int = 60):
+    """Writes a minimal text PDF by hand (Helvetica, one text object per page)."""
+    lines = []
+    for paragraph in _paragraphs(rng, size):
+        words = paragraph.split()
+        lines.extend(" ".join(words[i:i + 12]) for i in range(0, len(words), 12))
+        lines.append("")
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages)))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, page_lines in enumerate(pages):
+        text = "".join(f"({_escape_pdf(line)}) '\n" for line in page_lines)
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td\n{text}ET".encode("latin-1")
+        objects.append(
+            (
+                "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+            ).encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref_offset,
+    )
+    path.write_bytes(bytes(out))
+
+
+_WRITERS = {"txt": _write_txt, "md": _write_md, "csv": _write_csv, "pdf": _write_pdf}
+
+
+def generate_corpus(root: Path, file_types: List[str], files: int, size_kb: int, seed: int) -> List[Path]:
+    """Generates ``files`` files of roughly ``size_kb`` KB per type."""
+    rng = random.Random(seed)
+    root.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for file_type in file_types:
+        for i in range(files):
+            path = root / f"{file_type}_{i:04d}.{file_type}"
+            _WRITERS[file_type](path, rng, size_kb * 1024)
+            paths.append(path)
+    return paths
+
+
+# --- Measurements --------------------------------------------------------
+
+def _latency_summary(samples: List[float]) -> Dict[str, float]:
+    """Summarizes latencies given in seconds, reported in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "total_s": round(sum(ordered), 4),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def _peak_rss_mb(who: int) -> float:
+    """Peak resident set size in MB (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(who).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_staged(paths: List[Path], factory: DocumentFactory, embedder: HashingEmbeddingsService) -> dict:
+    """Runs each file through the three stages in sequence, timing each stage."""
+    repository = ChromaRepository(collection_name="benchmark_staged")
+    latencies: Dict[str, List[float]] = {"parse": [], "embed": [], "write": []}
+    chunk_count = 0
+
+    start = time.perf_counter()
+    for path in paths:
+        t0 = time.perf_counter()
+        documents = factory.create_documents(str(path))
+        t1 = time.perf_counter()
+        embeddings = embedder.create_embeddings([doc.content for doc in documents])
+        t2 = time.perf_counter()
+        if documents:
+            repository.add(documents, embeddings)
+        t3 = time.perf_counter()
+
+        latencies["parse"].append(t1 - t0)
+        latencies["embed"].append(t2 - t1)
+        latencies["write"].append(t3 - t2)
+        chunk_count += len(documents)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "elapsed_s": round(elapsed, 4),
+        "files": len(paths),
+        "chunks": chunk_count,
+        "files_per_s": round(len(paths) / elapsed, 2),
+        "chunks_per_s": round(chunk_count / elapsed, 2),
+        "stages": {stage: _latency_summary(samples) for stage, samples in latencies.items()},
+    }
+
+
+def run_pipeline(paths: List[Path], factory: DocumentFactory, embedder: HashingEmbeddingsService) -> dict:
+    """Runs all files through the concurrent IngestionPipeline."""
+    repository = ChromaRepository(collection_name="benchmark_pipeline")
+    pipeline = IngestionPipeline(
+        doc_factory=factory,
+        embeddings_service=embedder,
+        parse_workers=settings.INGESTION_PARSE_WORKERS,
+        embed_workers=settings.INGESTION_EMBED_WORKERS,
+        queue_size=settings.INGESTION_QUEUE_SIZE,
+        window_size=settings.INGESTION_WINDOW_SIZE,
+        stream_threshold_bytes=settings.INGESTION_STREAM_THRESHOLD_MB * 1024 * 1024,
+    )
+    chunk_counts: List[int] = []
+    jobs = [
+        IngestionJob(
+            path=path,
+            file_hash="",
+            repository=repository,
+            on_indexed=lambda job, chunk_count: chunk_counts.append(chunk_count),
+        )
+        for path in paths
+    ]
+
+    start = time.perf_counter()
+    indexed_count = pipeline.run(jobs)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "elapsed_s": round(elapsed, 4),
+        "files": indexed_count,
+        "chunks": sum(chunk_counts),
+        "files_per_s": round(indexed_count / elapsed, 2),
+        "chunks_per_s": round(sum(chunk_counts) / elapsed, 2),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _print_comparison(current: dict, previous: dict):
+    """Prints the throughput change against a previous result file."""
+    print(f"\nCompared with {previous.get('git_commit', '?')}:")
+    for mode in ("staged", "pipeline"):
+        if mode not in current or mode not in previous:
+            continue
+        for metric in ("files_per_s", "chunks_per_s"):
+            before, after = previous[mode][metric], current[mode][metric]
+            change = (after - before) / before * 100 if before else float("inf")
+            print(f"  {mode:8} {metric:12} {before:10.2f} -> {after:10.2f} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline ingestion benchmark.")
+    parser.add_argument("--types", default=",".join(FILE_TYPES), help="Comma-separated file types.")
+    parser.add_argument("--files", type=int, default=20, help="Files generated per type.")
+    parser.add_argument("--size-kb", type=int, default=64, help="Approximate size of each file.")
+    parser.add_argument("--dimensions", type=int, default=384, help="Embedding dimensions.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the corpus generator.")
+    parser.add_argument("--skip-pipeline", action="store_true", help="Only run the staged mode.")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/ingestion-<commit>.json).")
+    parser.add_argument("--compare", help="Previous result file to compare against.")
+    args = parser.parse_args()
+
+    file_types = [t.strip() for t in args.types.split(",") if t.strip()]
+    unknown = set(file_types) - set(FILE_TYPES)
+    if unknown:
+        parser.error(f"Unsupported file types: {', '.join(sorted(unknown))}")
+
+    commit = _git_commit()
+    with tempfile.TemporaryDirectory(prefix="ingestion-benchmark-") as workdir:
+        settings.VECTOR_DB_PATH = str(Path(workdir) / "chroma")
+        paths = generate_corpus(Path(workdir) / "corpus", file_types, args.files, args.size_kb, args.seed)
+
+        factory = DocumentFactory(settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
+        embedder = HashingEmbeddingsService(
+            dimensions=args.dimensions,
+            max_batch_size=settings.EMBEDDING_BATCH_SIZE,
+            max_batch_tokens=settings.EMBEDDING_BATCH_TOKENS,
+        )
+
+        result = {
+            "git_commit": commit,
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {
+                **vars(args),
+                "chunk_size": settings.CHUNK_SIZE,
+                "chunk_overlap": settings.CHUNK_OVERLAP,
+            },
+            "corpus": {
+                "files": len(paths),
+                "bytes": sum(path.stat().st_size for path in paths),
+            },
+            "staged": run_staged(paths, factory, embedder),
+        }
+        if not args.skip_pipeline:
+            result["pipeline"] = run_pipeline(paths, factory, embedder)
+
+    result["peak_rss_mb"] = {
+        "self": _peak_rss_mb(resource.RUSAGE_SELF),
+        "children": _peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+    output = Path(args.output or f"benchmarks/results/ingestion-{commit}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2), encoding="utf-8")
+
+    staged = result["staged"]
+    print(f"Corpus: {result['corpus']['files']} files, {result['corpus']['bytes'] / 1e6:.1f} MB")
+    print(f"Staged:   {staged['files_per_s']:8.2f} files/s {staged['chunks_per_s']:10.2f} chunks/s")
+    for stage, summary in staged["stages"].items():
+        print(f"  {stage:6} p50 {summary['p50_ms']:9.2f} ms  p95 {summary['p95_ms']:9.2f} ms")
+    if "pipeline" in result:
+        pipeline = result["pipeline"]
+        print(f"Pipeline: {pipeline['files_per_s']:8.2f} files/s {pipeline['chunks_per_s']:10.2f} chunks/s")
+    print(f"Peak RSS: {result['peak_rss_mb']['self']} MB (children {result['peak_rss_mb']['children']} MB)")
+    print(f"Saved to {output}")
+
+    if args.compare:
+        _print_comparison(result, json.loads(Path(args.compare).read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of quantized vector search against ChromaRepository, fully offline.
+
+Stores synthetic clustered vectors in ChromaDB, then compares the recall@k
+(against an exact brute-force search), the query latency and the memory
+of ChromaRepository and of QuantizedChromaRepository for each storage type
+and re-ranking factor.
+
+Usage:
+    python -m benchmarks.bench_quantization [--count 20000] [--dimensions 1536]
+        [--queries 200] [--top-k 5] [--rerank-factors 1,2,4,8] [--output results.json]
+"""
+# Apply patches before any other application imports
+from app.core.patches import apply_patches
+apply_patches()
+
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from app.core.config import settings
+from app.models.document import Document
+from app.repositories.chroma_repository import ChromaRepository
+from app.repositories.quantized_chroma_repository import QuantizedChromaRepository
+
+COLLECTION = "bench_quantization"
+# ChromaDB rejects larger insert batches.
+_ADD_BATCH = 5000
+
+
+def make_vectors(count: int, dimensions: int, seed: int = 0) -> np.ndarray:
+    """Unit vectors around random topic centroids, like text embeddings."""
+    rng = np.random.default_rng(seed)
+    centroids = rng.normal(size=(max(1, count // 100), dimensions))
+    vectors = centroids[rng.integers(len(centroids), size=count)]
+    vectors += rng.normal(scale=0.6, size=vectors.shape)
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int) -> List[List[int]]:
+    """Ground-truth nearest neighbours by squared L2 distance."""
+    distances = (
+        (queries ** 2).sum(axis=1)[:, None] - 2 * queries @ vectors.T + (vectors ** 2).sum(axis=1)
+    )
+    return np.argsort(distances, axis=1)[:, :k].tolist()
+
+
+def measure(repo: ChromaRepository, queries: np.ndarray, truth: List[List[int]], k: int) -> Dict:
+    """Runs every query alone and returns the recall@k and latency percentiles."""
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        results = repo.query_many([query.tolist()], top_k=k, include=["distances"])[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len({int(r.id) for r in results} & set(expected))
+    latencies.sort()
+    return {
+        "recall_at_k": round(hits / (len(queries) * k), 4),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 3),
+    }
+
+
+def directory_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=20000, help="Stored vectors.")
+    parser.add_argument("--dimensions", type=int, default=1536, help="Vector dimensions.")
+    parser.add_argument("--queries", type=int, default=200, help="Queries to run.")
+    parser.add_argument("--top-k", type=int, default=5, help="Results per query.")
+    parser.add_argument(
+        "--rerank-factors", default="1,2,4,8", help="Comma-separated re-ranking factors."
+    )
+    parser.add_argument("--output", help="Optional path of a JSON report.")
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.count, args.dimensions)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(args.count, size=args.queries)]
+    queries = queries + rng.normal(scale=0.02, size=queries.shape).astype(np.float32)
+    truth = exact_neighbours(vectors, queries, args.top_k)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.VECTOR_DB_PATH = tmp
+        baseline = ChromaRepository(collection_name=COLLECTION)
+        for start in range(0, args.count, _ADD_BATCH):
+            end = min(start + _ADD_BATCH, args.count)
+            baseline.add(
+                [Document(id=str(i), content="", source_name="bench") for i in range(start, end)],
+                vectors[start:end].tolist(),
+            )
+        chroma_bytes = directory_size(Path(tmp))
+
+        rows = [{
+            "mode": "chroma (float32, HNSW)",
+            "vector_memory_mb": round(vectors.nbytes / 1e6, 2),
+            **measure(baseline, queries, truth, args.top_k),
+        }]
+        for dtype in ("float16", "int8"):
+            repo = QuantizedChromaRepository(collection_name=COLLECTION, dtype=dtype)
+            sidecar = Path(tmp) / f"quantized_{COLLECTION}.db"
+            for factor in (int(f) for f in args.rerank_factors.split(",")):
+                repo.rerank_factor = factor
+                rows.append({
+                    "mode": f"{dtype}, rerank x{factor}",
+                    "vector_memory_mb": round(repo.store.nbytes / 1e6, 2),
+                    "sidecar_mb": round(sidecar.stat().st_size / 1e6, 2),
+                    **measure(repo, queries, truth, args.top_k),
+                })
+            del repo
+
+    print(
+        f"{args.count} vectors x {args.dimensions} dims, {args.queries} queries, "
+        f"k={args.top_k}; ChromaDB directory: {chroma_bytes / 1e6:.1f} MB"
+    )
+    print(f"{'mode':<26}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}{'memory MB':>12}")
+    for row in rows:
+        print(
+            f"{row['mode']:<26}{row['recall_at_k']:>10.4f}{row['p50_ms']:>10.2f}"
+            f"{row['p95_ms']:>10.2f}{row['vector_memory_mb']:>12.2f}"
+        )
+
+    if args.output:
+        report = {
+            "count": args.count,
+            "dimensions": args.dimensions,
+            "queries": args.queries,
+            "top_k": args.top_k,
+            "chroma_directory_mb": round(chroma_bytes / 1e6, 2),
+            "results": rows,
+        }
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the built-in text splitter against LangChain's.
+
+Usage:
+    python -m benchmarks.bench_splitter [--path documents] [--repeat 5]
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from app.core.config import settings
+from app.core.document_factory import DocumentFactory
+from app.core.text_splitter import RecursiveTextSplitter
+
+
+def load_corpus(root: Path) -> List[str]:
+    """Loads the text of every supported file under a directory."""
+    factory = DocumentFactory(settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
+    texts = []
+    for path in sorted(root.rglob("*")):
+        loader_class = factory._loaders.get(path.suffix.lower())
+        if path.is_file() and loader_class:
+            texts.extend(doc.page_content for doc in loader_class(str(path)).lazy_load())
+    return texts
+
+
+def best_time(split: Callable[[str], List[str]], texts: List[str], repeat: int) -> float:
+    """Returns the fastest of ``repeat`` runs splitting the whole corpus."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            split(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--path", default="documents", help="Directory with the corpus.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per splitter.")
+    args = parser.parse_args()
+
+    texts = load_corpus(Path(args.path))
+    if not texts:
+        raise SystemExit(f"No supported documents found under '{args.path}'.")
+
+    langchain_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=settings.CHUNK_SIZE,
+        chunk_overlap=settings.CHUNK_OVERLAP,
+        length_function=len,
+    )
+    splitter = RecursiveTextSplitter(settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
+
+    mismatches = sum(
+        langchain_splitter.split_text(text) != splitter.split_text(text) for text in texts
+    )
+    baseline = best_time(langchain_splitter.split_text, texts, args.repeat)
+    candidate = best_time(splitter.split_text, texts, args.repeat)
+    characters = sum(len(text) for text in texts)
+
+    print(f"Corpus: {len(texts)} texts, {characters / 1e6:.2f} M characters")
+    print(f"LangChain splitter: {baseline * 1000:9.1f} ms")
+    print(f"Built-in splitter:  {candidate * 1000:9.1f} ms ({baseline / candidate:.2f}x)")
+    print(f"Texts with different chunks: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Sweeps ChromaDB's HNSW parameters and reports recall, latency and size.
+
+Builds one collection per combination of M, construction_ef and search_ef,
+then runs every query against it and reports the recall@k against an exact
+search, the p50/p99 query latency, the build time and the size on disk.
+
+The stored vectors are sampled from a user's collection (--user) or
+generated offline. The queries are real questions embedded with the
+configured embeddings service (--queries-file, one per line), or stored
+vectors with a little noise added.
+
+Usage:
+    python -m benchmarks.tune_hnsw [--user default_user] [--queries-file questions.txt]
+        [--sample 20000] [--space l2] [--m 8,16,32] [--construction-ef 100,200]
+        [--search-ef 10,20,50,100] [--top-k 5] [--target-recall 0.95]
+        [--output results.json]
+"""
+# Apply patches before any other application imports
+from app.core.patches import apply_patches
+apply_patches()
+
+import argparse
+import itertools
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from chromadb.api.client import SharedSystemClient
+
+from app.core.config import settings
+from app.core.factory import AppFactory
+from app.models.document import Document
+from app.repositories.base_repository import tenant_collection_name
+from app.repositories.chroma_repository import HNSW_SPACES, ChromaRepository, exact_distances
+from benchmarks.bench_quantization import directory_size, make_vectors
+
+COLLECTION = "tune_hnsw"
+# ChromaDB rejects larger insert batches.
+_ADD_BATCH = 5000
+
+
+def load_user_vectors(user_id: str, sample: int) -> np.ndarray:
+    """Reads up to ``sample`` stored vectors from a user's collection."""
+    repo = ChromaRepository(tenant_collection_name(settings.COLLECTION_NAME, user_id))
+    vectors = []
+    while len(vectors) < sample:
+        page = repo.collection.get(
+            include=["embeddings"],
+            limit=min(_ADD_BATCH, sample - len(vectors)),
+            offset=len(vectors),
+        )
+        if not page["ids"]:
+            break
+        vectors.extend(page["embeddings"])
+    if not vectors:
+        raise SystemExit(f"The collection of user '{user_id}' is empty.")
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def load_queries(path: Optional[str], vectors: np.ndarray, count: int) -> np.ndarray:
+    """Embeds the questions of a file, or perturbs random stored vectors."""
+    if path:
+        questions = [
+            line.strip() for line in Path(path).read_text(encoding="utf-8").splitlines()
+            if line.strip()
+        ]
+        embeddings = AppFactory.create_embeddings_service().create_embeddings(questions)
+        return np.asarray(embeddings, dtype=np.float32)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(len(vectors), size=count)]
+    return queries + rng.normal(scale=0.02, size=queries.shape).astype(np.float32)
+
+
+def build(vectors: np.ndarray, space: str, m: int, construction_ef: int, search_ef: int):
+    """Stores the vectors in a new collection and returns it with its build time."""
+    repo = ChromaRepository(
+        COLLECTION, space=space, hnsw_m=m, construction_ef=construction_ef, search_ef=search_ef
+    )
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), _ADD_BATCH):
+        end = min(offset + _ADD_BATCH, len(vectors))
+        repo.add(
+            [Document(id=str(i), content="", source_name="tune") for i in range(offset, end)],
+            vectors[offset:end].tolist(),
+        )
+    return repo, time.perf_counter() - start
+
+
+def measure(repo: ChromaRepository, queries: np.ndarray, truth: List[List[int]], k: int) -> Dict:
+    """Runs every query alone and returns the recall@k and latency percentiles."""
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        results = repo.query_many([query.tolist()], top_k=k, include=["distances"])[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len({int(r.id) for r in results} & set(expected))
+    latencies.sort()
+    return {
+        "recall_at_k": round(hits / (len(queries) * k), 4),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p99_ms": round(latencies[int(0.99 * (len(latencies) - 1))], 3),
+    }
+
+
+def _ints(value: str) -> List[int]:
+    return [int(item) for item in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--user", help="Sample the stored vectors of this user.")
+    parser.add_argument("--queries-file", help="Questions to embed, one per line.")
+    parser.add_argument("--sample", type=int, default=20000, help="Stored vectors to use.")
+    parser.add_argument("--dimensions", type=int, default=1536, help="Offline vector size.")
+    parser.add_argument("--queries", type=int, default=200, help="Offline queries to run.")
+    parser.add_argument("--space", default=settings.HNSW_SPACE, choices=HNSW_SPACES)
+    parser.add_argument("--m", type=_ints, default=[8, 16, 32], help="Values of M.")
+    parser.add_argument("--construction-ef", type=_ints, default=[100, 200])
+    parser.add_argument("--search-ef", type=_ints, default=[10, 20, 50, 100])
+    parser.add_argument("--top-k", type=int, default=settings.RETRIEVAL_TOP_K)
+    parser.add_argument(
+        "--target-recall", type=float, default=0.95,
+        help="Recall the recommended combination must reach.",
+    )
+    parser.add_argument("--output", help="Optional path of a JSON report.")
+    args = parser.parse_args()
+
+    vectors = (
+        load_user_vectors(args.user, args.sample)
+        if args.user
+        else make_vectors(args.sample, args.dimensions)
+    )
+    queries = load_queries(args.queries_file, vectors, args.queries)
+    truth = (
+        np.argsort(exact_distances(vectors, queries, args.space), axis=1)[:, : args.top_k]
+    ).tolist()
+
+    rows = []
+    for m, construction_ef, search_ef in itertools.product(
+        args.m, args.construction_ef, args.search_ef
+    ):
+        with tempfile.TemporaryDirectory() as tmp:
+            settings.VECTOR_DB_PATH = tmp
+            repo, build_seconds = build(vectors, args.space, m, construction_ef, search_ef)
+            rows.append({
+                "M": m,
+                "construction_ef": construction_ef,
+                "search_ef": search_ef,
+                "build_s": round(build_seconds, 2),
+                "disk_mb": round(directory_size(Path(tmp)) / 1e6, 2),
+                **measure(repo, queries, truth, args.top_k),
+            })
+            del repo
+            SharedSystemClient.clear_system_cache()
+
+    print(
+        f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, "
+        f"k={args.top_k}, space={args.space}"
+    )
+    print(
+        f"{'M':>4}{'constr_ef':>11}{'search_ef':>11}{'recall@k':>10}"
+        f"{'p50 ms':>9}{'p99 ms':>9}{'build s':>9}{'disk MB':>9}"
+    )
+    for row in rows:
+        print(
+            f"{row['M']:>4}{row['construction_ef']:>11}{row['search_ef']:>11}"
+            f"{row['recall_at_k']:>10.4f}{row['p50_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+            f"{row['build_s']:>9.2f}{row['disk_mb']:>9.2f}"
+        )
+
+    eligible = [row for row in rows if row["recall_at_k"] >= args.target_recall]
+    recommended = min(eligible, key=lambda row: row["p99_ms"]) if eligible else None
+    if recommended:
+        print(
+            f"Fastest p99 with recall >= {args.target_recall}: HNSW_M={recommended['M']} "
+            f"HNSW_CONSTRUCTION_EF={recommended['construction_ef']} "
+            f"HNSW_SEARCH_EF={recommended['search_ef']}"
+        )
+    else:
+        print(f"No combination reached a recall of {args.target_recall}.")
+
+    if args.output:
+        report = {
+            "vectors": len(vectors),
+            "dimensions": int(vectors.shape[1]),
+            "queries": len(queries),
+            "top_k": args.top_k,
+            "space": args.space,
+            "target_recall": args.target_recall,
+            "recommended": recommended,
+            "results": rows,
+        }
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from functools import partial
 from langchain_core.messages import HumanMessage, AnyMessage
+from langchain_core.runnables import RunnableLambda
 
+from app.models.search_result import SearchResult
 from app.services.llm_service import LLMService
 from app.services.retrieval_service import RetrievalService
 from ..state import AgentState
@@ -16,12 +18,11 @@ def get_last_user_message(messages: List[AnyMessage]) -> str:
     return messages[-1].content
 
 
-def reformulate_query(llm_service: LLMService, query: str) -> str:
+def build_reformulation_prompt(query: str) -> str:
     """
-    Usa um LLM para reformular a pergunta do usuário, tornando-a mais clara e direta
-    para a busca por similaridade.
+    Monta o prompt que pede ao LLM para reformular a consulta do usuário.
     """
-    prompt = f"""Sua tarefa é reformular a consulta de um usuário para que ela seja mais eficaz em uma busca por similaridade em uma base de documentos.
+    return f"""Sua tarefa é reformular a consulta de um usuário para que ela seja mais eficaz em uma busca por similaridade em uma base de documentos.
     - Se a consulta for uma saudação ou uma interação social curta (como "oi", "olá", "tudo bem?"), transforme-a em uma descrição da ação do usuário.
     - Se a consulta for uma pergunta real, reformule-a para ser mais clara, direta e completa, otimizando-a para a busca.
     - Retorne apenas a consulta reformulada, sem adicionar nenhuma outra frase ou explicação.
@@ -38,22 +39,69 @@ def reformulate_query(llm_service: LLMService, query: str) -> str:
 
     Consulta Original: "{query}"
     """
+
+
+def reformulate_query(llm_service: LLMService, query: str) -> str:
+    """
+    Usa um LLM para reformular a pergunta do usuário, tornando-a mais clara e direta
+    para a busca por similaridade.
+    """
+    prompt = build_reformulation_prompt(query)
     response = llm_service.get_completion([{"role": "user", "content": prompt}])
     return response
 
 
+async def areformulate_query(llm_service: LLMService, query: str) -> str:
+    """
+    Versão assíncrona de `reformulate_query`.
+    """
+    prompt = build_reformulation_prompt(query)
+    return await llm_service.aget_completion([{"role": "user", "content": prompt}])
+
+
 def similarity_search(
-    retrieval_service: RetrievalService, query: str
-) -> list[str]:
+    retrieval_service: RetrievalService,
+    query: str,
+    source_name: Optional[str] = None,
+    top_k: int = 5,
+) -> List[SearchResult]:
+    """
+    Realiza uma busca por similaridade no ChromaDB, opcionalmente restrita a um documento.
+    Os resultados trazem os documentos completos e suas distâncias, e são usados
+    como contexto da resposta, sem uma segunda busca.
     """
-    Realiza uma busca por similaridade no ChromaDB.
+    return retrieval_service.retrieve_results(query, top_k=top_k, source_name=source_name)
+
+
+async def asimilarity_search(
+    retrieval_service: RetrievalService,
+    query: str,
+    source_name: Optional[str] = None,
+    top_k: int = 5,
+) -> List[SearchResult]:
+    """
+    Versão assíncrona de `similarity_search`.
     """
-    documents = retrieval_service.retrieve_documents(query, top_k=3)
-    return [doc.content for doc in documents]
+    return await retrieval_service.aretrieve_results(
+        query, top_k=top_k, source_name=source_name
+    )
+
+
+def describe_results(search_results: List[SearchResult]) -> List[str]:
+    """
+    Resume os resultados da busca para o log: id e distância de cada documento.
+    """
+    return [
+        f"{result.id} ({result.distance:.3f})" if result.distance is not None else result.id
+        for result in search_results
+    ]
 
 
 def process_initial_request(
-    state: AgentState, llm_service: LLMService, retrieval_service: RetrievalService
+    state: AgentState,
+    llm_service: LLMService,
+    retrieval_service: RetrievalService,
+    top_k: int = 5,
 ) -> Dict[str, Any]:
     """
     Nó que processa a requisição inicial do usuário.
@@ -72,8 +120,10 @@ def process_initial_request(
     print(f"Query Reformulada: {reformulated}")
 
     # 3. Realiza a busca por similaridade
-    search_results = similarity_search(retrieval_service, reformulated)
-    print(f"Resultados da Busca: {search_results}")
+    search_results = similarity_search(
+        retrieval_service, reformulated, source_name=state.get("source_name"), top_k=top_k
+    )
+    print(f"Resultados da Busca: {describe_results(search_results)}")
 
     # Retorna os novos valores para serem adicionados ao estado
     return {
@@ -82,14 +132,50 @@ def process_initial_request(
     }
 
 
+async def aprocess_initial_request(
+    state: AgentState,
+    llm_service: LLMService,
+    retrieval_service: RetrievalService,
+    top_k: int = 5,
+) -> Dict[str, Any]:
+    """
+    Versão assíncrona de `process_initial_request`, usada quando o grafo é
+    executado com `ainvoke`.
+    """
+    print("--- Executando Nó: process_initial_request (async) ---")
+
+    user_query = get_last_user_message(state["messages"])
+    print(f"Query Original: {user_query}")
+
+    reformulated = await areformulate_query(llm_service, user_query)
+    print(f"Query Reformulada: {reformulated}")
+
+    search_results = await asimilarity_search(
+        retrieval_service, reformulated, source_name=state.get("source_name"), top_k=top_k
+    )
+    print(f"Resultados da Busca: {describe_results(search_results)}")
+
+    return {
+        "reformulated_query": reformulated,
+        "search_results": search_results,
+    }
+
+
 def create_initial_request_node(
-    llm_service: LLMService, retrieval_service: RetrievalService
-):
+    llm_service: LLMService, retrieval_service: RetrievalService, top_k: int = 5
+) -> RunnableLambda:
     """
     Cria um nó de requisição inicial com os serviços injetados.
+    O nó tem uma implementação síncrona (`invoke`) e uma assíncrona (`ainvoke`).
+    `top_k` é o número de documentos buscados, que formam o contexto da resposta.
     """
-    return partial(
-        process_initial_request,
-        llm_service=llm_service,
-        retrieval_service=retrieval_service,
+    services = {
+        "llm_service": llm_service,
+        "retrieval_service": retrieval_service,
+        "top_k": top_k,
+    }
+    return RunnableLambda(
+        partial(process_initial_request, **services),
+        afunc=partial(aprocess_initial_request, **services),
+        name="initial_request",
     )
\ No newline at end of file
@@ -1,7 +1,9 @@
-from typing import TypedDict, Annotated, List
+from typing import TypedDict, Annotated, List, Optional
 import operator
 from langchain_core.messages import AnyMessage
 
+from app.models.search_result import SearchResult
+
 # Define o estado do grafo. Esta é a "memória" que será passada entre os nós.
 class AgentState(TypedDict):
     # Histórico de mensagens da conversa
@@ -10,5 +12,9 @@ class AgentState(TypedDict):
     # A pergunta do usuário, reformulada para maior clareza
     reformulated_query: str
 
-    # Resultados da busca por similaridade
-    search_results: List[str]
+    # Resultados da busca por similaridade (documentos com suas distâncias),
+    # reutilizados como contexto da resposta
+    search_results: List[SearchResult]
+
+    # Documento ao qual a busca está restrita (None para todos)
+    source_name: Optional[str]
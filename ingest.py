@@ -1,23 +1,96 @@
 # -*- coding: utf-8 -*-
-"""Script to run the intelligent ingestion process for a user."""
+"""Script to run the intelligent ingestion process for one or all users."""
 
 # Apply patches before any other application imports
 from app.core.patches import apply_patches
 apply_patches()
 
+import argparse
+
 from app.core.factory import AppFactory
+from app.core.logger import logger
+from app.core.rate_limiter import provider_limiters
+
+
+def parse_args() -> argparse.Namespace:
+    """Parses the command-line arguments."""
+    parser = argparse.ArgumentParser(description="Ingest user documents into the vector store.")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument(
+        "--user",
+        action="append",
+        dest="users",
+        help="ID of a user to ingest. Repeat to ingest several users.",
+    )
+    target.add_argument(
+        "--all",
+        action="store_true",
+        help="Ingest every user that has a directory under documents/.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and ingest documents as they change.",
+    )
+    parser.add_argument(
+        "--embedding-rpm",
+        type=int,
+        default=None,
+        help="Embedding requests per minute shared by all users (0 disables the limit).",
+    )
+    return parser.parse_args()
+
+
+def log_provider_stats():
+    """Logs the throttling counters of every provider limiter used by the run."""
+    for stats in provider_limiters.stats().values():
+        logger.info(
+            f"{stats.name}: {stats.requests} requests, {stats.throttled} throttled, "
+            f"{stats.retries} retries, {stats.failures} failures, "
+            f"{stats.waited_seconds:.1f}s waiting for budget, "
+            f"final concurrency {stats.concurrency_limit}."
+        )
 
 
 def main():
     """
-    Initializes and runs the ingestion service for the default user.
+    Initializes and runs the ingestion.
+
+    Without arguments only the default user is ingested. With ``--all`` or
+    several ``--user`` flags, the users are ingested concurrently through a
+    shared, fairly scheduled pipeline. With ``--watch`` the process keeps
+    running and ingests documents as they change.
     """
-    # For now, we hardcode the user_id. In a real application,
+    args = parse_args()
+
+    if args.watch:
+        watcher = AppFactory.create_ingestion_watcher(
+            user_ids=None if args.all else (args.users or ["default_user"]),
+            embedding_rpm=args.embedding_rpm,
+        )
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            print("Stopping watcher...")
+        log_provider_stats()
+        return
+
+    if args.all or (args.users and len(args.users) > 1) or args.embedding_rpm is not None:
+        bulk_service = AppFactory.create_bulk_ingestion_service(
+            user_ids=None if args.all else (args.users or ["default_user"]),
+            embedding_rpm=args.embedding_rpm,
+        )
+        bulk_service.run_ingestion()
+        log_provider_stats()
+        return
+
+    # For now, the default user_id is hardcoded. In a real application,
     # this would come from an authentication layer.
-    user_id = "default_user"
-    
+    user_id = args.users[0] if args.users else "default_user"
+
     ingestion_service = AppFactory.create_ingestion_service(user_id=user_id)
     ingestion_service.run_ingestion()
+    log_provider_stats()
 
 
 if __name__ == "__main__":
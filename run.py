@@ -8,10 +8,12 @@ apply_patches()
 # --- CONFIGURATION FOR TESTING ---
 # Set to a specific filename to filter RAG search, or None to search all documents.
 # Example: SOURCE_DOCUMENT = "my_document.pdf"
-SOURCE_DOCUMENT: str | None = "meu_documento.pdf"
+SOURCE_DOCUMENT: str | None = None
 USER_ID = "default_user"
 # ---------------------------------
 
+import time
+
 from app.core.factory import AppFactory
 from app.core.logger import logger
 from langchain_core.messages import HumanMessage, AIMessage
@@ -29,7 +31,7 @@ def main():
         user = user_repo.get_by_id(USER_ID)
 
         # Get the compiled graph from the factory
-        app_runnable = AppFactory.create_conversation_graph()
+        app_runnable = AppFactory.create_conversation_graph(user_id=USER_ID)
         
         logger.info("Initialization complete. Ready for questions.")
         print("\n--- Qualichat Interactive Terminal ---")
@@ -58,17 +60,32 @@ def main():
 
             inputs = {
                 "messages": messages,
+                "source_name": SOURCE_DOCUMENT,
             }
 
             print("Thinking...")
-            result = app_runnable.invoke(inputs)
+            streamed = []
+
+            def print_token(token: str):
+                # Render the answer as it is generated
+                if not streamed:
+                    print("\nAssistant:")
+                streamed.append(token)
+                print(token, end="", flush=True)
+
+            # started_at makes the graph log the time to first token from here
+            config = {"configurable": {"on_token": print_token, "started_at": time.perf_counter()}}
+            result = app_runnable.invoke(inputs, config=config)
             answer = result["messages"][-1].content
 
             # Save the new interaction via the user object
             user.add_interaction(user_message=question, bot_response=answer)
 
-            print("\nAssistant:")
-            print(answer)
+            if streamed:
+                print()
+            else:
+                print("\nAssistant:")
+                print(answer)
 
     except Exception as e:
         logger.error(f"An error occurred during initialization or conversation: {e}", exc_info=True)
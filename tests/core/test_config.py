@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the Settings."""
+import pytest
+from pydantic import ValidationError
+
+from app.core.config import Settings
+
+
+def test_api_key_is_optional_with_local_backends(monkeypatch):
+    """Test that fully local backends need no provider key."""
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+
+    settings = Settings(_env_file=None, LLM_BACKEND="local", EMBEDDING_BACKEND="hashing")
+
+    assert settings.OPENAI_API_KEY is None
+
+
+def test_api_key_is_required_with_a_provider_backend(monkeypatch):
+    """Test that selecting LiteLLM without a key fails at startup."""
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+
+    with pytest.raises(ValidationError, match="OPENAI_API_KEY"):
+        Settings(_env_file=None, LLM_BACKEND="local", EMBEDDING_BACKEND="litellm")
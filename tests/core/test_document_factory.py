@@ -35,3 +35,36 @@ def test_nonexistent_file(tmp_path: Path):
     factory = DocumentFactory(chunk_size=100, chunk_overlap=10)
     documents = factory.create_documents(str(tmp_path / "nonexistent.txt"))
     assert documents == []
+
+
+def test_load_documents_raises_instead_of_returning_nothing(tmp_path: Path):
+    """Test that load errors are raised, so they are not taken for an empty file."""
+    factory = DocumentFactory(chunk_size=100, chunk_overlap=10)
+    with pytest.raises(FileNotFoundError):
+        factory.load_documents(str(tmp_path / "nonexistent.txt"))
+
+
+def test_chunk_ids_are_deterministic(tmp_path: Path):
+    """Test that re-chunking a file yields the same ids, unique per chunk."""
+    file_path = tmp_path / "test.txt"
+    file_path.write_text("Same words.\n\nSame words.\n\nOther words.")
+
+    factory = DocumentFactory(chunk_size=15, chunk_overlap=0)
+    first_run = factory.create_documents(str(file_path))
+    second_run = factory.create_documents(str(file_path))
+
+    assert [doc.id for doc in first_run] == [doc.id for doc in second_run]
+    assert len({doc.id for doc in first_run}) == len(first_run)
+
+
+def test_iter_documents_yields_bounded_windows(tmp_path: Path):
+    """Test that streaming yields the same chunks as create_documents, in windows."""
+    file_path = tmp_path / "test.csv"
+    file_path.write_text("id,text\n" + "".join(f"{i},row number {i}\n" for i in range(7)))
+
+    factory = DocumentFactory(chunk_size=100, chunk_overlap=0)
+    windows = list(factory.iter_documents(str(file_path), window_size=3))
+
+    assert [len(window) for window in windows] == [3, 3, 1]
+    streamed = [doc for window in windows for doc in window]
+    assert streamed == factory.create_documents(str(file_path))
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for maximal marginal relevance."""
+import numpy as np
+
+from app.core.mmr import maximal_marginal_relevance
+
+
+def _reference(query, candidates, k, lambda_mult):
+    """Textbook MMR with Python loops."""
+    def cos(a, b):
+        return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+    picked = []
+    while len(picked) < min(k, len(candidates)):
+        scores = {
+            i: lambda_mult * cos(query, c)
+            - (1 - lambda_mult) * max((cos(c, candidates[j]) for j in picked), default=0.0)
+            for i, c in enumerate(candidates)
+            if i not in picked
+        }
+        picked.append(max(scores, key=scores.get))
+    return picked
+
+
+def test_near_duplicates_are_skipped():
+    """Test that a copy of the best candidate loses to a different one."""
+    query = np.array([1.0, 0.5])
+    candidates = np.array([[1.0, 0.3], [1.0, 0.29], [0.4, 1.0]])
+
+    assert maximal_marginal_relevance(query, candidates, 2, lambda_mult=0.5) == [0, 2]
+    assert maximal_marginal_relevance(query, candidates, 2, lambda_mult=1.0) == [0, 1]
+
+
+def test_matches_the_reference_implementation():
+    """Test the vectorized selection against the loop-based definition."""
+    rng = np.random.default_rng(3)
+    query = rng.normal(size=16)
+    candidates = rng.normal(size=(30, 16))
+
+    for lambda_mult in (0.3, 0.5, 0.8):
+        assert maximal_marginal_relevance(query, candidates, 8, lambda_mult) == _reference(
+            query, candidates, 8, lambda_mult
+        )
+
+
+def test_k_is_capped_by_the_candidates():
+    """Test that asking for more than available returns every candidate once."""
+    candidates = np.eye(3)
+
+    assert sorted(maximal_marginal_relevance(np.ones(3), candidates, 5)) == [0, 1, 2]
+    assert maximal_marginal_relevance(np.ones(3), candidates[:0], 5) == []
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the vector quantization helpers."""
+import numpy as np
+import pytest
+
+from app.core.quantization import dequantize, quantize
+
+
+@pytest.mark.parametrize("dtype, tolerance", [("int8", 1 / 127), ("float16", 1e-3)])
+def test_quantize_round_trip_is_close(dtype: str, tolerance: float):
+    """Test that dequantized vectors stay within the type's precision."""
+    vectors = np.random.default_rng(0).normal(size=(50, 64)).astype(np.float32)
+
+    codes, scales = quantize(vectors, dtype)
+    restored = dequantize(codes, scales)
+
+    assert codes.dtype == np.dtype(dtype)
+    relative_error = np.abs(restored - vectors).max(axis=1) / np.abs(vectors).max(axis=1)
+    assert relative_error.max() <= tolerance
+
+
+def test_int8_uses_a_scale_per_vector():
+    """Test that vectors of very different magnitudes keep their precision."""
+    vectors = np.array([[0.001, -0.002], [100.0, 50.0], [0.0, 0.0]], dtype=np.float32)
+
+    codes, scales = quantize(vectors, "int8")
+
+    assert np.abs(codes[:2]).max(axis=1).tolist() == [127, 127]
+    np.testing.assert_allclose(dequantize(codes, scales), vectors, rtol=1e-2, atol=1e-9)
+
+
+def test_quantize_rejects_unknown_types():
+    with pytest.raises(ValueError):
+        quantize(np.zeros((1, 2)), "int4")
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the RateLimiter and ProviderLimiter."""
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from app.core.rate_limiter import ProviderLimiter, RateLimiter
+
+
+class ProviderError(Exception):
+    """Stand-in for a LiteLLM exception carrying an HTTP status code."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def test_acquire_within_burst_does_not_wait():
+    """Test that acquiring less than the bucket capacity returns immediately."""
+    limiter = RateLimiter(per_minute=60, burst=5)
+
+    waited = [limiter.acquire() for _ in range(5)]
+
+    assert waited == [0.0] * 5
+
+
+def test_acquire_waits_for_refill_once_bucket_is_empty():
+    """Test that an empty bucket blocks until enough units are refilled."""
+    limiter = RateLimiter(per_minute=6000, burst=1)  # 100 units per second
+    limiter.acquire()
+
+    start = time.monotonic()
+    limiter.acquire()
+    elapsed = time.monotonic() - start
+
+    assert 0.005 <= elapsed < 0.5
+
+
+def test_aacquire_waits_without_blocking_the_loop():
+    """Test that the async acquire yields to other tasks while waiting."""
+    limiter = RateLimiter(per_minute=6000, burst=1)  # 100 units per second
+    ticks = []
+
+    async def ticker():
+        for _ in range(3):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0)
+
+    async def acquire():
+        waited = await limiter.aacquire()
+        return waited, time.monotonic()
+
+    async def main():
+        await limiter.aacquire()
+        return await asyncio.gather(acquire(), ticker())
+
+    (waited, acquired_at), _ = asyncio.run(main())
+
+    assert waited > 0
+    assert len(ticks) == 3 and ticks[-1] < acquired_at
+
+
+def test_call_retries_throttled_requests_and_halves_concurrency():
+    """Test that a 429 is retried with backoff and halves the concurrency."""
+    limiter = ProviderLimiter("test", initial_concurrency=8, max_retries=3)
+    responses = [ProviderError(429), ProviderError(429), "ok"]
+
+    def flaky():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    with patch("app.core.rate_limiter.time.sleep") as sleep:
+        assert limiter.call(flaky) == "ok"
+
+    stats = limiter.stats()
+    assert sleep.call_count == 2
+    assert (stats.requests, stats.throttled, stats.retries, stats.failures) == (3, 2, 2, 0)
+    # Both 429s fall within the cooldown, so the limit is halved only once.
+    assert stats.concurrency_limit == 4
+    assert stats.in_flight == 0
+
+
+def test_call_does_not_retry_client_errors():
+    """Test that errors other than throttling, timeouts and 5xx are raised at once."""
+    limiter = ProviderLimiter("test", max_retries=3)
+    calls = []
+
+    def invalid():
+        calls.append(1)
+        raise ProviderError(400)
+
+    with pytest.raises(ProviderError):
+        limiter.call(invalid)
+
+    assert len(calls) == 1
+    assert limiter.stats().failures == 1
+
+
+def test_call_gives_up_after_max_retries():
+    """Test that a persistently failing provider raises after the retries."""
+    limiter = ProviderLimiter("test", max_retries=2, backoff_base_seconds=0)
+
+    def unavailable():
+        raise ProviderError(503)
+
+    with pytest.raises(ProviderError):
+        limiter.call(unavailable)
+
+    stats = limiter.stats()
+    assert (stats.requests, stats.retries, stats.failures) == (3, 2, 1)
+
+
+def test_successes_increase_concurrency_up_to_the_maximum():
+    """Test the additive increase of the concurrency limit."""
+    limiter = ProviderLimiter("test", initial_concurrency=1, max_concurrency=3)
+
+    for _ in range(20):
+        limiter.call(lambda: None)
+
+    assert limiter.stats().concurrency_limit == 3
+
+
+def test_concurrency_limit_bounds_calls_in_flight():
+    """Test that callers beyond the concurrency limit are queued."""
+    limiter = ProviderLimiter("test", initial_concurrency=2, max_concurrency=2)
+    release = threading.Event()
+    peak = []
+
+    def slow():
+        peak.append(limiter.stats().in_flight)
+        release.wait(1)
+
+    threads = [threading.Thread(target=limiter.call, args=(slow,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    queued = limiter.stats().queued
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert queued == 2
+    assert max(peak) == 2
+
+
+def test_acall_retries_throttled_requests():
+    """Test the async call path with a throttled first attempt."""
+    limiter = ProviderLimiter("test", backoff_base_seconds=0.001)
+    attempts = []
+
+    async def request():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ProviderError(429)
+        return "ok"
+
+    assert asyncio.run(limiter.acall(request)) == "ok"
+    assert limiter.stats().throttled == 1
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the RecursiveTextSplitter."""
+import random
+
+import pytest
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document as LangchainDocument
+
+from app.core.text_splitter import RecursiveTextSplitter
+
+_FRAGMENTS = ["palavra", "dado", "x" * 40, " ", "  ", "\t", "\n", "\n\n", "\n\n\n"]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_langchain_splitter(seed: int):
+    """Test that chunks are identical to LangChain's for random texts and sizes."""
+    rng = random.Random(seed)
+    for _ in range(200):
+        text = "".join(rng.choice(_FRAGMENTS) for _ in range(rng.randint(0, 300)))
+        chunk_size = rng.randint(1, 120)
+        chunk_overlap = rng.randint(0, chunk_size)
+
+        expected = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len
+        ).split_text(text)
+        assert RecursiveTextSplitter(chunk_size, chunk_overlap).split_text(text) == expected
+
+
+def test_split_documents_records_offsets():
+    """Test that each chunk's offsets point at its text in the original document."""
+    text = "First paragraph here.\n\nSecond one, a bit longer.\n\n  Third.  "
+    splitter = RecursiveTextSplitter(chunk_size=30, chunk_overlap=0)
+
+    chunks = splitter.split_documents([LangchainDocument(page_content=text, metadata={"page": 2})])
+
+    assert [chunk.page_content for chunk in chunks] == [
+        "First paragraph here.",
+        "Second one, a bit longer.",
+        "Third.",
+    ]
+    for chunk in chunks:
+        start, end = chunk.metadata["start_index"], chunk.metadata["end_index"]
+        assert text[start:end] == chunk.page_content
+        assert chunk.metadata["page"] == 2
+
+
+def test_overlap_larger_than_chunk_size_is_rejected():
+    """Test that an invalid configuration fails early."""
+    with pytest.raises(ValueError):
+        RecursiveTextSplitter(chunk_size=10, chunk_overlap=11)
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the Portuguese tokenizer."""
+from app.core.tokenizer import tokenize
+
+
+def test_tokenize_folds_accents_and_case_and_drops_stopwords():
+    """Test that accented and unaccented spellings produce the same terms."""
+    assert tokenize("A Liberação do Crédito é rápida?") == ["liberacao", "credito", "rapida"]
+    assert tokenize("liberacao do credito") == ["liberacao", "credito"]
+
+
+def test_tokenize_keeps_numbers_and_codes():
+    """Test that contract numbers and form codes become searchable terms."""
+    assert tokenize("Contrato nº 2024/015, formulário F-12") == [
+        "contrato", "2024", "015", "formulario", "f", "12"
+    ]
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the ConversationGraph."""
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.graphs import conversation_graph
+from app.graphs.conversation_graph import ConversationGraph
+from app.models.document import Document
+from app.models.search_result import SearchResult
+from app.services.answer_cache import SemanticAnswerCache
+
+RETRIEVED = Document(id="d1", content="retrieved", source_name="a.pdf")
+
+
+def _build_graph():
+    llm_service = MagicMock()
+    llm_service.get_completion.return_value = "reformulated (sync)"
+    llm_service.aget_completion = AsyncMock(return_value="reformulated (async)")
+
+    retrieval_service = MagicMock()
+    results = [SearchResult(id="d1", distance=0.1, document=RETRIEVED)]
+    retrieval_service.retrieve_results.return_value = results
+    retrieval_service.aretrieve_results = AsyncMock(return_value=results)
+
+    rag_pipeline = MagicMock()
+    rag_pipeline.execute.return_value = "sync answer"
+    rag_pipeline.aexecute = AsyncMock(return_value="async answer")
+
+    graph = ConversationGraph(llm_service, retrieval_service, rag_pipeline)
+    graph.build()
+    return graph.compile(), llm_service, retrieval_service, rag_pipeline
+
+
+def test_ainvoke_uses_only_async_services():
+    """Test that the compiled graph can be awaited end to end."""
+    app, llm_service, retrieval_service, rag_pipeline = _build_graph()
+
+    result = asyncio.run(app.ainvoke({"messages": [HumanMessage(content="oi")]}))
+
+    assert result["messages"][-1].content == "async answer"
+    assert result["reformulated_query"] == "reformulated (async)"
+    retrieval_service.aretrieve_results.assert_awaited_once()
+    rag_pipeline.aexecute.assert_awaited_once()
+    assert rag_pipeline.aexecute.await_args.kwargs["context_documents"] == [RETRIEVED]
+    llm_service.get_completion.assert_not_called()
+    rag_pipeline.execute.assert_not_called()
+
+
+def test_invoke_still_uses_sync_services():
+    """Test that the sync entry point is unchanged."""
+    app, llm_service, _, rag_pipeline = _build_graph()
+
+    result = app.invoke({"messages": [HumanMessage(content="oi")]})
+
+    assert result["messages"][-1].content == "sync answer"
+    llm_service.aget_completion.assert_not_called()
+    rag_pipeline.aexecute.assert_not_called()
+
+
+def test_answer_reuses_the_documents_of_the_single_search():
+    """Test that a turn searches once and answers from the retrieved documents."""
+    app, _, retrieval_service, rag_pipeline = _build_graph()
+
+    result = app.invoke({"messages": [HumanMessage(content="oi")], "source_name": "a.pdf"})
+
+    assert result["search_results"][0].document == RETRIEVED
+    retrieval_service.retrieve_results.assert_called_once_with(
+        "reformulated (sync)", top_k=5, source_name="a.pdf"
+    )
+    assert rag_pipeline.execute.call_args.kwargs["context_documents"] == [RETRIEVED]
+
+
+def test_cache_hit_skips_reformulation_and_retrieval():
+    """Test that a cached first question ends the graph before any LLM call."""
+    llm_service, retrieval_service, rag_pipeline = MagicMock(), MagicMock(), MagicMock()
+    answer_cache = MagicMock()
+    answer_cache.lookup.return_value = "cached answer"
+
+    graph = ConversationGraph(llm_service, retrieval_service, rag_pipeline, answer_cache)
+    graph.build()
+    result = graph.compile().invoke(
+        {"messages": [HumanMessage(content="oi")], "source_name": "a.pdf"}
+    )
+
+    assert result["messages"][-1].content == "cached answer"
+    answer_cache.lookup.assert_called_once_with("oi", source_name="a.pdf", conversation="")
+    llm_service.get_completion.assert_not_called()
+    rag_pipeline.execute.assert_not_called()
+
+
+def test_follow_up_is_not_answered_from_another_conversation():
+    """Test that the same follow-up after different turns is cached separately."""
+    app_parts = _build_graph()
+    llm_service, retrieval_service, rag_pipeline = app_parts[1:]
+    embeddings_service = MagicMock()
+    embeddings_service.create_embeddings.side_effect = lambda texts: [[1.0, 0.0] for _ in texts]
+    answer_cache = SemanticAnswerCache(embeddings_service)
+    graph = ConversationGraph(llm_service, retrieval_service, rag_pipeline, answer_cache)
+    graph.build()
+    app = graph.compile()
+
+    def ask_after(previous_question: str) -> str:
+        messages = [
+            HumanMessage(content=previous_question),
+            AIMessage(content=f"answer to {previous_question}"),
+            HumanMessage(content="and the second one?"),
+        ]
+        return app.invoke({"messages": messages})["messages"][-1].content
+
+    rag_pipeline.execute.return_value = "the second plan"
+    assert ask_after("which plans are there?") == "the second plan"
+    rag_pipeline.execute.return_value = "the second document"
+    assert ask_after("which documents are needed?") == "the second document"
+
+    # The same turns again hit the cache.
+    rag_pipeline.execute.return_value = "not generated"
+    assert ask_after("which plans are there?") == "the second plan"
+    assert rag_pipeline.execute.call_count == 2
+
+
+def test_cache_miss_answers_and_stores():
+    """Test that a miss runs the full graph and caches the new answer."""
+    app_parts = _build_graph()
+    llm_service, retrieval_service, rag_pipeline = app_parts[1:]
+    answer_cache = MagicMock()
+    answer_cache.lookup.return_value = None
+
+    graph = ConversationGraph(llm_service, retrieval_service, rag_pipeline, answer_cache)
+    graph.build()
+    result = graph.compile().invoke({"messages": [HumanMessage(content="oi")]})
+
+    assert result["messages"][-1].content == "sync answer"
+    answer_cache.store.assert_called_once_with(
+        "oi", "sync answer", source_name=None, conversation=""
+    )
+
+
+def test_on_token_receives_the_streamed_answer():
+    """Test that a run with an on_token callback streams the answer through it."""
+    app, _, _, rag_pipeline = _build_graph()
+    rag_pipeline.stream_execute.return_value = iter(["stream", "ed ", "answer"])
+    tokens = []
+
+    result = app.invoke(
+        {"messages": [HumanMessage(content="oi")]},
+        config={"configurable": {"on_token": tokens.append}},
+    )
+
+    assert tokens == ["stream", "ed ", "answer"]
+    assert result["messages"][-1].content == "streamed answer"
+    rag_pipeline.execute.assert_not_called()
+
+
+def test_time_to_first_token_is_logged_from_the_invocation(monkeypatch):
+    """Test that a run given started_at logs the time to first token once."""
+    app, _, _, rag_pipeline = _build_graph()
+    rag_pipeline.stream_execute.return_value = iter(["stream", "ed"])
+    logger = MagicMock()
+    monkeypatch.setattr(conversation_graph, "logger", logger)
+    tokens = []
+
+    app.invoke(
+        {"messages": [HumanMessage(content="oi")]},
+        config={"configurable": {"on_token": tokens.append, "started_at": time.perf_counter()}},
+    )
+
+    assert tokens == ["stream", "ed"]
+    ttft_logs = [
+        call.args[0] for call in logger.info.call_args_list
+        if call.args[0].startswith("Time to first token")
+    ]
+    assert len(ttft_logs) == 1
+    assert ttft_logs[0].endswith("since the graph was invoked.")
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the helpers of the base repository module."""
+import re
+
+from app.repositories.base_repository import tenant_collection_name
+
+_VALID_NAME = re.compile(r"^[a-zA-Z0-9][a-zA-Z0-9_-]{1,61}[a-zA-Z0-9]$")
+
+
+def test_tenant_collection_name_keeps_safe_ids():
+    """Test that plain user ids are appended as they are."""
+    assert tenant_collection_name("qualichat", "default_user") == "qualichat_default_user"
+    assert tenant_collection_name("qualichat", None) == "qualichat"
+
+
+def test_tenant_collection_name_sanitizes_and_disambiguates():
+    """Test that altered names stay valid and distinct."""
+    names = [
+        tenant_collection_name("qualichat", user_id)
+        for user_id in ["ana.silva@example.com", "ana-silva@example.com", "joão", "x" * 100, "_"]
+    ]
+
+    assert all(_VALID_NAME.match(name) for name in names), names
+    assert len(set(names)) == len(names)
+    assert names[0].startswith("qualichat_ana-silva-example-com_")
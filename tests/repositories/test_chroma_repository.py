@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the ChromaRepository."""
+from pathlib import Path
+
+import numpy as np
+import pytest
+from app.core.config import settings
+from app.models.document import Document
+from app.repositories.chroma_repository import ChromaRepository, exact_distances
+
+
+@pytest.fixture
+def repo(tmp_path: Path, monkeypatch) -> ChromaRepository:
+    """Fixture creating a repository backed by a temporary ChromaDB."""
+    monkeypatch.setattr(settings, "VECTOR_DB_PATH", str(tmp_path / "db"))
+    return ChromaRepository(collection_name="test_collection")
+
+
+def _doc(doc_id: str, source_name: str) -> Document:
+    return Document(id=doc_id, content=f"content {doc_id}", source_name=source_name)
+
+
+def test_add_and_query(repo: ChromaRepository):
+    """Test that added documents are returned with their source_name."""
+    repo.add([_doc("a", "one.txt"), _doc("b", "two.txt")], [[1.0, 0.0], [0.0, 1.0]])
+
+    results = repo.query([1.0, 0.0], top_k=1)
+
+    assert [doc.id for doc in results] == ["a"]
+    assert results[0].source_name == "one.txt"
+
+
+def test_get_ids_and_delete(repo: ChromaRepository):
+    """Test listing a source's ids and deleting part of them."""
+    repo.add(
+        [_doc("a", "one.txt"), _doc("b", "one.txt"), _doc("c", "two.txt")],
+        [[1.0, 0.0], [0.5, 0.5], [0.0, 1.0]],
+    )
+
+    assert sorted(repo.get_ids(source_name="one.txt")) == ["a", "b"]
+
+    repo.delete(["a"])
+    assert repo.get_ids(source_name="one.txt") == ["b"]
+    assert repo.get_ids(source_name="two.txt") == ["c"]
+
+
+def test_query_many_groups_filters_and_honours_per_query_options(repo: ChromaRepository):
+    """Test that batched queries keep their own filter, top_k and order."""
+    repo.add(
+        [_doc("a", "one.txt"), _doc("b", "one.txt"), _doc("c", "two.txt")],
+        [[1.0, 0.0], [0.8, 0.2], [0.0, 1.0]],
+    )
+
+    results = repo.query_many(
+        [[1.0, 0.0], [1.0, 0.0], [0.0, 1.0]],
+        top_k=[2, 1, 1],
+        source_names=[None, "two.txt", "one.txt"],
+        include=["distances"],
+    )
+
+    assert [[r.id for r in hits] for hits in results] == [["a", "b"], ["c"], ["b"]]
+    assert results[0][0].distance == pytest.approx(0.0)
+    assert all(r.document is None for hits in results for r in hits)
+
+
+def test_query_many_ids_only(repo: ChromaRepository):
+    """Test that no distances or documents are fetched unless requested."""
+    repo.add([_doc("a", "one.txt"), _doc("b", "two.txt")], [[1.0, 0.0], [0.0, 1.0]])
+
+    results = repo.query_many([[0.0, 1.0]], top_k=1, include=[])
+
+    assert results[0][0].id == "b"
+    assert results[0][0].distance is None and results[0][0].document is None
+
+
+def test_hnsw_parameters_apply_to_new_collections_only(tmp_path: Path, monkeypatch):
+    """Test that a collection keeps the HNSW parameters it was created with."""
+    monkeypatch.setattr(settings, "VECTOR_DB_PATH", str(tmp_path / "db"))
+    created = ChromaRepository("tuned", space="cosine", hnsw_m=8, search_ef=50)
+
+    reopened = ChromaRepository("tuned", space="l2", hnsw_m=32)
+
+    assert created.collection.metadata["hnsw:M"] == 8
+    assert reopened.space == "cosine"
+    assert reopened.collection.metadata["hnsw:search_ef"] == 50
+
+
+def test_cosine_distances_match_exact_distances(tmp_path: Path, monkeypatch):
+    """Test that exact_distances reproduces the distances ChromaDB reports."""
+    monkeypatch.setattr(settings, "VECTOR_DB_PATH", str(tmp_path / "db"))
+    repo = ChromaRepository("cosine", space="cosine")
+    vectors = np.array([[3.0, 0.0], [1.0, 1.0], [0.0, 2.0]], dtype=np.float32)
+    repo.add([_doc(doc_id, "one.txt") for doc_id in "abc"], vectors.tolist())
+    query = np.array([[2.0, 1.0]], dtype=np.float32)
+
+    results = repo.query_many(query.tolist(), top_k=3, include=["distances"])[0]
+
+    expected = exact_distances(vectors, query, "cosine")[0]
+    assert [r.id for r in results] == ["b", "a", "c"]
+    assert [r.distance for r in results] == pytest.approx(sorted(expected), abs=1e-5)
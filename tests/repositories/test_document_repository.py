@@ -34,3 +34,14 @@ def test_get_documents_for_nonexistent_user(tmp_path: Path):
     repo = DocumentRepository(base_path=str(base_path))
     documents = repo.get_user_documents(user_id="nonexistent_user")
     assert documents == []
+
+
+def test_list_users(tmp_path: Path):
+    """Test that every non-hidden user directory is listed."""
+    base_path = tmp_path / "documents"
+    for name in ["bob", "alice", ".cache"]:
+        (base_path / name).mkdir(parents=True)
+    (base_path / "stray_file.txt").touch()
+
+    repo = DocumentRepository(base_path=str(base_path))
+    assert repo.list_users() == ["alice", "bob"]
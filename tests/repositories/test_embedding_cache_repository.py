@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the EmbeddingCacheRepository."""
+import time
+from pathlib import Path
+
+import pytest
+from app.repositories.embedding_cache_repository import EmbeddingCacheRepository
+
+
+def test_put_and_get_many(tmp_path: Path):
+    """Test that vectors round-trip as float32, scoped by model."""
+    cache = EmbeddingCacheRepository(db_path=str(tmp_path / "cache.db"))
+    cache.put_many("model-a", {"h1": [0.5, 0.25], "h2": [1.0, 2.0]})
+
+    assert cache.get_many("model-a", ["h1", "h2", "h3"]) == {
+        "h1": [0.5, 0.25],
+        "h2": [1.0, 2.0],
+    }
+    assert cache.get_many("model-b", ["h1"]) == {}
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path: Path):
+    """Test that exceeding max_bytes evicts the least recently used vectors."""
+    # Each 4-float vector takes 16 bytes; room for 3 of them.
+    cache = EmbeddingCacheRepository(db_path=str(tmp_path / "cache.db"), max_bytes=48)
+    for name in ["a", "b", "c"]:
+        cache.put_many("model", {name: [1.0, 2.0, 3.0, 4.0]})
+        time.sleep(0.01)
+
+    cache.get_many("model", ["a"])  # "a" becomes the most recently used
+    cache.put_many("model", {"d": [1.0, 2.0, 3.0, 4.0]})
+
+    remaining = cache.get_many("model", ["a", "b", "c", "d"])
+    assert "b" not in remaining
+    assert "a" in remaining and "d" in remaining
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the LexicalIndexRepository."""
+from pathlib import Path
+
+import pytest
+from app.models.document import Document
+from app.repositories.lexical_index_repository import LexicalIndexRepository
+
+
+@pytest.fixture
+def index(tmp_path: Path) -> LexicalIndexRepository:
+    index = LexicalIndexRepository(db_path=str(tmp_path / "lexical.db"))
+    index.add(
+        [
+            Document(id="a", content="Contrato 2024/015 de prestação de serviços.", source_name="a.pdf"),
+            Document(id="b", content="Prazo de entrega do contrato: 30 dias.", source_name="a.pdf"),
+            Document(id="c", content="Formulário de liberação de crédito.", source_name="b.pdf"),
+        ]
+    )
+    return index
+
+
+def test_search_ranks_rare_exact_terms_first(index: LexicalIndexRepository):
+    """Test that a contract number outranks chunks sharing only common terms."""
+    results = index.search("contrato 2024/015")
+
+    assert [chunk_id for chunk_id, _ in results] == ["a", "b"]
+    assert results[0][1] > results[1][1]
+
+
+def test_search_filters_by_source_and_folds_accents(index: LexicalIndexRepository):
+    assert [chunk_id for chunk_id, _ in index.search("credito", source_name="b.pdf")] == ["c"]
+    assert index.search("credito", source_name="a.pdf") == []
+
+
+def test_add_skips_indexed_chunks_and_delete_removes_them(index: LexicalIndexRepository):
+    """Test incremental maintenance of the index."""
+    index.add([Document(id="a", content="Contrato 2024/015.", source_name="a.pdf")])
+    assert len(index) == 3
+
+    index.delete(["a"])
+
+    assert len(index) == 2
+    assert [chunk_id for chunk_id, _ in index.search("2024")] == []
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the ManifestRepository."""
+from pathlib import Path
+
+import pytest
+from app.models.manifest import ManifestEntry
+from app.repositories.manifest_repository import ManifestRepository
+
+
+def _entry(source_name: str, sha256: str = "abc") -> ManifestEntry:
+    return ManifestEntry(
+        source_name=source_name, size=10, mtime_ns=20, inode=30, sha256=sha256, chunk_count=3
+    )
+
+
+def test_upsert_is_visible_to_a_new_connection(tmp_path: Path):
+    """Test that every upsert is committed immediately."""
+    db_path = str(tmp_path / "manifest.db")
+    ManifestRepository(db_path).upsert(_entry("a.txt"))
+
+    entry = ManifestRepository(db_path).get("a.txt")
+    assert entry.sha256 == "abc"
+    assert entry.chunk_count == 3
+
+
+def test_update_stat_and_delete(tmp_path: Path):
+    """Test refreshing the stat of an entry and removing it."""
+    repo = ManifestRepository(str(tmp_path / "manifest.db"))
+    repo.upsert(_entry("a.txt"))
+    file_path = tmp_path / "a.txt"
+    file_path.write_text("content")
+
+    repo.update_stat("a.txt", file_path.stat())
+    assert repo.get("a.txt").matches_stat(file_path.stat())
+
+    repo.delete("a.txt")
+    assert repo.get_all() == {}
+
+
+def test_import_hashes_does_not_overwrite_entries(tmp_path: Path):
+    """Test seeding the manifest from legacy hashes."""
+    repo = ManifestRepository(str(tmp_path / "manifest.db"))
+    repo.upsert(_entry("a.txt", sha256="current"))
+
+    repo.import_hashes({"a.txt": "legacy", "b.txt": "legacy"})
+
+    entries = repo.get_all()
+    assert entries["a.txt"].sha256 == "current"
+    assert entries["b.txt"].sha256 == "legacy"
+    assert entries["b.txt"].size == -1
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the NumpyRepository."""
+from pathlib import Path
+
+import numpy as np
+import pytest
+from app.core.config import settings
+from app.models.document import Document
+from app.repositories.chroma_repository import exact_distances
+from app.repositories.numpy_repository import NumpyRepository
+
+
+@pytest.fixture(autouse=True)
+def db_path(tmp_path: Path, monkeypatch) -> Path:
+    """Points the vector store to a temporary directory."""
+    monkeypatch.setattr(settings, "VECTOR_DB_PATH", str(tmp_path / "db"))
+    return tmp_path / "db"
+
+
+def _corpus(count: int = 100, dimensions: int = 16):
+    rng = np.random.default_rng(2)
+    vectors = rng.normal(size=(count, dimensions)).astype(np.float32)
+    documents = [
+        Document(
+            id=f"d{i}",
+            content=f"content {i}",
+            source_name=f"s{i % 2}.txt",
+            metadata={"page": i},
+        )
+        for i in range(count)
+    ]
+    return documents, vectors
+
+
+def _exact(vectors, ids, query, k):
+    distances = ((vectors - query) ** 2).sum(axis=1)
+    return [ids[i] for i in np.argsort(distances)[:k]]
+
+
+def test_query_many_matches_brute_force_across_segments():
+    """Test that results span segments and respect source filters."""
+    documents, vectors = _corpus()
+    repo = NumpyRepository("test_collection", segment_rows=30)
+    repo.add(documents, vectors.tolist())
+    ids = np.array([doc.id for doc in documents])
+    odd = np.array([doc.source_name == "s1.txt" for doc in documents])
+    queries = vectors[:4] + 0.05
+
+    results = repo.query_many(
+        queries.tolist(), top_k=[3, 5, 3, 5], source_names=[None, "s1.txt", None, "s1.txt"]
+    )
+
+    assert [[r.id for r in hits] for hits in results] == [
+        _exact(vectors, ids, queries[0], 3),
+        _exact(vectors[odd], ids[odd], queries[1], 5),
+        _exact(vectors, ids, queries[2], 3),
+        _exact(vectors[odd], ids[odd], queries[3], 5),
+    ]
+    top = results[0][0]
+    assert top.distance == pytest.approx(float(((vectors[0] - queries[0]) ** 2).sum()), rel=1e-4)
+    assert top.document.content == "content 0"
+    assert top.document.metadata == {"page": 0}
+
+
+def test_delete_and_compaction_keep_results(db_path: Path):
+    """Test that tombstoned rows are skipped and compaction drops them."""
+    documents, vectors = _corpus()
+    repo = NumpyRepository("test_collection", segment_rows=30, compaction_threshold=0.9)
+    repo.add(documents, vectors.tolist())
+    removed = [f"d{i}" for i in range(0, 100, 3)]
+
+    repo.delete(removed)
+    before = repo.query_many(vectors[:3].tolist(), top_k=5)
+    assert repo.dead_rows == len(removed)
+    assert not {r.id for hits in before for r in hits} & set(removed)
+
+    repo.compact()
+    after = repo.query_many(vectors[:3].tolist(), top_k=5)
+
+    assert repo.dead_rows == 0
+    assert [[r.id for r in hits] for hits in after] == [[r.id for r in hits] for hits in before]
+    assert len(list((db_path / "numpy" / "test_collection").glob("*.f32"))) == 3
+
+
+def test_add_replaces_documents_with_the_same_id():
+    """Test that re-adding an id leaves a single live row."""
+    documents, vectors = _corpus(count=10)
+    repo = NumpyRepository("test_collection")
+    repo.add(documents, vectors.tolist())
+
+    repo.add([Document(id="d0", content="new", source_name="s0.txt")], [vectors[5].tolist()])
+
+    assert repo.get_ids("s0.txt").count("d0") == 1
+    assert repo.get_documents(["d0"])[0].content == "new"
+    assert repo.dead_rows == 1
+
+
+def test_state_persists_across_instances():
+    """Test that a new instance, or one that saw other writes, reloads the store."""
+    documents, vectors = _corpus(count=20)
+    writer = NumpyRepository("test_collection")
+    reader = NumpyRepository("test_collection")
+    writer.add(documents, vectors.tolist())
+
+    assert reader.query_many([vectors[7].tolist()], top_k=1)[0][0].id == "d7"
+    writer.delete(["d7"])
+    assert reader.query_many([vectors[7].tolist()], top_k=1)[0][0].id != "d7"
+    assert sorted(NumpyRepository("test_collection").get_ids("s1.txt")) == sorted(
+        doc.id for doc in documents if doc.source_name == "s1.txt" and doc.id != "d7"
+    )
+
+
+def test_update_metadata_moves_documents_between_sources():
+    """Test that updating a document's source changes the filters."""
+    documents, vectors = _corpus(count=10)
+    repo = NumpyRepository("test_collection")
+    repo.add(documents, vectors.tolist())
+
+    repo.update_metadata([Document(id="d0", content="", source_name="other.txt", metadata={})])
+
+    assert repo.get_ids("other.txt") == ["d0"]
+    assert "d0" not in repo.get_ids("s0.txt")
+    hits = repo.query_many([vectors[0].tolist()], top_k=1, source_names=["other.txt"])
+    assert hits[0][0].id == "d0"
+
+
+def test_clear_and_iter_documents():
+    """Test that documents are iterated in batches and removed by clear."""
+    documents, vectors = _corpus(count=25)
+    repo = NumpyRepository("test_collection")
+    repo.add(documents, vectors.tolist())
+
+    batches = list(repo.iter_documents(batch_size=10))
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+
+    repo.clear()
+    assert repo.query_many([vectors[0].tolist()], top_k=3) == [[]]
+    assert list(repo.iter_documents()) == []
+
+
+def test_get_embeddings_reads_across_segments():
+    """Test that stored vectors are returned by id, skipping unknown ids."""
+    documents, vectors = _corpus(count=50)
+    repo = NumpyRepository("test_collection", segment_rows=20)
+    repo.add(documents, vectors.tolist())
+
+    found = repo.get_embeddings(["d45", "missing", "d3"])
+
+    assert list(found) == ["d45", "d3"]
+    np.testing.assert_array_equal(found["d45"], vectors[45])
+    np.testing.assert_array_equal(found["d3"], vectors[3])
+
+
+@pytest.mark.parametrize("space", ["ip", "cosine"])
+def test_distances_follow_the_configured_space(space: str):
+    """Test that rankings and distances match ChromaDB's for the space."""
+    documents, vectors = _corpus()
+    repo = NumpyRepository("test_collection", segment_rows=30, space=space)
+    repo.add(documents, vectors.tolist())
+    queries = vectors[:3] + 0.05
+
+    results = repo.query_many(queries.tolist(), top_k=4)
+
+    expected = exact_distances(vectors, queries, space)
+    for hits, row in zip(results, expected):
+        assert [hit.id for hit in hits] == [f"d{i}" for i in np.argsort(row)[:4]]
+        assert [hit.distance for hit in hits] == pytest.approx(np.sort(row)[:4], abs=1e-4)
+
+
+def test_unknown_space_is_rejected():
+    """Test that an unsupported space fails at construction."""
+    with pytest.raises(ValueError):
+        NumpyRepository("test_collection", space="manhattan")
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the QuantizedChromaRepository."""
+from pathlib import Path
+
+import numpy as np
+import pytest
+from app.core.config import settings
+from app.models.document import Document
+from app.repositories.chroma_repository import ChromaRepository
+from app.repositories.quantized_chroma_repository import QuantizedChromaRepository
+from app.repositories.quantized_vector_store import QuantizedVectorStore
+
+
+@pytest.fixture(autouse=True)
+def db_path(tmp_path: Path, monkeypatch) -> Path:
+    """Points the vector store to a temporary directory."""
+    monkeypatch.setattr(settings, "VECTOR_DB_PATH", str(tmp_path / "db"))
+    return tmp_path / "db"
+
+
+def _corpus(count: int = 200, dimensions: int = 32):
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(count, dimensions)).astype(np.float32)
+    documents = [
+        Document(id=f"d{i}", content=f"content {i}", source_name=f"s{i % 2}.txt")
+        for i in range(count)
+    ]
+    return documents, vectors
+
+
+def test_query_many_matches_exact_search():
+    """Test that re-ranked results and distances equal the exact ones."""
+    documents, vectors = _corpus()
+    repo = QuantizedChromaRepository("test_collection", dtype="int8")
+    repo.add(documents, vectors.tolist())
+    queries = vectors[:5] + 0.1
+    sources = [None, "s1.txt", None, "s1.txt", None]
+
+    results = repo.query_many(queries.tolist(), top_k=3, source_names=sources)
+
+    for query, hits, source in zip(queries, results, sources):
+        rows = [i for i in range(len(vectors)) if source is None or i % 2 == 1]
+        exact = sorted(rows, key=lambda i: float(((vectors[i] - query) ** 2).sum()))[:3]
+        assert [hit.id for hit in hits] == [f"d{i}" for i in exact]
+        exact_distance = float(((vectors[exact[0]] - query) ** 2).sum())
+        assert hits[0].distance == pytest.approx(exact_distance, rel=1e-4)
+        assert hits[0].document.source_name == f"s{exact[0] % 2}.txt"
+
+
+def test_delete_and_update_metadata_are_mirrored():
+    """Test that deleted vectors disappear and moved ones follow their source."""
+    documents, vectors = _corpus(count=4)
+    repo = QuantizedChromaRepository("test_collection", dtype="float16")
+    repo.add(documents, vectors.tolist())
+
+    repo.delete(["d0"])
+    repo.update_metadata([Document(id="d1", content="content 1", source_name="s0.txt")])
+
+    hits = repo.query(vectors[0].tolist(), top_k=4, source_name="s0.txt")
+    assert sorted(doc.id for doc in hits) == ["d1", "d2"]
+
+
+def test_existing_collection_is_quantized_on_startup():
+    """Test that vectors stored without quantization are picked up."""
+    documents, vectors = _corpus(count=10)
+    ChromaRepository("test_collection").add(documents, vectors.tolist())
+
+    repo = QuantizedChromaRepository("test_collection", dtype="int8")
+
+    assert len(repo.store) == 10
+    assert repo.query(vectors[3].tolist(), top_k=1)[0].id == "d3"
+
+
+def test_writes_of_another_instance_are_picked_up():
+    """Test that a re-ingest keeping the count reaches an open instance."""
+    documents, vectors = _corpus(count=10)
+    reader = QuantizedChromaRepository("test_collection", dtype="int8")
+    writer = QuantizedChromaRepository("test_collection", dtype="int8")
+    writer.add(documents, vectors.tolist())
+    assert reader.query(vectors[3].tolist(), top_k=1)[0].id == "d3"
+
+    # Same ids and count, new vectors: d3 now holds d7's old vector.
+    moved = vectors.copy()
+    moved[3], moved[7] = vectors[7], vectors[3]
+    writer.delete([doc.id for doc in documents])
+    writer.add(documents, moved.tolist())
+
+    assert len(reader.store) == 10
+    assert reader.query(vectors[3].tolist(), top_k=1)[0].id == "d7"
+
+
+def test_store_replaces_ids_added_since_the_last_read(db_path: Path):
+    """Test that re-adding a pending id keeps a single row for it."""
+    store = QuantizedVectorStore(str(db_path / "quantized.db"), dtype="float16")
+    len(store)  # Loads the (empty) store, so later adds stay pending
+    store.add(["a", "b"], ["s.txt", "s.txt"], np.eye(2, dtype=np.float32))
+    store.add(["a", "a"], ["s.txt", "s.txt"], np.asarray([[5.0, 5.0], [0.0, 2.0]]))
+
+    ids, distances = store.search(np.asarray([0.0, 2.0]), k=3)
+
+    assert len(store) == 2
+    assert sorted(ids) == ["a", "b"]
+    assert ids[0] == "a" and distances[0] == pytest.approx(0.0, abs=1e-2)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the SemanticAnswerCache."""
+import asyncio
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+from app.models.manifest import ManifestEntry
+from app.repositories.manifest_repository import ManifestRepository
+from app.services.answer_cache import SemanticAnswerCache
+
+# Questions embedded as 2-d vectors; "prazo?" and "qual o prazo?" are close.
+_VECTORS = {
+    "qual o prazo?": [1.0, 0.0],
+    "prazo?": [0.99, 0.14],
+    "qual o valor?": [0.0, 1.0],
+}
+
+
+@pytest.fixture
+def embeddings_service() -> MagicMock:
+    async def acreate_embeddings(texts):
+        return [_VECTORS[text] for text in texts]
+
+    service = MagicMock()
+    service.create_embeddings.side_effect = lambda texts: [_VECTORS[text] for text in texts]
+    service.acreate_embeddings.side_effect = acreate_embeddings
+    return service
+
+
+def _entry(source_name: str, sha256: str) -> ManifestEntry:
+    return ManifestEntry(
+        source_name=source_name, size=1, mtime_ns=1, inode=1, sha256=sha256, chunk_count=1
+    )
+
+
+def test_similar_question_in_same_scope_hits(embeddings_service: MagicMock):
+    """Test that a close question reuses the answer, only within its scope."""
+    cache = SemanticAnswerCache(embeddings_service, similarity_threshold=0.95)
+    cache.store("qual o prazo?", "30 dias", source_name="contrato.pdf")
+
+    assert cache.lookup("prazo?", source_name="contrato.pdf") == "30 dias"
+    assert cache.lookup("qual o valor?", source_name="contrato.pdf") is None
+    assert cache.lookup("prazo?", source_name="outro.pdf") is None
+    assert asyncio.run(cache.alookup("prazo?", source_name="contrato.pdf")) == "30 dias"
+
+
+def test_entries_expire_and_are_evicted_lru(embeddings_service: MagicMock):
+    """Test TTL expiry and least-recently-used eviction."""
+    now = [0.0]
+    cache = SemanticAnswerCache(
+        embeddings_service, ttl_seconds=10, max_entries=2, clock=lambda: now[0]
+    )
+    cache.store("qual o prazo?", "30 dias", source_name="a.pdf")
+    cache.store("qual o valor?", "R$ 10", source_name="a.pdf")
+    assert cache.lookup("qual o prazo?", source_name="a.pdf") == "30 dias"  # Now most recent
+
+    cache.store("qual o valor?", "R$ 20", source_name="b.pdf")  # Evicts a.pdf's "valor"
+    assert len(cache) == 2
+    assert cache.lookup("qual o valor?", source_name="a.pdf") is None
+
+    now[0] = 11.0
+    assert cache.lookup("qual o prazo?", source_name="a.pdf") is None
+    assert len(cache) == 1
+
+
+def test_reingested_document_invalidates_its_answers(embeddings_service: MagicMock, tmp_path: Path):
+    """Test that a changed content hash in the manifest drops the scope's answers."""
+    manifest = ManifestRepository(str(tmp_path / "manifest.db"))
+    manifest.upsert(_entry("a.pdf", "v1"))
+    manifest.upsert(_entry("b.pdf", "v1"))
+    cache = SemanticAnswerCache(embeddings_service, manifest_repo=manifest)
+    cache.store("qual o prazo?", "30 dias", source_name="a.pdf")
+    cache.store("qual o prazo?", "60 dias", source_name="b.pdf")
+    cache.store("qual o prazo?", "depende", source_name=None)
+
+    manifest.upsert(_entry("a.pdf", "v2"))
+
+    assert cache.lookup("qual o prazo?", source_name="a.pdf") is None
+    assert cache.lookup("qual o prazo?", source_name="b.pdf") == "60 dias"
+    # The unscoped entry covers every document, so any change invalidates it.
+    assert cache.lookup("qual o prazo?", source_name=None) is None
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the BulkIngestionService."""
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+from app.services.bulk_ingestion_service import BulkIngestionService
+from app.services.ingestion_service import IngestionService
+
+
+def _service(user_id: str, job_count: int) -> MagicMock:
+    """Creates an ingestion service double with `job_count` pending jobs."""
+    service = MagicMock()
+    service.user.id = user_id
+    service.pending_jobs.side_effect = lambda: iter(
+        f"{user_id}-{i}" for i in range(job_count)
+    )
+    return service
+
+
+def test_jobs_are_interleaved_round_robin():
+    """Test that a user with many files cannot starve the others."""
+    services = [_service("big", 4), _service("small", 1), _service("medium", 2)]
+    bulk = BulkIngestionService(services=services, pipeline=MagicMock())
+
+    assert list(bulk.fair_jobs()) == [
+        "big-0", "small-0", "medium-0",
+        "big-1", "medium-1",
+        "big-2",
+        "big-3",
+    ]
+
+
+def test_run_ingestion_uses_the_shared_pipeline():
+    """Test that all users' jobs go through the single shared pipeline."""
+    pipeline = MagicMock()
+    pipeline.run.side_effect = lambda jobs: len(list(jobs))
+    bulk = BulkIngestionService(
+        services=[_service("a", 2), _service("b", 3)], pipeline=pipeline
+    )
+
+    assert bulk.run_ingestion() == 5
+    pipeline.run.assert_called_once()
+
+
+def test_an_unreadable_file_does_not_stop_the_other_users(tmp_path: Path):
+    """Test that a read error only skips the file that caused it."""
+    services = []
+    for user_id, names in [("a", ["bad.txt", "good.txt"]), ("b", ["other.txt"])]:
+        user_path = tmp_path / user_id
+        user_path.mkdir()
+        for name in names:
+            (user_path / name).write_text(name)
+        user = MagicMock()
+        user.id = user_id
+        user.get_documents.side_effect = lambda path=user_path: sorted(path.iterdir())
+        services.append(
+            IngestionService(
+                user=user,
+                chroma_repo=MagicMock(),
+                doc_factory=MagicMock(),
+                embeddings_service=MagicMock(model="test-model"),
+                base_doc_path=str(tmp_path),
+                manifest_repo=MagicMock(get_all=MagicMock(return_value={})),
+            )
+        )
+    bulk = BulkIngestionService(services=services, pipeline=MagicMock())
+    calculate_hash = IngestionService._calculate_hash
+
+    def failing_hash(file_path: Path) -> str:
+        if file_path.name == "bad.txt":
+            raise PermissionError("permission denied")
+        return calculate_hash(file_path)
+
+    with patch.object(IngestionService, "_calculate_hash", side_effect=failing_hash):
+        jobs = list(bulk.fair_jobs())
+
+    assert [job.path.name for job in jobs] == ["good.txt", "other.txt"]
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the ContextPacker."""
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.models.document import Document
+from app.services.context_packer import ContextPacker
+
+TEXT = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu"
+
+
+def _count_words(text: str) -> int:
+    return len(text.split())
+
+
+def _chunk(doc_id: str, start: int, end: int, page: int = 1) -> Document:
+    return Document(
+        id=doc_id,
+        content=TEXT[start:end],
+        source_name="a.pdf",
+        metadata={"page": page, "start_index": start, "end_index": end},
+    )
+
+
+def _packer(max_tokens: int, history_share: float = 0.25) -> ContextPacker:
+    return ContextPacker(
+        model="gpt-4", max_tokens=max_tokens, history_share=history_share, counter=_count_words
+    )
+
+
+def test_overlapping_and_adjacent_chunks_are_merged():
+    """Test that chunks sharing text in the same page become one document."""
+    # "alpha beta gamma delta", "gamma delta epsilon zeta", "eta theta"
+    chunks = [_chunk("b", 11, 35), _chunk("a", 0, 22), _chunk("c", 36, 45)]
+    other_page = _chunk("d", 0, 10, page=2)
+
+    merged = _packer(100).merge_adjacent(chunks + [other_page])
+
+    assert [doc.content for doc in merged] == [
+        "alpha beta gamma delta epsilon zeta\neta theta",
+        "alpha beta",
+    ]
+    assert merged[0].id == "b"
+    assert (merged[0].metadata["start_index"], merged[0].metadata["end_index"]) == (0, 45)
+
+
+def test_overlap_is_counted_once_and_lowest_ranked_chunks_are_dropped():
+    """Test the budget with overlapping chunks and a chunk that does not fit."""
+    chunks = [
+        _chunk("a", 0, 22),  # 4 words
+        _chunk("b", 11, 35),  # 2 new words: "epsilon zeta"
+        _chunk("c", 36, 56),  # 4 words, over the budget
+        _chunk("d", 57, 66),  # 2 words, ranked below a dropped chunk
+    ]
+
+    # 4 tokens of message overhead, then room for 9 tokens of context.
+    packed = _packer(max_tokens=4 + 9).pack(chunks, fixed_text="")
+
+    assert [doc.content for doc in packed.documents] == ["alpha beta gamma delta epsilon zeta"]
+    assert packed.kept_tokens == 4 + 6
+    assert packed.dropped_documents == 2
+    assert packed.dropped_tokens == 4 + 2
+
+
+def test_oldest_history_is_dropped_first():
+    """Test that the newest messages are kept within the history share."""
+    history = [
+        HumanMessage(content="one two three"),
+        AIMessage(content="four five"),
+        HumanMessage(content="six"),
+        AIMessage(content="seven eight"),
+    ]
+
+    packed = _packer(max_tokens=4 + 40, history_share=0.5).pack(
+        [], history, fixed_text="the question"
+    )
+
+    # 4 + 2 tokens of fixed cost leave 38; 19 for history at 4 tokens per message.
+    assert packed.history == history[1:]
+    assert packed.dropped_messages == 1
+    assert packed.dropped_tokens == 3 + 4
+    assert packed.kept_tokens == 4 + 2 + (2 + 1 + 2) + 3 * 4
+
+
+def test_chunks_without_positions_are_kept_as_they_are():
+    """Test that documents without offsets are neither merged nor trimmed."""
+    docs = [
+        Document(id="x", content="first text", source_name="a.txt"),
+        Document(id="y", content="second text", source_name="a.txt"),
+    ]
+
+    packed = _packer(100).pack(docs)
+
+    assert packed.documents == docs
+    assert packed.dropped_tokens == 0
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the EmbeddingCoalescer."""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+from app.services.embedding_coalescer import EmbeddingCoalescer
+
+
+@pytest.fixture
+def embeddings_service() -> MagicMock:
+    service = MagicMock()
+    service.create_embeddings.side_effect = lambda texts: [[float(len(t))] for t in texts]
+    return service
+
+
+def test_concurrent_threads_share_one_call(embeddings_service: MagicMock):
+    """Test that requests within the window become a single deduplicated batch."""
+    coalescer = EmbeddingCoalescer(embeddings_service, window_ms=200, max_batch_size=10)
+    texts = ["a", "bb", "ccc", "bb"]
+
+    with ThreadPoolExecutor(max_workers=len(texts)) as executor:
+        vectors = list(executor.map(coalescer.embed, texts))
+
+    assert vectors == [[1.0], [2.0], [3.0], [2.0]]
+    embeddings_service.create_embeddings.assert_called_once()
+    assert sorted(embeddings_service.create_embeddings.call_args.args[0]) == ["a", "bb", "ccc"]
+
+
+def test_async_callers_and_max_batch_size(embeddings_service: MagicMock):
+    """Test that async callers are batched and a full batch is sent right away."""
+    coalescer = EmbeddingCoalescer(embeddings_service, window_ms=200, max_batch_size=2)
+
+    async def main():
+        return await asyncio.gather(*(coalescer.aembed(t) for t in ["a", "bb", "ccc"]))
+
+    assert asyncio.run(main()) == [[1.0], [2.0], [3.0]]
+    batch_sizes = [len(c.args[0]) for c in embeddings_service.create_embeddings.call_args_list]
+    assert batch_sizes == [2, 1]
+
+
+def test_failures_reach_every_caller_of_the_batch(embeddings_service: MagicMock):
+    """Test that a provider error is raised to the callers instead of hanging them."""
+    embeddings_service.create_embeddings.side_effect = RuntimeError("rate limited")
+    coalescer = EmbeddingCoalescer(embeddings_service, window_ms=1)
+
+    with pytest.raises(RuntimeError, match="rate limited"):
+        coalescer.embed("a")
+
+
+def test_cancelled_request_does_not_stop_the_worker(embeddings_service: MagicMock):
+    """Test that a caller giving up leaves the coalescer serving the others."""
+    coalescer = EmbeddingCoalescer(embeddings_service, window_ms=100)
+
+    async def main():
+        cancelled = asyncio.ensure_future(coalescer.aembed("a"))
+        await asyncio.sleep(0.01)  # Joins the batch window
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        return await asyncio.wait_for(coalescer.aembed("bb"), timeout=2)
+
+    assert asyncio.run(main()) == [2.0]
+    assert coalescer._worker.is_alive()
+    # A request cancelled before the worker takes it is skipped.
+    future = coalescer.submit("ccc")
+    future.cancel()
+    assert coalescer.embed("dddd") == [4.0]
+
+
+def test_batches_are_sent_concurrently(embeddings_service: MagicMock):
+    """Test that a slow provider call does not hold back the next batch."""
+    # Each call waits for another one to be in flight at the same time.
+    both_in_flight = threading.Barrier(2, timeout=2)
+
+    def create_embeddings(texts):
+        both_in_flight.wait()
+        return [[float(len(t))] for t in texts]
+
+    embeddings_service.create_embeddings.side_effect = create_embeddings
+    coalescer = EmbeddingCoalescer(
+        embeddings_service, window_ms=1, max_batch_size=1, max_inflight_batches=2
+    )
+
+    futures = [coalescer.submit("a"), coalescer.submit("bb")]
+
+    assert [future.result(timeout=5) for future in futures] == [[1.0], [2.0]]
+    assert embeddings_service.create_embeddings.call_count == 2
@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 """Unit tests for the EmbeddingsService."""
+import asyncio
 from unittest.mock import patch, MagicMock
 
 import pytest
-from app.services.embeddings_service import EmbeddingsService
+from app.repositories.embedding_cache_repository import EmbeddingCacheRepository
+from app.services.embeddings_service import EmbeddingsService, HashingEmbeddingsService
 
 
 @patch("app.services.embeddings_service.embedding")
@@ -34,3 +36,97 @@ def test_create_embeddings_calls_litellm_and_parses_response(mock_litellm_embedd
 
     # Check that the response was parsed correctly into a list of vectors
     assert result_vectors == [[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]]
+
+
+@patch("app.services.embeddings_service.embedding")
+def test_create_embeddings_batches_and_preserves_order(mock_litellm_embedding):
+    """Test that texts are split by item count and token estimate, in order."""
+
+    def fake_embedding(model, input):
+        response = MagicMock()
+        response.data = [{"embedding": [float(text.split()[-1])]} for text in input]
+        return response
+
+    mock_litellm_embedding.side_effect = fake_embedding
+
+    service = EmbeddingsService(
+        model="test-embedding-model", max_batch_size=3, max_concurrency=2
+    )
+    texts = [f"text {i}" for i in range(8)]
+    result_vectors = service.create_embeddings(texts)
+
+    batch_sizes = [len(call.kwargs["input"]) for call in mock_litellm_embedding.call_args_list]
+    assert sorted(batch_sizes) == [2, 3, 3]
+    assert result_vectors == [[float(i)] for i in range(8)]
+
+
+def test_make_batches_respects_token_limit():
+    """Test that a batch is closed before exceeding the token budget."""
+    service = EmbeddingsService(max_batch_tokens=10)
+    texts = ["a" * 15, "b" * 15, "c" * 15]  # 6 estimated tokens each
+
+    assert service._make_batches(texts) == [["a" * 15], ["b" * 15], ["c" * 15]]
+
+
+@patch("app.services.embeddings_service.embedding")
+def test_create_embeddings_only_sends_cache_misses(mock_litellm_embedding, tmp_path):
+    """Test that cached texts are not sent to the provider again."""
+    def fake_embedding(model, input):
+        response = MagicMock()
+        response.data = [{"embedding": [float(len(text))]} for text in input]
+        return response
+
+    mock_litellm_embedding.side_effect = fake_embedding
+    cache = EmbeddingCacheRepository(db_path=str(tmp_path / "cache.db"))
+    service = EmbeddingsService(model="test-embedding-model", cache=cache)
+
+    assert service.create_embeddings(["a", "bb"]) == [[1.0], [2.0]]
+    assert service.create_embeddings(["bb", "ccc", "ccc"]) == [[2.0], [3.0], [3.0]]
+
+    second_call = mock_litellm_embedding.call_args_list[1]
+    assert second_call.kwargs["input"] == ["ccc"]
+
+
+def test_hashing_embeddings_are_deterministic_and_normalized():
+    """Test that the offline embedder is stable and ranks shared words closer."""
+    service = HashingEmbeddingsService(dimensions=64)
+    first, second, other = service.create_embeddings(
+        ["o contrato foi assinado", "o contrato foi assinado", "chuva forte amanhã"]
+    )
+    related = service.embed_text("contrato assinado ontem")
+
+    assert first == second and len(first) == 64
+    assert sum(value * value for value in first) == pytest.approx(1.0)
+
+    def dot(a, b):
+        return sum(x * y for x, y in zip(a, b))
+
+    assert dot(first, related) > dot(first, other)
+
+
+@patch("app.services.embeddings_service.aembedding")
+def test_acreate_embeddings_batches_concurrently_and_preserves_order(mock_litellm_aembedding):
+    """Test that the async path batches like the sync one and keeps input order."""
+    in_flight, peak = 0, 0
+
+    async def fake_aembedding(model, input):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        response = MagicMock()
+        response.data = [{"embedding": [float(text.split()[-1])]} for text in input]
+        return response
+
+    mock_litellm_aembedding.side_effect = fake_aembedding
+
+    service = EmbeddingsService(
+        model="test-embedding-model", max_batch_size=2, max_concurrency=2
+    )
+    texts = [f"text {i}" for i in range(7)]
+    result_vectors = asyncio.run(service.acreate_embeddings(texts))
+
+    assert result_vectors == [[float(i)] for i in range(7)]
+    assert mock_litellm_aembedding.call_count == 4
+    assert peak == 2
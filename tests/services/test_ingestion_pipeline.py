@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the IngestionPipeline."""
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+from app.models.document import Document
+from app.services.ingestion_pipeline import IngestionJob, IngestionPipeline
+
+
+def _fake_documents(file_path: str):
+    """Returns one chunk per file, named after the file."""
+    name = Path(file_path).name
+    return [Document(id=name, content=f"content of {name}", source_name=name)]
+
+
+@pytest.fixture
+def pipeline_parts():
+    """Fixture providing a mocked factory, embeddings service and repository."""
+    doc_factory = MagicMock()
+    doc_factory.load_documents.side_effect = _fake_documents
+    embeddings_service = MagicMock()
+    embeddings_service.create_embeddings.side_effect = lambda texts: [[0.1] for _ in texts]
+    repository = MagicMock()
+    return doc_factory, embeddings_service, repository
+
+
+def _write_files(directory: Path, names):
+    """Creates small files to be used as ingestion job paths."""
+    paths = []
+    for name in names:
+        path = directory / name
+        path.write_text(name)
+        paths.append(path)
+    return paths
+
+
+def test_pipeline_indexes_every_job(pipeline_parts, tmp_path: Path):
+    """Test that every job is parsed, embedded, written and reported once."""
+    doc_factory, embeddings_service, repository = pipeline_parts
+    paths = _write_files(tmp_path, [f"doc{i}.txt" for i in range(10)])
+    indexed = []
+    jobs = [
+        IngestionJob(
+            path=path,
+            file_hash=path.name,
+            repository=repository,
+            on_indexed=lambda job, count: indexed.append((job.path.name, count)),
+        )
+        for path in paths
+    ]
+
+    pipeline = IngestionPipeline(
+        doc_factory, embeddings_service, parse_workers=0, embed_workers=3, queue_size=2
+    )
+    processed = pipeline.run(jobs)
+
+    assert processed == 10
+    assert repository.add.call_count == 10
+    assert sorted(indexed) == sorted((f"doc{i}.txt", 1) for i in range(10))
+
+
+def test_pipeline_skips_files_that_fail_to_embed(pipeline_parts, tmp_path: Path):
+    """Test that an embedding failure only drops the affected file."""
+    doc_factory, embeddings_service, repository = pipeline_parts
+
+    def flaky_embeddings(texts):
+        if "content of bad.txt" in texts:
+            raise RuntimeError("provider error")
+        return [[0.1] for _ in texts]
+
+    embeddings_service.create_embeddings.side_effect = flaky_embeddings
+    indexed = []
+    jobs = [
+        IngestionJob(
+            path=path,
+            file_hash=path.name,
+            repository=repository,
+            on_indexed=lambda job, count: indexed.append(job.path.name),
+        )
+        for path in _write_files(tmp_path, ["good.txt", "bad.txt", "other.txt"])
+    ]
+
+    pipeline = IngestionPipeline(doc_factory, embeddings_service, parse_workers=0)
+    processed = pipeline.run(jobs)
+
+    assert processed == 2
+    assert sorted(indexed) == ["good.txt", "other.txt"]
+
+
+def test_pipeline_only_embeds_new_chunks_and_deletes_stale_ones(pipeline_parts, tmp_path: Path):
+    """Test that stored chunks are reused and removed chunks are deleted."""
+    doc_factory, embeddings_service, repository = pipeline_parts
+    doc_factory.load_documents.side_effect = lambda file_path: [
+        Document(id="kept", content="kept chunk", source_name="doc.txt"),
+        Document(id="new", content="new chunk", source_name="doc.txt"),
+    ]
+    repository.get_ids.return_value = ["kept", "stale"]
+    lexical_index = MagicMock()
+    job = IngestionJob(
+        path=_write_files(tmp_path, ["doc.txt"])[0],
+        file_hash="hash",
+        repository=repository,
+        on_indexed=lambda job, count: None,
+        lexical_index=lexical_index,
+    )
+
+    pipeline = IngestionPipeline(doc_factory, embeddings_service, parse_workers=0)
+    pipeline.run([job])
+
+    embeddings_service.create_embeddings.assert_called_once_with(["new chunk"])
+    added_documents = repository.add.call_args[0][0]
+    assert [doc.id for doc in added_documents] == ["new"]
+    repository.delete.assert_called_once_with(["stale"])
+    assert [doc.id for doc in lexical_index.add.call_args[0][0]] == ["new", "kept"]
+    lexical_index.delete.assert_called_once_with(["stale"])
+
+
+def test_pipeline_removes_the_chunks_of_an_emptied_file(pipeline_parts, tmp_path: Path):
+    """Test that a file without chunks is indexed and its old chunks deleted."""
+    doc_factory, embeddings_service, repository = pipeline_parts
+    doc_factory.load_documents.side_effect = lambda file_path: []
+    repository.get_ids.return_value = ["old"]
+    lexical_index = MagicMock()
+    indexed = []
+    job = IngestionJob(
+        path=_write_files(tmp_path, ["doc.txt"])[0],
+        file_hash="hash",
+        repository=repository,
+        on_indexed=lambda job, count: indexed.append(count),
+        lexical_index=lexical_index,
+    )
+
+    pipeline = IngestionPipeline(doc_factory, embeddings_service, parse_workers=0)
+
+    assert pipeline.run([job]) == 1
+    assert indexed == [0]
+    embeddings_service.create_embeddings.assert_not_called()
+    repository.delete.assert_called_once_with(["old"])
+    lexical_index.delete.assert_called_once_with(["old"])
+
+
+def test_pipeline_keeps_the_chunks_of_a_file_that_fails_to_parse(
+    pipeline_parts, tmp_path: Path
+):
+    """Test that a parse error is not mistaken for an emptied file."""
+    doc_factory, embeddings_service, repository = pipeline_parts
+    doc_factory.load_documents.side_effect = OSError("file is locked")
+    repository.get_ids.return_value = ["old"]
+    lexical_index = MagicMock()
+    indexed = []
+    job = IngestionJob(
+        path=_write_files(tmp_path, ["doc.txt"])[0],
+        file_hash="hash",
+        repository=repository,
+        on_indexed=lambda job, count: indexed.append(count),
+        lexical_index=lexical_index,
+    )
+
+    pipeline = IngestionPipeline(doc_factory, embeddings_service, parse_workers=0)
+
+    assert pipeline.run([job]) == 0
+    assert indexed == []
+    repository.delete.assert_not_called()
+    lexical_index.delete.assert_not_called()
+
+
+def test_pipeline_streams_large_files_in_windows(pipeline_parts, tmp_path: Path):
+    """Test that files above the threshold are embedded window by window."""
+    doc_factory, embeddings_service, repository = pipeline_parts
+    documents = [
+        Document(id=f"chunk{i}", content=f"chunk {i}", source_name="big.txt")
+        for i in range(5)
+    ]
+    doc_factory.iter_documents.side_effect = lambda file_path, window_size: iter(
+        [documents[i : i + window_size] for i in range(0, len(documents), window_size)]
+    )
+    repository.get_ids.return_value = ["stale"]
+    indexed = []
+    job = IngestionJob(
+        path=_write_files(tmp_path, ["big.txt"])[0],
+        file_hash="hash",
+        repository=repository,
+        on_indexed=lambda job, count: indexed.append(count),
+    )
+
+    pipeline = IngestionPipeline(
+        doc_factory,
+        embeddings_service,
+        parse_workers=0,
+        window_size=2,
+        stream_threshold_bytes=1,
+    )
+    processed = pipeline.run([job])
+
+    assert processed == 1
+    doc_factory.load_documents.assert_not_called()
+    assert embeddings_service.create_embeddings.call_count == 3
+    assert indexed == [5]
+    repository.delete.assert_called_once_with(["stale"])
+
+
+def test_pipeline_leaves_a_given_parse_executor_running(pipeline_parts, tmp_path: Path):
+    """Test that an executor passed by the caller is reused, not shut down."""
+    doc_factory, embeddings_service, repository = pipeline_parts
+    pipeline = IngestionPipeline(doc_factory, embeddings_service, parse_workers=0)
+    executor = pipeline.create_parse_executor()
+    jobs = [
+        IngestionJob(
+            path=path, file_hash="hash", repository=repository, on_indexed=lambda job, count: None
+        )
+        for path in _write_files(tmp_path, ["a.txt", "b.txt"])
+    ]
+
+    with executor:
+        assert pipeline.run(jobs[:1], parse_executor=executor) == 1
+        assert pipeline.run(jobs[1:], parse_executor=executor) == 1
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the IngestionService."""
+import json
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+from app.services.ingestion_service import IngestionService
+
+
+class _IndexEverythingPipeline:
+    """Pipeline double that reports every job as indexed, up to a limit."""
+
+    def __init__(self, limit: int = None):
+        self.limit = limit
+        self.paths = []
+
+    def run(self, jobs):
+        for job in jobs:
+            if self.limit is not None and len(self.paths) >= self.limit:
+                raise KeyboardInterrupt  # Simulates a crash mid-run
+            self.paths.append(job.path.name)
+            job.on_indexed(job, 1)
+        return len(self.paths)
+
+
+@pytest.fixture
+def make_service(tmp_path: Path):
+    """Fixture building an IngestionService over temporary user documents."""
+    user_path = tmp_path / "documents" / "test_user"
+    user_path.mkdir(parents=True)
+    for i in range(3):
+        (user_path / f"doc{i}.txt").write_text(f"content {i}")
+
+    def _make(pipeline, repository=None):
+        user = MagicMock()
+        user.id = "test_user"
+        user.get_documents.side_effect = lambda: sorted(
+            p for p in user_path.iterdir() if not p.name.startswith(".")
+        )
+        return IngestionService(
+            user=user,
+            chroma_repo=repository or MagicMock(),
+            doc_factory=MagicMock(),
+            embeddings_service=MagicMock(model="test-model"),
+            base_doc_path=str(tmp_path / "documents"),
+            pipeline=pipeline,
+        )
+
+    return _make, user_path
+
+
+def test_unchanged_files_are_skipped_without_hashing(make_service):
+    """Test that a no-op run relies on the recorded stat only."""
+    make, _ = make_service
+    make(_IndexEverythingPipeline()).run_ingestion()
+
+    pipeline = _IndexEverythingPipeline()
+    with patch.object(IngestionService, "_calculate_hash") as mock_hash:
+        make(pipeline).run_ingestion()
+
+    mock_hash.assert_not_called()
+    assert pipeline.paths == []
+
+
+def test_touched_but_identical_file_is_not_reingested(make_service):
+    """Test that a changed stat with the same content only refreshes the stat."""
+    make, user_path = make_service
+    make(_IndexEverythingPipeline()).run_ingestion()
+
+    (user_path / "doc0.txt").write_text("content 0")  # New mtime, same content
+    pipeline = _IndexEverythingPipeline()
+    make(pipeline).run_ingestion()
+
+    assert pipeline.paths == []
+
+
+def test_interrupted_run_resumes_where_it_stopped(make_service):
+    """Test that files indexed before a crash are not ingested again."""
+    make, _ = make_service
+    with pytest.raises(KeyboardInterrupt):
+        make(_IndexEverythingPipeline(limit=2)).run_ingestion()
+
+    pipeline = _IndexEverythingPipeline()
+    make(pipeline).run_ingestion()
+
+    assert pipeline.paths == ["doc2.txt"]
+
+
+def test_empty_vector_store_triggers_a_full_reingestion(make_service):
+    """Test that a new, empty collection gets every recorded file again."""
+    make, _ = make_service
+    make(_IndexEverythingPipeline()).run_ingestion()
+
+    pipeline = _IndexEverythingPipeline()
+    make(pipeline, repository=MagicMock(count=MagicMock(return_value=0))).run_ingestion()
+
+    assert pipeline.paths == ["doc0.txt", "doc1.txt", "doc2.txt"]
+
+
+def test_upgrade_from_legacy_manifest_reingests_into_an_empty_collection(make_service):
+    """Test that files known only to the legacy manifest are not lost on upgrade."""
+    make, user_path = make_service
+    legacy = {
+        f"doc{i}.txt": IngestionService._calculate_hash(user_path / f"doc{i}.txt")
+        for i in range(3)
+    }
+    (user_path / IngestionService.LEGACY_MANIFEST_NAME).write_text(json.dumps(legacy))
+
+    pipeline = _IndexEverythingPipeline()
+    make(pipeline, repository=MagicMock(count=MagicMock(return_value=0))).run_ingestion()
+
+    assert pipeline.paths == ["doc0.txt", "doc1.txt", "doc2.txt"]
+    assert not (user_path / IngestionService.LEGACY_MANIFEST_NAME).exists()
+    assert (user_path / IngestionService.IMPORTED_LEGACY_MANIFEST_NAME).exists()
+
+    # The legacy manifest is not imported again.
+    service = make(_IndexEverythingPipeline())
+    assert all(entry.chunk_count == 1 for entry in service.manifest.get_all().values())
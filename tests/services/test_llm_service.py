@@ -1,9 +1,10 @@
 # -*- coding: utf-8 -*-
 """Unit tests for the LLMService."""
-from unittest.mock import patch, MagicMock
+import asyncio
+from unittest.mock import patch, AsyncMock, MagicMock
 
 import pytest
-from app.services.llm_service import LLMService
+from app.services.llm_service import LLMService, LocalLLMService
 
 
 @patch("app.services.llm_service.completion")
@@ -33,3 +34,69 @@ def test_llm_service_get_completion(mock_litellm_completion):
     )
     # Check that the response was parsed correctly
     assert result == "This is the mocked LLM response."
+
+
+@patch("app.services.llm_service.acompletion", new_callable=AsyncMock)
+def test_llm_service_aget_completion(mock_litellm_acompletion):
+    """Test that aget_completion awaits litellm's async completion."""
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock()]
+    mock_response.choices[0].message.content = "Async response."
+    mock_litellm_acompletion.return_value = mock_response
+
+    service = LLMService(model="gpt-test")
+    messages = [{"role": "user", "content": "Hello"}]
+    result = asyncio.run(service.aget_completion(messages))
+
+    mock_litellm_acompletion.assert_awaited_once_with(model="gpt-test", messages=messages)
+    assert result == "Async response."
+
+
+def test_local_llm_service_is_deterministic_and_offline():
+    """Test that the local backend renders the same answer for the same conversation."""
+    service = LocalLLMService(latency_ms=1)
+    messages = [{"role": "user", "content": "Qual é o prazo   de entrega?"}]
+
+    first = service.get_completion(messages)
+    second = asyncio.run(service.aget_completion(messages))
+    other = service.get_completion([{"role": "user", "content": "Outra pergunta"}])
+
+    assert first == second
+    assert first.endswith("Qual é o prazo de entrega?")
+    assert other != first
+
+
+def _chunk(content):
+    chunk = MagicMock()
+    chunk.choices[0].delta.content = content
+    return chunk
+
+
+@patch("app.services.llm_service.completion")
+def test_stream_completion_yields_deltas(mock_litellm_completion):
+    """Test that streamed chunks are yielded as they arrive, skipping empty deltas."""
+    mock_litellm_completion.return_value = iter([_chunk("Olá"), _chunk(None), _chunk(", mundo")])
+
+    service = LLMService(model="gpt-test")
+    messages = [{"role": "user", "content": "Hello"}]
+    tokens = list(service.stream_completion(messages))
+
+    assert tokens == ["Olá", ", mundo"]
+    mock_litellm_completion.assert_called_once_with(
+        model="gpt-test", messages=messages, stream=True
+    )
+
+
+def test_local_llm_service_streams_its_answer():
+    """Test that the local backend streams the same text it would return."""
+    service = LocalLLMService()
+    messages = [{"role": "user", "content": "Qual é o prazo?"}]
+
+    async def collect():
+        return [token async for token in service.astream_completion(messages)]
+
+    tokens = list(service.stream_completion(messages))
+
+    assert len(tokens) > 1
+    assert "".join(tokens) == service.get_completion(messages)
+    assert asyncio.run(collect()) == tokens
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the RetrievalService."""
+from unittest.mock import MagicMock
+
+import numpy as np
+from app.models.document import Document
+from app.models.search_result import SearchResult
+from app.services.retrieval_service import RetrievalService
+
+
+def test_retrieve_many_embeds_all_queries_in_one_call():
+    """Test that N queries cost one embedding call and one repository call."""
+    embeddings_service = MagicMock()
+    embeddings_service.create_embeddings.return_value = [[1.0], [2.0]]
+    repository = MagicMock()
+    repository.query_many.return_value = [[], []]
+    service = RetrievalService(repository=repository, embeddings_service=embeddings_service)
+
+    results = service.retrieve_many(
+        ["first", "second"], top_k=[3, 1], source_names=["a.pdf", None], include=["distances"]
+    )
+
+    assert results == [[], []]
+    embeddings_service.create_embeddings.assert_called_once_with(["first", "second"])
+    repository.query_many.assert_called_once_with(
+        [[1.0], [2.0]], top_k=[3, 1], source_names=["a.pdf", None], include=["distances"]
+    )
+
+
+def test_hybrid_search_fuses_vector_and_lexical_rankings():
+    """Test that reciprocal rank fusion promotes chunks found by both searches."""
+    embeddings_service = MagicMock()
+    embeddings_service.create_embeddings.return_value = [[1.0]]
+    repository = MagicMock()
+    dense_docs = {
+        doc_id: Document(id=doc_id, content=doc_id, source_name="a.pdf") for doc_id in "xyz"
+    }
+    repository.query_many.return_value = [
+        [SearchResult(id=doc_id, distance=0.1, document=doc) for doc_id, doc in dense_docs.items()]
+    ]
+    lexical_only = Document(id="w", content="contrato 2024/015", source_name="a.pdf")
+    repository.get_documents.return_value = [lexical_only]
+    lexical_index = MagicMock()
+    lexical_index.search.return_value = [("w", 9.0), ("z", 7.0)]
+    service = RetrievalService(
+        repository=repository,
+        embeddings_service=embeddings_service,
+        lexical_index=lexical_index,
+        hybrid_candidates=10,
+    )
+
+    results = service.retrieve_results("contrato 2024/015", top_k=3, source_name="a.pdf")
+
+    # z is in both rankings; w tops the lexical ranking and ties with x.
+    assert [result.id for result in results] == ["z", "x", "w"]
+    assert results[0].score > results[1].score
+    assert results[2].document == lexical_only
+    repository.query_many.assert_called_once_with([[1.0]], top_k=10, source_names=["a.pdf"])
+    lexical_index.search.assert_called_once_with(
+        "contrato 2024/015", top_k=10, source_name="a.pdf"
+    )
+    repository.get_documents.assert_called_once_with(["w"])
+
+
+def test_mmr_replaces_near_duplicate_chunks():
+    """Test that over-fetched candidates are re-ranked for diversity."""
+    embeddings_service = MagicMock()
+    embeddings_service.create_embeddings.return_value = [[1.0, 0.5]]
+    repository = MagicMock()
+    repository.query_many.return_value = [
+        [SearchResult(id=doc_id, distance=0.1) for doc_id in ["a", "a-overlap", "b"]]
+    ]
+    repository.get_embeddings.return_value = {
+        "a": np.array([1.0, 0.3]),
+        "a-overlap": np.array([1.0, 0.29]),
+        "b": np.array([0.4, 1.0]),
+    }
+    service = RetrievalService(
+        repository=repository, embeddings_service=embeddings_service, mmr_fetch_k=3
+    )
+
+    results = service.retrieve_results("question", top_k=2)
+
+    assert [result.id for result in results] == ["a", "b"]
+    assert repository.query_many.call_args.kwargs["top_k"] == 3
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the IngestionWatcher."""
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import threading
+
+import pytest
+from app.services.watch_service import IngestionWatcher
+
+
+def _user_service(user_id: str, directory: Path) -> MagicMock:
+    """A mocked ingestion service over a user's directory."""
+    service = MagicMock()
+    service.user.id = user_id
+    service.user.get_documents.side_effect = lambda: sorted(directory.iterdir())
+    service.pending_jobs.side_effect = lambda paths: iter(list(paths))
+    return service
+
+
+@pytest.fixture
+def watched_user(tmp_path: Path):
+    """Fixture providing a watcher over one temporary user directory."""
+    service = _user_service("test_user", tmp_path)
+
+    pipeline = MagicMock()
+    pipeline.run.side_effect = lambda jobs, parse_executor=None: len(list(jobs))
+    bulk_service = MagicMock(services=[service], pipeline=pipeline)
+
+    watcher = IngestionWatcher(bulk_service, debounce_seconds=1.0)
+    watcher.poll_once(now=0.0)  # Initial snapshot of the empty directory
+    return watcher, service, tmp_path
+
+
+def test_changes_are_debounced(watched_user):
+    """Test that a file is only ingested once it has been quiet long enough."""
+    watcher, service, directory = watched_user
+    doc = directory / "doc.txt"
+
+    doc.write_text("first draft")
+    assert watcher.poll_once(now=10.0) == 0
+    doc.write_text("second draft, still being written")
+    assert watcher.poll_once(now=10.5) == 0
+
+    assert watcher.poll_once(now=11.6) == 1
+    service.pending_jobs.assert_called_once_with([doc])
+    assert watcher.poll_once(now=20.0) == 0
+
+
+def test_deleted_files_are_removed_from_the_index(watched_user):
+    """Test that a deleted file has its chunks removed."""
+    watcher, service, directory = watched_user
+    doc = directory / "doc.txt"
+    doc.write_text("content")
+    watcher.poll_once(now=10.0)
+    watcher.poll_once(now=12.0)
+
+    doc.unlink()
+    watcher.poll_once(now=20.0)
+    assert watcher.poll_once(now=21.5) == 1
+
+    service.remove_document.assert_called_once_with("doc.txt")
+
+
+def test_new_users_are_watched(tmp_path: Path):
+    """Test that a user directory created while watching is picked up."""
+    pipeline = MagicMock()
+    pipeline.run.side_effect = lambda jobs, parse_executor=None: len(list(jobs))
+    bulk_service = MagicMock(services=[], pipeline=pipeline)
+    users = []
+    watcher = IngestionWatcher(
+        bulk_service,
+        debounce_seconds=1.0,
+        list_users=lambda: list(users),
+        create_service=lambda user_id: _user_service(user_id, tmp_path / user_id),
+        user_refresh_seconds=5.0,
+    )
+    watcher.poll_once(now=0.0)
+
+    (tmp_path / "new_user").mkdir()
+    (tmp_path / "new_user" / "doc.txt").write_text("content")
+    users.append("new_user")
+    assert watcher.poll_once(now=2.0) == 0  # Not listed again yet
+    assert bulk_service.services == []
+
+    watcher.poll_once(now=6.0)
+    assert [service.user.id for service in bulk_service.services] == ["new_user"]
+    assert watcher.poll_once(now=7.5) == 1
+
+
+def test_run_keeps_one_parse_executor_across_polls(watched_user):
+    """Test that every poll of a run parses with the same executor."""
+    watcher, _, directory = watched_user
+    pipeline = watcher.bulk_service.pipeline
+    executor = MagicMock()
+    executor.__enter__.return_value = executor
+    pipeline.create_parse_executor.return_value = executor
+    watcher.poll_interval = 0.01
+    watcher.debounce_seconds = 0.0
+    stop_event = threading.Event()
+    poll_once = watcher.poll_once
+
+    def change_and_poll():
+        # A new file each poll, so that every poll runs the pipeline.
+        (directory / f"{pipeline.run.call_count}.txt").write_text("content")
+        processed_count = poll_once()
+        if pipeline.run.call_count == 2:
+            stop_event.set()
+        return processed_count
+
+    watcher.poll_once = change_and_poll
+    watcher.run(stop_event)
+
+    pipeline.create_parse_executor.assert_called_once()
+    assert [call.kwargs["parse_executor"] for call in pipeline.run.call_args_list] == [
+        executor,
+        executor,
+    ]
+    executor.__exit__.assert_called_once()
+
+
+def test_changes_during_the_catch_up_are_picked_up(tmp_path: Path):
+    """Test that files edited or deleted during the initial ingestion are synced."""
+    edited, deleted = tmp_path / "edited.txt", tmp_path / "deleted.txt"
+    edited.write_text("before")
+    deleted.write_text("content")
+    service = _user_service("test_user", tmp_path)
+    pipeline = MagicMock()
+    pipeline.run.side_effect = lambda jobs, parse_executor=None: len(list(jobs))
+    pipeline.create_parse_executor.return_value = MagicMock()
+
+    def catch_up():
+        edited.write_text("edited while the catch-up was running")
+        deleted.unlink()
+
+    bulk_service = MagicMock(services=[service], pipeline=pipeline)
+    bulk_service.run_ingestion.side_effect = catch_up
+    watcher = IngestionWatcher(bulk_service, poll_interval=0.01, debounce_seconds=0.0)
+    stop_event = threading.Event()
+    poll_once = watcher.poll_once
+
+    def poll_and_stop():
+        stop_event.set()
+        return poll_once()
+
+    watcher.poll_once = poll_and_stop
+    watcher.run(stop_event)
+
+    service.pending_jobs.assert_called_once_with([edited])
+    service.remove_document.assert_called_once_with("deleted.txt")
+
+
+def test_a_failed_batch_is_retried(watched_user):
+    """Test that the changes of a poll that failed are processed by the next one."""
+    watcher, service, directory = watched_user
+    doc = directory / "doc.txt"
+    doc.write_text("content")
+    watcher.poll_once(now=10.0)
+
+    watcher.bulk_service.pipeline.run.side_effect = RuntimeError("pipeline failed")
+    with pytest.raises(RuntimeError):
+        watcher.poll_once(now=11.5)
+
+    watcher.bulk_service.pipeline.run.side_effect = (
+        lambda jobs, parse_executor=None: len(list(jobs))
+    )
+    assert watcher.poll_once(now=13.0) == 1